@@ -0,0 +1,154 @@
+import atexit
+import queue
+import threading
+import time
+from psycopg2.extras import execute_values
+from config import Config
+from database import get_pool
+
+def write_batch(events):
+    """
+    One multi-row INSERT per batch on a connection of its own. created_at is
+    rebuilt from each event's age so it reflects when the event happened, in the
+    database's clock, not when the batch was flushed.
+    """
+    now = time.monotonic()
+    rows = [(user_id, action, details, max(now - logged_at, 0.0)) for user_id, action, details, logged_at in events]
+    conn = get_pool().getconn()
+    try:
+        cursor = conn.cursor()
+        execute_values(cursor, '''
+            INSERT INTO activity_logs (user_id, action, details, created_at) VALUES %s
+        ''', rows, template='(%s, %s, %s, LOCALTIMESTAMP - make_interval(secs => %s))', page_size=len(rows))
+        conn.commit()
+    finally:
+        conn.close()
+
+class ActivityLogger:
+    """
+    Buffers activity events in memory and writes them from a background thread
+    once `batch_size` events are waiting or `flush_interval` seconds have passed.
+    When the buffer is full, log() waits up to `block_timeout` seconds for room
+    (backpressure) and then drops the event rather than stall the request.
+    """
+    def __init__(self, writer=write_batch, batch_size=200, flush_interval=1.0, max_buffer=10000, block_timeout=0.05):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self._writer = writer
+        self._buffer = queue.Queue(maxsize=max_buffer)
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._stopping = False
+        self._thread = None
+        self._flushed = 0
+        self._dropped = 0
+        self._failed = 0
+        self._batches = 0
+
+    def log(self, user_id, action, details):
+        self._ensure_started()
+        with self._cond:
+            self._pending += 1
+        try:
+            self._buffer.put((user_id, action, details, time.monotonic()), timeout=self.block_timeout)
+        except queue.Full:
+            with self._cond:
+                self._pending -= 1
+                self._dropped += 1
+                self._cond.notify_all()
+            return False
+        return True
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='activity-logger', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        """Block for the first event, then gather more until the batch is full or the interval is up"""
+        try:
+            batch = [self._buffer.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and not self._stopping:
+                    batch.append(self._buffer.get(timeout=remaining))
+                else:
+                    # Interval is up (or shutting down): take only what is already buffered
+                    batch.append(self._buffer.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                try:
+                    self._writer(batch)
+                    with self._cond:
+                        self._flushed += len(batch)
+                        self._batches += 1
+                except Exception as e:
+                    print(f"Error logging activity batch of {len(batch)}: {e}")
+                    with self._cond:
+                        self._failed += len(batch)
+                with self._cond:
+                    self._pending -= len(batch)
+                    self._cond.notify_all()
+            elif self._stopping:
+                return
+
+    def flush(self, timeout=None):
+        """Block until every logged event has been written (or failed); False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=5):
+        """Flush what is buffered and stop the writer thread (registered with atexit)"""
+        self._stopping = True
+        if self._thread is not None:
+            self.flush(timeout)
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'buffered': self._buffer.qsize(),
+                'pending': self._pending,
+                'flushed': self._flushed,
+                'dropped': self._dropped,
+                'failed': self._failed,
+                'batches': self._batches,
+                'avg_batch': round(self._flushed / self._batches, 1) if self._batches else 0.0
+            }
+
+_logger = None
+_logger_lock = threading.Lock()
+
+def get_activity_logger():
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                _logger = ActivityLogger(
+                    batch_size=Config.ACTIVITY_LOG_BATCH_SIZE,
+                    flush_interval=Config.ACTIVITY_LOG_FLUSH_INTERVAL,
+                    max_buffer=Config.ACTIVITY_LOG_BUFFER_SIZE,
+                    block_timeout=Config.ACTIVITY_LOG_BLOCK_TIMEOUT
+                )
+                atexit.register(_logger.close)
+    return _logger
@@ -1,14 +1,200 @@
+import importlib.util
+import json
+import re
+import threading
+import time
+from collections import deque
+import httpx
 from groq import Groq
 from config import Config
+import evaluation_cache
+import code_runner
+
+MODEL = "llama-3.1-8b-instant"
+PROMPT_VERSION = 3  # bump whenever the evaluate_code prompt changes so cached grades are not reused
+
+# Points per rubric criterion. Every evaluation carries the breakdown twice: a
+# line of text per criterion for people, and <criterion>_score as a number
+# (None when that criterion was not graded) for the database.
+RUBRIC = {'correctness': 40, 'efficiency': 25, 'code_style': 20, 'best_practices': 15}
+_POINTS = re.compile(r'(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)')
+
+_client = None
+_client_lock = threading.Lock()
+_local = threading.local()
+
+class LLMMetrics:
+    """Per-call latency and connection setup (DNS/TCP/TLS) time for Groq requests"""
+    def __init__(self, history=50):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.total_latency = 0.0
+        self.total_handshake = 0.0
+        self.recent = deque(maxlen=history)
+
+    def record(self, operation, latency, handshake, error=False):
+        with self._lock:
+            self.calls += 1
+            self.errors += 1 if error else 0
+            self.total_latency += latency
+            if handshake:
+                self.new_connections += 1
+                self.total_handshake += handshake
+            self.recent.append({
+                'operation': operation,
+                'latency_ms': round(latency * 1000, 1),
+                'handshake_ms': round(handshake * 1000, 1),
+                'reused_connection': not handshake,
+                'error': error
+            })
+
+    def stats(self):
+        with self._lock:
+            avg_handshake = self.total_handshake / self.new_connections if self.new_connections else 0.0
+            reused = self.calls - self.new_connections
+            return {
+                'calls': self.calls,
+                'errors': self.errors,
+                'new_connections': self.new_connections,
+                'reused_connections': reused,
+                'avg_latency_ms': round(self.total_latency / self.calls * 1000, 1) if self.calls else 0.0,
+                'avg_handshake_ms': round(avg_handshake * 1000, 1),
+                'estimated_saved_ms': round(reused * avg_handshake * 1000, 1),
+                'recent': list(self.recent)
+            }
+
+llm_metrics = LLMMetrics()
+
+def _trace(event_name, info):
+    """httpcore trace hook: accumulate connection setup time for the current call"""
+    call = getattr(_local, 'call', None)
+    if call is None or not event_name.startswith(('connection.connect_tcp', 'connection.start_tls')):
+        return
+    if event_name.endswith('.started'):
+        call['started'] = time.perf_counter()
+    elif event_name.endswith('.complete') and 'started' in call:
+        call['handshake'] += time.perf_counter() - call.pop('started')
+
+def _attach_trace(request):
+    request.extensions['trace'] = _trace
 
 def get_groq_client():
-    """Get Groq client instance"""
-    return Groq(api_key=Config.GROQ_API_KEY)
+    """
+    Process-wide Groq client. Its httpx pool keeps connections alive across
+    calls and threads, so DNS/TLS setup is paid once rather than per request.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                http_client = httpx.Client(
+                    http2=Config.GROQ_HTTP2 and importlib.util.find_spec('h2') is not None,
+                    limits=httpx.Limits(
+                        max_connections=Config.GROQ_MAX_CONNECTIONS,
+                        max_keepalive_connections=Config.GROQ_MAX_KEEPALIVE,
+                        keepalive_expiry=Config.GROQ_KEEPALIVE_EXPIRY
+                    ),
+                    timeout=httpx.Timeout(Config.GROQ_TIMEOUT, connect=Config.GROQ_CONNECT_TIMEOUT),
+                    event_hooks={'request': [_attach_trace]}
+                )
+                _client = Groq(
+                    api_key=Config.GROQ_API_KEY,
+                    base_url=Config.GROQ_BASE_URL,
+                    http_client=http_client,
+                    max_retries=Config.GROQ_MAX_RETRIES
+                )
+    return _client
+
+def _chat_completion(operation, **kwargs):
+    """client.chat.completions.create() with latency/handshake metrics"""
+    _local.call = {'handshake': 0.0}
+    start = time.perf_counter()
+    error = False
+    try:
+        return get_groq_client().chat.completions.create(**kwargs)
+    except Exception:
+        error = True
+        raise
+    finally:
+        call = _local.call
+        _local.call = None
+        llm_metrics.record(operation, time.perf_counter() - start, call['handshake'], error)
+
+def clamp_points(value, maximum):
+    """A grader's number for a criterion, kept within 0..maximum; None if it is not a number"""
+    try:
+        return min(float(maximum), max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return None
 
-def evaluate_code(code, language, problem_description, expected_output=None, test_cases=None):
+def rubric_points(text, maximum):
+    """
+    Points from a criterion line like 'Correct implementation - 38/40', or None.
+    The last fraction is the score ('Passed 3/5 test cases - 24/40'); one out of
+    another total is rescaled to `maximum`.
+    """
+    matches = _POINTS.findall(text) if isinstance(text, str) else []
+    if not matches:
+        return None
+    value, total = (float(part) for part in matches[-1])
+    if total <= 0:
+        return None
+    return clamp_points(value * maximum / total, maximum)
+
+def rubric_scores(evaluation):
+    """Numeric score per RUBRIC criterion: the stored number, else parsed from the text line"""
+    scores = {}
+    for criterion, maximum in RUBRIC.items():
+        key = f'{criterion}_score'
+        if key in evaluation:
+            scores[criterion] = clamp_points(evaluation[key], maximum)
+        else:
+            scores[criterion] = rubric_points(evaluation.get(criterion), maximum)
+    return scores
+
+def with_rubric_scores(evaluation, scores=None):
+    """
+    Add <criterion>_score to an evaluation. `scores` holds the numbers the
+    grader gave directly (None for criteria it could not grade); the rest are
+    parsed from the text lines.
+    """
+    scores = scores or {}
+    for criterion, maximum in RUBRIC.items():
+        if criterion in scores:
+            evaluation[f'{criterion}_score'] = clamp_points(scores[criterion], maximum)
+        else:
+            evaluation[f'{criterion}_score'] = rubric_points(evaluation.get(criterion), maximum)
+    return evaluation
+
+def _graded_scores(result):
+    """The <criterion>_score numbers a model reply actually contains"""
+    return {
+        criterion: result[f'{criterion}_score']
+        for criterion in RUBRIC
+        if clamp_points(result.get(f'{criterion}_score'), RUBRIC[criterion]) is not None
+    }
+
+def error_evaluation():
+    """The grade given when the model could not be reached or failed"""
+    return with_rubric_scores({
+        'score': 0,
+        'status': 'rejected',
+        'feedback': 'AI evaluation error. Please try again.',
+        'correctness': 'Unable to evaluate - 0/40',
+        'efficiency': 'Unable to evaluate - 0/25',
+        'code_style': 'Unable to evaluate - 0/20',
+        'best_practices': 'Unable to evaluate - 0/15',
+        'suggestions': 'Please try submitting again.'
+    }, dict.fromkeys(RUBRIC))
+
+def evaluate_code(code, language, problem_description, expected_output=None, test_cases=None, raise_errors=False):
     """
     Evaluate code using Groq AI
     Returns: dict with score, status, feedback, and explanation
+    With raise_errors, a failed model call raises instead of grading the
+    submission with error_evaluation() (the evaluation queue retries it).
     """
     # Pre-check for empty/template code to prevent high scores for "pass"
     stripped_code = code.strip()
@@ -23,7 +209,7 @@ def evaluate_code(code, language, problem_description, expected_output=None, tes
     )
     
     if is_empty_or_pass:
-        return {
+        return with_rubric_scores({
             'score': 0,
             'status': 'rejected',
             'feedback': 'Submission appears to be empty or just a template. Please implement the solution.',
@@ -32,12 +218,187 @@ def evaluate_code(code, language, problem_description, expected_output=None, tes
             'code_style': 'Template only - 0/20',
             'best_practices': 'N/A - 0/15',
             'suggestions': 'Start by writing the core logic of the problem.'
-        }
+        })
+
+    # Resubmissions and shared canonical solutions hit the cache instead of Groq
+    key = evaluation_cache.cache_key(code, language, problem_description, expected_output, test_cases, MODEL, PROMPT_VERSION)
+    cached = evaluation_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Problems with machine-readable test cases are run locally; the rest are graded by the LLM alone
+    cases = code_runner.parse_test_cases(test_cases, expected_output) if language in code_runner.SUPPORTED_LANGUAGES else []
+    report = None
+    if cases:
+        try:
+            report = code_runner.judge(code, language, cases)
+        except OSError as e:
+            print(f"Local judge unavailable, grading with the LLM only: {e}")
 
     try:
-        client = get_groq_client()
-        
-        prompt = f"""You are an expert code evaluator for an educational platform. 
+        if report:
+            result, cacheable = _evaluate_with_judge(code, language, problem_description, report, raise_errors)
+        else:
+            result, cacheable = _request_code_evaluation(code, language, problem_description, expected_output, test_cases)
+        if cacheable:
+            evaluation_cache.put(key, result, MODEL)
+        return result
+    except Exception as e:
+        print(f"AI Evaluation Error: {str(e)}")
+        if raise_errors:
+            raise
+        return error_evaluation()
+
+def _json_text(reply):
+    """Strip markdown fences and control characters around the model's JSON object"""
+    result_text = reply.strip()
+    
+    # Handle potential markdown code blocks
+    if '```' in result_text:
+        # Extract content between code blocks
+        matches = re.findall(r'```(?:json)?\s*([\s\S]*?)```', result_text)
+        if matches:
+            result_text = matches[0].strip()
+    
+    # Clean control characters that can break JSON parsing
+    result_text = re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', result_text)
+    
+    # Try to find JSON object in the response
+    json_match = re.search(r'\{[\s\S]*\}', result_text)
+    if json_match:
+        result_text = json_match.group()
+    return result_text
+
+def _evaluate_with_judge(code, language, problem_description, report, raise_errors=False):
+    """
+    Correctness (40 points) comes from the code_runner report of the test cases;
+    the LLM only grades efficiency, style and best practices (60 points).
+    Returns: (evaluation dict, whether it is worth caching)
+    """
+    correctness_points = round(40 * report['passed'] / report['total'])
+    if report['compile_error']:
+        correctness = 'Compilation failed - 0/40'
+    else:
+        correctness = f"Passed {report['passed']}/{report['total']} test cases - {correctness_points}/40"
+    
+    try:
+        style, cacheable = _request_style_evaluation(code, language, problem_description, report)
+    except Exception as e:
+        print(f"AI Style Evaluation Error: {str(e)}")
+        if raise_errors:
+            raise
+        style, cacheable = {
+            'feedback': 'Test cases were run; style review is unavailable right now.',
+            'efficiency': ('Unable to evaluate', None),
+            'code_style': ('Unable to evaluate', None),
+            'best_practices': ('Unable to evaluate', None),
+            'suggestions': 'Please try submitting again for a style review.'
+        }, False
+    
+    score = correctness_points + sum(style[criterion][1] or 0 for criterion in ('efficiency', 'code_style', 'best_practices'))
+    all_passed = report['passed'] == report['total']
+    feedback = style['feedback']
+    if not all_passed:
+        feedback = f"Your code passed {report['passed']} of {report['total']} test cases. {feedback}"
+    
+    return with_rubric_scores({
+        'score': min(100, max(0, score)),
+        'status': 'accepted' if all_passed and score >= 60 else 'rejected',
+        'feedback': feedback,
+        'correctness': correctness,
+        'efficiency': f"{style['efficiency'][0]} - {style['efficiency'][1] or 0}/25",
+        'code_style': f"{style['code_style'][0]} - {style['code_style'][1] or 0}/20",
+        'best_practices': f"{style['best_practices'][0]} - {style['best_practices'][1] or 0}/15",
+        'suggestions': style['suggestions'],
+        'execution': report
+    }, {
+        'correctness': correctness_points,
+        'efficiency': style['efficiency'][1],
+        'code_style': style['code_style'][1],
+        'best_practices': style['best_practices'][1]
+    }), cacheable
+
+def _request_style_evaluation(code, language, problem_description, report):
+    """
+    Ask Groq to grade everything except correctness, which the judge has settled.
+    Raises on API errors. Returns: (style dict, whether it is a clean parse)
+    """
+    verdicts = ', '.join(f"case {i + 1}: {c['verdict']}" for i, c in enumerate(report['cases']))
+    prompt = f"""You are an expert code reviewer for an educational platform.
+The following {language} submission has already been run against the test cases:
+{report['passed']}/{report['total']} passed ({verdicts}).
+{'It failed to compile: ' + report['compile_error'] if report['compile_error'] else ''}
+
+Do NOT judge correctness. Grade only:
+1. **Efficiency** (0-25): time/space complexity for the problem
+2. **Code Style** (0-20): readability, naming, structure
+3. **Best Practices** (0-15): idiomatic use of the language, edge-case handling
+4. **Feedback**: A brief message to show the student (2-3 sentences)
+5. **Suggestions**: One line with improvement suggestions
+
+**Problem Description:**
+{problem_description}
+
+**Student's Code:**
+```{language}
+{code}
+```
+
+Respond in the following JSON format only:
+{{
+    "efficiency_score": <0-25>,
+    "efficiency": "<one line analysis like 'O(n) time complexity'>",
+    "code_style_score": <0-20>,
+    "code_style": "<one line analysis>",
+    "best_practices_score": <0-15>,
+    "best_practices": "<one line analysis>",
+    "feedback": "<brief feedback for student>",
+    "suggestions": "<one line improvement suggestion>"
+}}
+"""
+    response = _chat_completion(
+        'evaluate_style',
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": "You are a strict code reviewer. Always respond with valid JSON only, no additional text."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,
+        max_tokens=600
+    )
+    
+    result_text = _json_text(response.choices[0].message.content)
+    try:
+        result = json.loads(result_text)
+        cacheable = True
+    except json.JSONDecodeError:
+        result = {}
+        for field in ('efficiency_score', 'code_style_score', 'best_practices_score'):
+            match = re.search(rf'"{field}"\s*:\s*(\d+)', result_text)
+            if match:
+                result[field] = int(match.group(1))
+        cacheable = False
+    
+    def points(field, maximum):
+        try:
+            return min(maximum, max(0, int(result.get(field, 0))))
+        except (TypeError, ValueError):
+            return 0
+    
+    return {
+        'feedback': result.get('feedback', 'Your solution has been evaluated.'),
+        'efficiency': (result.get('efficiency', 'Efficiency evaluated'), points('efficiency_score', 25)),
+        'code_style': (result.get('code_style', 'Code style evaluated'), points('code_style_score', 20)),
+        'best_practices': (result.get('best_practices', 'Best practices evaluated'), points('best_practices_score', 15)),
+        'suggestions': result.get('suggestions', 'No specific suggestions.')
+    }, cacheable
+
+def _request_code_evaluation(code, language, problem_description, expected_output, test_cases):
+    """
+    Ask Groq to grade the code. Raises on API errors.
+    Returns: (evaluation dict, whether it is a clean parse worth caching)
+    """
+    prompt = f"""You are an expert code evaluator for an educational platform. 
 Evaluate the following {language} code submission for the given problem.
 
 **Problem Description:**
@@ -70,95 +431,68 @@ Respond in the following JSON format only:
     "score": <number>,
     "status": "<accepted/rejected>",
     "feedback": "<brief feedback for student>",
+    "correctness_score": <0-40>,
     "correctness": "<one line analysis with score like 'Correct implementation - 38/40'>",
+    "efficiency_score": <0-25>,
     "efficiency": "<one line analysis with score like 'O(n) time complexity - 22/25'>",
+    "code_style_score": <0-20>,
     "code_style": "<one line analysis with score like 'Clean and readable - 18/20'>",
+    "best_practices_score": <0-15>,
     "best_practices": "<one line analysis with score like 'Good naming conventions - 12/15'>",
     "suggestions": "<one line improvement suggestion>"
 }}
 """
+    
+    response = _chat_completion(
+        'evaluate_code',
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": "You are an expert code evaluator. You are STRICT. Empty or boilerplate code gets 0 score. Always respond with valid JSON only, no additional text."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,
+        max_tokens=1000
+    )
+    
+    result_text = _json_text(response.choices[0].message.content)
+    
+    try:
+        result = json.loads(result_text)
+    except json.JSONDecodeError:
+        # If JSON parsing fails, try to extract values manually
+        score_match = re.search(r'"score"\s*:\s*(\d+)', result_text)
+        score = int(score_match.group(1)) if score_match else 0  # Default to 0 on error if unsure
         
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
-                {"role": "system", "content": "You are an expert code evaluator. You are STRICT. Empty or boilerplate code gets 0 score. Always respond with valid JSON only, no additional text."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=1000
-        )
-        
-        result_text = response.choices[0].message.content.strip()
-        
-        # Parse JSON response
-        import json
-        import re
-        
-        # Handle potential markdown code blocks
-        if '```' in result_text:
-            # Extract content between code blocks
-            matches = re.findall(r'```(?:json)?\s*([\s\S]*?)```', result_text)
-            if matches:
-                result_text = matches[0].strip()
-        
-        # Clean control characters that can break JSON parsing
-        result_text = re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', result_text)
-        
-        # Try to find JSON object in the response
-        json_match = re.search(r'\{[\s\S]*\}', result_text)
-        if json_match:
-            result_text = json_match.group()
-        
-        try:
-            result = json.loads(result_text)
-        except json.JSONDecodeError:
-            # If JSON parsing fails, try to extract values manually
-            score_match = re.search(r'"score"\s*:\s*(\d+)', result_text)
-            score = int(score_match.group(1)) if score_match else 0  # Default to 0 on error if unsure
-            
-            return {
-                'score': min(100, max(0, score)),
-                'status': 'accepted' if score >= 60 else 'rejected',
-                'feedback': 'Your solution has been evaluated.',
-                'correctness': f'Code analysis completed - {int(score * 0.4)}/40',
-                'efficiency': f'Efficiency evaluated - {int(score * 0.25)}/25',
-                'code_style': f'Code style reviewed - {int(score * 0.2)}/20',
-                'best_practices': f'Best practices checked - {int(score * 0.15)}/15',
-                'suggestions': 'Review code for potential improvements.'
-            }
-        
-        return {
-            'score': min(100, max(0, int(result.get('score', 0)))),
-            'status': 'accepted' if result.get('status', '').lower() == 'accepted' else 'rejected',
-            'feedback': result.get('feedback', 'Evaluation completed.'),
-            'correctness': result.get('correctness', 'Correctness evaluated'),
-            'efficiency': result.get('efficiency', 'Efficiency evaluated'),
-            'code_style': result.get('code_style', 'Code style evaluated'),
-            'best_practices': result.get('best_practices', 'Best practices evaluated'),
-            'suggestions': result.get('suggestions', 'No specific suggestions.')
-        }
-        
-    except Exception as e:
-        print(f"AI Evaluation Error: {str(e)}")
-        return {
-            'score': 0,
-            'status': 'rejected',
-            'feedback': f'AI evaluation error. Please try again.',
-            'correctness': 'Unable to evaluate - 0/40',
-            'efficiency': 'Unable to evaluate - 0/25',
-            'code_style': 'Unable to evaluate - 0/20',
-            'best_practices': 'Unable to evaluate - 0/15',
-            'suggestions': 'Please try submitting again.'
-        }
-
-def evaluate_task_submission(content, task_description):
+        # Degraded parse: usable now, but not worth reusing for later submissions
+        return with_rubric_scores({
+            'score': min(100, max(0, score)),
+            'status': 'accepted' if score >= 60 else 'rejected',
+            'feedback': 'Your solution has been evaluated.',
+            'correctness': f'Code analysis completed - {int(score * 0.4)}/40',
+            'efficiency': f'Efficiency evaluated - {int(score * 0.25)}/25',
+            'code_style': f'Code style reviewed - {int(score * 0.2)}/20',
+            'best_practices': f'Best practices checked - {int(score * 0.15)}/15',
+            'suggestions': 'Review code for potential improvements.'
+        }), False
+    
+    return with_rubric_scores({
+        'score': min(100, max(0, int(result.get('score', 0)))),
+        'status': 'accepted' if result.get('status', '').lower() == 'accepted' else 'rejected',
+        'feedback': result.get('feedback', 'Evaluation completed.'),
+        'correctness': result.get('correctness', 'Correctness evaluated'),
+        'efficiency': result.get('efficiency', 'Efficiency evaluated'),
+        'code_style': result.get('code_style', 'Code style evaluated'),
+        'best_practices': result.get('best_practices', 'Best practices evaluated'),
+        'suggestions': result.get('suggestions', 'No specific suggestions.')
+    }, _graded_scores(result)), True
+
+def evaluate_task_submission(content, task_description, raise_errors=False):
     """
     Evaluate task submission using Groq AI
     Returns: dict with score, status, feedback, and structured evaluation
+    With raise_errors, a failed model call raises (see evaluate_code).
     """
     try:
-        client = get_groq_client()
-        
         prompt = f"""You are an expert assignment evaluator for an educational platform.
 Evaluate the following task submission.
 
@@ -183,16 +517,21 @@ Respond in the following JSON format only:
     "score": <number>,
     "status": "<accepted/rejected>",
     "feedback": "<brief feedback for student>",
+    "correctness_score": <0-40>,
     "correctness": "<one line analysis with score like 'Complete and accurate answer - 36/40'>",
+    "efficiency_score": <0-25>,
     "efficiency": "<one line analysis with score like 'Clear approach - 20/25'>",
+    "code_style_score": <0-20>,
     "code_style": "<one line analysis with score like 'Well presented - 17/20'>",
+    "best_practices_score": <0-15>,
     "best_practices": "<one line analysis with score like 'Good effort shown - 12/15'>",
     "suggestions": "<one line improvement suggestion>"
 }}
 """
         
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
+        response = _chat_completion(
+            'evaluate_task',
+            model=MODEL,
             messages=[
                 {"role": "system", "content": "You are an expert assignment evaluator. Always respond with valid JSON only, no additional text."},
                 {"role": "user", "content": prompt}
@@ -227,7 +566,7 @@ Respond in the following JSON format only:
             score_match = re.search(r'"score"\s*:\s*(\d+)', result_text)
             score = int(score_match.group(1)) if score_match else 75
             
-            return {
+            return with_rubric_scores({
                 'score': min(100, max(0, score)),
                 'status': 'accepted' if score >= 60 else 'rejected',
                 'feedback': 'Your submission has been evaluated.',
@@ -236,9 +575,9 @@ Respond in the following JSON format only:
                 'code_style': f'Presentation reviewed - {int(score * 0.2)}/20',
                 'best_practices': f'Best practices checked - {int(score * 0.15)}/15',
                 'suggestions': 'Review submission for potential improvements.'
-            }
+            })
         
-        return {
+        return with_rubric_scores({
             'score': min(100, max(0, int(result.get('score', 0)))),
             'status': 'accepted' if result.get('status', '').lower() == 'accepted' else 'rejected',
             'feedback': result.get('feedback', 'Evaluation completed.'),
@@ -247,20 +586,13 @@ Respond in the following JSON format only:
             'code_style': result.get('code_style', 'Presentation evaluated'),
             'best_practices': result.get('best_practices', 'Best practices evaluated'),
             'suggestions': result.get('suggestions', 'No specific suggestions.')
-        }
+        }, _graded_scores(result))
         
     except Exception as e:
         print(f"AI Evaluation Error: {str(e)}")
-        return {
-            'score': 0,
-            'status': 'rejected',
-            'feedback': f'AI evaluation error. Please try again.',
-            'correctness': 'Unable to evaluate - 0/40',
-            'efficiency': 'Unable to evaluate - 0/25',
-            'code_style': 'Unable to evaluate - 0/20',
-            'best_practices': 'Unable to evaluate - 0/15',
-            'suggestions': 'Please try submitting again.'
-        }
+        if raise_errors:
+            raise
+        return error_evaluation()
 
 def get_code_hints(code, language, problem_description):
     """
@@ -270,8 +602,6 @@ def get_code_hints(code, language, problem_description):
         return "Hints are not available. Please configure your GROQ_API_KEY in the .env file to enable AI hints."
     
     try:
-        client = get_groq_client()
-        
         prompt = f"""You are a helpful coding tutor. A student is working on the following problem and seems stuck.
 
 **Problem:**
@@ -287,8 +617,9 @@ Be encouraging and guide them towards the right approach.
 Format your hints as numbered bullet points.
 """
         
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
+        response = _chat_completion(
+            'code_hints',
+            model=MODEL,
             messages=[
                 {"role": "system", "content": "You are a helpful and encouraging coding tutor."},
                 {"role": "user", "content": prompt}
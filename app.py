@@ -1,8 +1,7 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, send_from_directory
 from flask_cors import CORS
 from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
-import re
 import secrets
 from functools import wraps
 import os
@@ -10,14 +9,32 @@ import json
 from datetime import datetime
 
 from config import Config
-from database import get_db, init_db, seed_db
-from ai_evaluator import evaluate_code, evaluate_task_submission
-from plagiarism_checker import check_plagiarism
+from database import get_db, init_db, seed_db, init_app as init_db_pool, pool_stats
+from ai_evaluator import RUBRIC, get_code_hints, llm_metrics, rubric_scores
+from evaluation_queue import get_queue, structured_evaluation
+import evaluation_cache
+import leaderboard
+from ttl_cache import TTLCache
+from activity_logger import get_activity_logger
+from pagination import apply_filters, keyset_page, page_response
+from delta_sync import (CHILDREN, catalog_delta, decode_cursor as decode_sync_cursor, delta_response,
+                        snapshot_cursor, submission_delta, sync_response)
+from etags import data_version, is_fresh, make_etag, not_modified, tag_response
+from worker_pool import get_worker_pool
+from plagiarism_checker import check_plagiarism, code_signature, index_submission
+from event_stream import get_broker
+import aptitude_keys
+import aptitude_regrade
+import aptitude_items
+import json_stream
+from aptitude_ingest import AttemptLimitReached, IngestUnavailable, get_ingestor
 import json as json_lib
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 app.config.from_object(Config)
 CORS(app)
+init_db_pool(app)
+get_queue().add_listener(leaderboard.on_graded)
 
 # Ensure upload folder exists
 os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
@@ -62,6 +79,8 @@ def index():
             return redirect(url_for('student_dashboard'))
     return redirect(url_for('login'))
 
+USER_BY_EMAIL_SQL = 'SELECT * FROM users WHERE email = %s'
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -71,7 +90,7 @@ def login():
         
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE email = %s', (email,))
+        cursor.execute(USER_BY_EMAIL_SQL, (email,))
         user = cursor.fetchone()
         conn.close()
         
@@ -197,50 +216,105 @@ def admin_problems():
 def admin_aptitude():
     return render_template('admin/aptitude.html')
 
+# ============================================
+# Delta Sync (see delta_sync.py)
+# ============================================
+
+def catalog_owner():
+    """Every task/problem/test the current user could be shown, on a table or sync_tombstones aliased `o`"""
+    if session['role'] == 'student':
+        return "o.mentor_id = %s OR o.mentor_id IN (SELECT id FROM users WHERE role='admin')", [session.get('mentor_id')]
+    if session['role'] == 'mentor':
+        return 'o.mentor_id = %s', [session['user_id']]
+    return 'TRUE', []
+
+def list_catalog(table, query, params, expires_column=None):
+    """
+    Run a catalog list query, or with ?since=<cursor> only the rows that changed
+    since; 304 when the client's ETag is still current (see etags.py)
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    since = request.args.get('since')
+    try:
+        position = decode_sync_cursor(since) if since else None
+    except ValueError as e:
+        conn.close()
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    # Tables behind the list's columns; users for mentor names and student counts
+    expiry = None
+    if expires_column:
+        expiry = f'(SELECT MIN({expires_column}) FROM {table} WHERE {expires_column} > CURRENT_TIMESTAMP)'
+    etag = make_etag(data_version(cursor, [table, CHILDREN[table][0], 'users'], expiry))
+    if is_fresh(etag):
+        conn.close()
+        return not_modified(etag)
+
+    token = snapshot_cursor(cursor)
+    if position:
+        student = session['role'] == 'student'
+        changed, deleted = catalog_delta(
+            cursor, table, query, params, *catalog_owner(), *position,
+            student_id=session['user_id'] if student else None,
+            expires_column=expires_column if student else None
+        )
+        conn.close()
+        return tag_response(delta_response(changed, deleted, token), etag)
+
+    cursor.execute(query, params)
+    rows = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return tag_response(sync_response(rows, token), etag)
+
 # ============================================
 # API Routes - Tasks
 # ============================================
 
+TASK_LIST_SQL = {
+    'student': '''
+        SELECT t.*, u.name as mentor_name,
+               (SELECT COUNT(*) FROM task_submissions ts WHERE ts.task_id = t.id AND ts.student_id = %s) as submitted
+        FROM tasks t
+        JOIN users u ON t.mentor_id = u.id
+        WHERE (t.mentor_id = %s OR t.mentor_id IN (SELECT id FROM users WHERE role='admin')) AND t.is_active = 1
+        ORDER BY t.created_at DESC
+    ''',
+    'mentor': '''
+        SELECT t.*, 
+               (SELECT COUNT(DISTINCT ts.student_id) FROM task_submissions ts WHERE ts.task_id = t.id) as submissions_count,
+               (SELECT COUNT(*) FROM users WHERE mentor_id = t.mentor_id AND role = 'student') as total_students
+        FROM tasks t
+        WHERE t.mentor_id = %s
+        ORDER BY t.created_at DESC
+    ''',
+    'admin': '''
+        SELECT t.*, u.name as mentor_name,
+               (SELECT COUNT(DISTINCT ts.student_id) FROM task_submissions ts WHERE ts.task_id = t.id) as submissions_count,
+               (SELECT COUNT(*) FROM users WHERE role = 'student' AND (u.role = 'admin' OR mentor_id = u.id)) as total_students
+        FROM tasks t
+        JOIN users u ON t.mentor_id = u.id
+        ORDER BY t.created_at DESC
+    ''',
+}
+
 @app.route('/api/tasks', methods=['GET'])
 @login_required
 def get_tasks():
-    conn = get_db()
-    cursor = conn.cursor()
-    
     if session['role'] == 'student':
         # Get tasks from student's mentor
-        cursor.execute('''
-            SELECT t.*, u.name as mentor_name,
-                   (SELECT COUNT(*) FROM task_submissions ts WHERE ts.task_id = t.id AND ts.student_id = %s) as submitted
-            FROM tasks t
-            JOIN users u ON t.mentor_id = u.id
-            WHERE (t.mentor_id = %s OR t.mentor_id IN (SELECT id FROM users WHERE role='admin')) AND t.is_active = 1
-            ORDER BY t.created_at DESC
-        ''', (session['user_id'], session['mentor_id']))
+        query = TASK_LIST_SQL['student']
+        params = (session['user_id'], session['mentor_id'])
     elif session['role'] == 'mentor':
         # Get mentor's own tasks with submission count
-        cursor.execute('''
-            SELECT t.*, 
-                   (SELECT COUNT(DISTINCT ts.student_id) FROM task_submissions ts WHERE ts.task_id = t.id) as submissions_count,
-                   (SELECT COUNT(*) FROM users WHERE mentor_id = t.mentor_id AND role = 'student') as total_students
-            FROM tasks t
-            WHERE t.mentor_id = %s
-            ORDER BY t.created_at DESC
-        ''', (session['user_id'],))
+        query = TASK_LIST_SQL['mentor']
+        params = (session['user_id'],)
     else:
         # Admin sees all tasks
-        cursor.execute('''
-            SELECT t.*, u.name as mentor_name,
-                   (SELECT COUNT(DISTINCT ts.student_id) FROM task_submissions ts WHERE ts.task_id = t.id) as submissions_count,
-                   (SELECT COUNT(*) FROM users WHERE role = 'student' AND (u.role = 'admin' OR mentor_id = u.id)) as total_students
-            FROM tasks t
-            JOIN users u ON t.mentor_id = u.id
-            ORDER BY t.created_at DESC
-        ''')
-    
-    tasks = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(tasks)
+        query = TASK_LIST_SQL['admin']
+        params = ()
+
+    return list_catalog('tasks', query, params)
 
 @app.route('/api/tasks', methods=['POST'])
 @role_required(['mentor', 'admin'])
@@ -276,7 +350,8 @@ def delete_task(task_id):
         return jsonify({'success': False, 'message': 'Unauthorized'}), 403
     
     cursor.execute('DELETE FROM tasks WHERE id = %s', (task_id,))
-    cursor.execute('DELETE FROM task_submissions WHERE task_id = %s', (task_id,))
+    cursor.execute('DELETE FROM task_submissions WHERE task_id = %s RETURNING student_id', (task_id,))
+    leaderboard.refresh_students(cursor, [row['student_id'] for row in cursor.fetchall()])
     conn.commit()
     conn.close()
     
@@ -307,43 +382,47 @@ def toggle_task(task_id):
 # API Routes - Problems
 # ============================================
 
+PROBLEM_LIST_SQL = {
+    'student': '''
+        SELECT p.*, u.name as mentor_name,
+               (SELECT COUNT(*) FROM problem_submissions ps WHERE ps.problem_id = p.id AND ps.student_id = %s) as submitted
+        FROM problems p
+        JOIN users u ON p.mentor_id = u.id
+        WHERE (p.mentor_id = %s OR p.mentor_id IN (SELECT id FROM users WHERE role='admin')) AND p.is_active = 1
+        ORDER BY p.created_at DESC
+    ''',
+    'mentor': '''
+        SELECT p.*, 
+               (SELECT COUNT(DISTINCT ps.student_id) FROM problem_submissions ps WHERE ps.problem_id = p.id) as submissions_count,
+               (SELECT COUNT(*) FROM users WHERE mentor_id = p.mentor_id AND role = 'student') as total_students
+        FROM problems p
+        WHERE p.mentor_id = %s
+        ORDER BY p.created_at DESC
+    ''',
+    'admin': '''
+        SELECT p.*, u.name as mentor_name,
+               (SELECT COUNT(DISTINCT ps.student_id) FROM problem_submissions ps WHERE ps.problem_id = p.id) as submissions_count,
+               (SELECT COUNT(*) FROM users WHERE role = 'student' AND (u.role = 'admin' OR mentor_id = u.id)) as total_students
+        FROM problems p
+        JOIN users u ON p.mentor_id = u.id
+        ORDER BY p.created_at DESC
+    ''',
+}
+
 @app.route('/api/problems', methods=['GET'])
 @login_required
 def get_problems():
-    conn = get_db()
-    cursor = conn.cursor()
-    
     if session['role'] == 'student':
-        cursor.execute('''
-            SELECT p.*, u.name as mentor_name,
-                   (SELECT COUNT(*) FROM problem_submissions ps WHERE ps.problem_id = p.id AND ps.student_id = %s) as submitted
-            FROM problems p
-            JOIN users u ON p.mentor_id = u.id
-            WHERE (p.mentor_id = %s OR p.mentor_id IN (SELECT id FROM users WHERE role='admin')) AND p.is_active = 1
-            ORDER BY p.created_at DESC
-        ''', (session['user_id'], session['mentor_id']))
+        query = PROBLEM_LIST_SQL['student']
+        params = (session['user_id'], session['mentor_id'])
     elif session['role'] == 'mentor':
-        cursor.execute('''
-            SELECT p.*, 
-                   (SELECT COUNT(DISTINCT ps.student_id) FROM problem_submissions ps WHERE ps.problem_id = p.id) as submissions_count,
-                   (SELECT COUNT(*) FROM users WHERE mentor_id = p.mentor_id AND role = 'student') as total_students
-            FROM problems p
-            WHERE p.mentor_id = %s
-            ORDER BY p.created_at DESC
-        ''', (session['user_id'],))
+        query = PROBLEM_LIST_SQL['mentor']
+        params = (session['user_id'],)
     else:
-        cursor.execute('''
-            SELECT p.*, u.name as mentor_name,
-                   (SELECT COUNT(DISTINCT ps.student_id) FROM problem_submissions ps WHERE ps.problem_id = p.id) as submissions_count,
-                   (SELECT COUNT(*) FROM users WHERE role = 'student' AND (u.role = 'admin' OR mentor_id = u.id)) as total_students
-            FROM problems p
-            JOIN users u ON p.mentor_id = u.id
-            ORDER BY p.created_at DESC
-        ''')
-    
-    problems = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(problems)
+        query = PROBLEM_LIST_SQL['admin']
+        params = ()
+
+    return list_catalog('problems', query, params)
 
 @app.route('/api/problems/<int:problem_id>', methods=['GET'])
 @login_required
@@ -414,7 +493,8 @@ def delete_problem(problem_id):
         return jsonify({'success': False, 'message': 'Unauthorized'}), 403
     
     cursor.execute('DELETE FROM problems WHERE id = %s', (problem_id,))
-    cursor.execute('DELETE FROM problem_submissions WHERE problem_id = %s', (problem_id,))
+    cursor.execute('DELETE FROM problem_submissions WHERE problem_id = %s RETURNING student_id', (problem_id,))
+    leaderboard.refresh_students(cursor, [row['student_id'] for row in cursor.fetchall()])
     conn.commit()
     conn.close()
     
@@ -426,87 +506,221 @@ def delete_problem(problem_id):
 # API Routes - Submissions
 # ============================================
 
-@app.route('/api/task-submissions', methods=['GET'])
-@login_required
-def get_task_submissions():
+# List projections leave out code/content/evaluation blobs; the report modals
+# fetch those one submission at a time from /api/submissions/<type>/<id>
+TASK_SUBMISSION_LIST_SQL = '''
+    SELECT ts.id, ts.task_id, ts.student_id, ts.file_path, ts.submission_type,
+           ts.status, ts.score, ts.submitted_at,
+           t.title as task_title, u.name as student_name, m.name as mentor_name
+    FROM task_submissions ts
+    JOIN tasks t ON ts.task_id = t.id
+    JOIN users u ON ts.student_id = u.id
+    LEFT JOIN users m ON t.mentor_id = m.id
+'''
+
+PROBLEM_SUBMISSION_LIST_SQL = '''
+    SELECT ps.id, ps.problem_id, ps.student_id, ps.language, ps.file_path, ps.submission_type,
+           ps.status, ps.score, ps.submitted_at, ps.focus_lost_count, ps.paste_attempts,
+           ps.is_plagiarized, ps.plagiarism_score, ps.plagiarism_source_student_id,
+           p.title as problem_title, u.name as student_name, m.name as mentor_name,
+           source_u.name as plagiarism_source_name
+    FROM problem_submissions ps
+    JOIN problems p ON ps.problem_id = p.id
+    JOIN users u ON ps.student_id = u.id
+    LEFT JOIN users m ON p.mentor_id = m.id
+    LEFT JOIN users source_u ON ps.plagiarism_source_student_id = source_u.id
+'''
+
+APTITUDE_SUBMISSION_LIST_SQL = '''
+    SELECT s.id, s.student_id, s.test_id, s.score, s.total_questions, s.submitted_at,
+           s.focus_lost_count, s.paste_attempts,
+           t.title as test_title, u.name as student_name
+    FROM aptitude_submissions s
+    JOIN aptitude_tests t ON s.test_id = t.id
+    JOIN users u ON s.student_id = u.id
+'''
+
+def submission_scope(alias):
+    """Rows the current user may see: their own, their students', or all for admins"""
+    if session['role'] == 'student':
+        return [f'{alias}.student_id = %s'], [session['user_id']]
+    if session['role'] == 'mentor':
+        return ['u.mentor_id = %s'], [session['user_id']]
+    return [], []
+
+def submission_owner():
+    """submission_scope() for delta sync, on a bare submissions table or sync_tombstones aliased `o`"""
+    if session['role'] == 'student':
+        return 'o.student_id = %s', [session['user_id']]
+    if session['role'] == 'mentor':
+        return 'o.student_id IN (SELECT id FROM users WHERE mentor_id = %s)', [session['user_id']]
+    return 'TRUE', []
+
+def stream_list(sql, params, fmt):
+    try:
+        return json_stream.stream_query(sql, params, fmt)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except json_stream.TooManyStreams as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+
+def submission_list_sql(select_sql, alias, conditions):
+    """Every matching row, newest first: the streamed and unpaged form of a submission list"""
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    return f'{select_sql}{where} ORDER BY {alias}.submitted_at DESC, {alias}.id DESC'
+
+def list_submissions(select_sql, alias, table, filters, paginate=True):
+    """
+    One page of a submission list (see pagination.py), or with ?since=<cursor>
+    only what changed since that page was loaded (see delta_sync.py), or with
+    ?format=json|ndjson every matching row as a streamed export (see json_stream.py)
+    """
+    conditions, params = apply_filters(*submission_scope(alias), request.args, filters)
+    if request.args.get('format'):
+        return stream_list(submission_list_sql(select_sql, alias, conditions), params, request.args['format'])
     conn = get_db()
     cursor = conn.cursor()
-    
-    if session['role'] == 'student':
-        cursor.execute('''
-            SELECT ts.*, t.title as task_title, u.name as student_name
-            FROM task_submissions ts
-            JOIN tasks t ON ts.task_id = t.id
-            JOIN users u ON ts.student_id = u.id
-            WHERE ts.student_id = %s
-            ORDER BY ts.submitted_at DESC
-        ''', (session['user_id'],))
-    elif session['role'] == 'mentor':
-        cursor.execute('''
-            SELECT ts.*, t.title as task_title, u.name as student_name
-            FROM task_submissions ts
-            JOIN tasks t ON ts.task_id = t.id
-            JOIN users u ON ts.student_id = u.id
-            WHERE u.mentor_id = %s
-            ORDER BY ts.submitted_at DESC
-        ''', (session['user_id'],))
-    else:
-        cursor.execute('''
-            SELECT ts.*, t.title as task_title, u.name as student_name, m.name as mentor_name
-            FROM task_submissions ts
-            JOIN tasks t ON ts.task_id = t.id
-            JOIN users u ON ts.student_id = u.id
-            JOIN users m ON t.mentor_id = m.id
-            ORDER BY ts.submitted_at DESC
-        ''')
-    
-    submissions = [dict(row) for row in cursor.fetchall()]
+    try:
+        since = request.args.get('since')
+        position = decode_sync_cursor(since) if since else None
+        token = snapshot_cursor(cursor) if not request.args.get('cursor') else None
+        if position:
+            delta = submission_delta(cursor, select_sql, alias, table, conditions, params,
+                                     position[0], *submission_owner())
+            if delta is not None:
+                conn.close()
+                return delta_response(*delta, token)
+        if paginate:
+            rows, next_cursor = keyset_page(cursor, select_sql, alias, conditions, params, request.args, {})
+        else:
+            cursor.execute(submission_list_sql(select_sql, alias, conditions), params)
+            rows, next_cursor = [dict(row) for row in cursor.fetchall()], None
+    except ValueError as e:
+        conn.close()
+        return jsonify({'success': False, 'message': str(e)}), 400
     conn.close()
-    return jsonify(submissions)
+    if token is None:
+        return page_response(rows, next_cursor)
+    return sync_response(rows, token, next_cursor)
+
+@app.route('/api/task-submissions', methods=['GET'])
+@login_required
+def get_task_submissions():
+    return list_submissions(TASK_SUBMISSION_LIST_SQL, 'ts', 'task_submissions', {
+        'student_id': ('ts.student_id', int),
+        'task_id': ('ts.task_id', int),
+        'status': ('ts.status', str)
+    })
 
 @app.route('/api/problem-submissions', methods=['GET'])
 @login_required
 def get_problem_submissions():
+    return list_submissions(PROBLEM_SUBMISSION_LIST_SQL, 'ps', 'problem_submissions', {
+        'student_id': ('ps.student_id', int),
+        'problem_id': ('ps.problem_id', int),
+        'status': ('ps.status', str)
+    })
+
+# ============================================
+# Live Events (see event_stream.py)
+# ============================================
+
+SUBMISSION_LISTS = {
+    'task': (TASK_SUBMISSION_LIST_SQL, 'ts'),
+    'problem': (PROBLEM_SUBMISSION_LIST_SQL, 'ps'),
+    'aptitude': (APTITUDE_SUBMISSION_LIST_SQL, 's')
+}
+
+def publish_submission(cursor, event_type, kind, submission_id, update_leaderboard=True):
+    """
+    Push a 'submission' (new) or 'graded' event carrying the same row the list
+    endpoints return, to the student, their mentor and admins, then any
+    leaderboard rank changes it caused. Call after commit; never raises.
+    Returns the student's mentor_id.
+    """
+    try:
+        select_sql, alias = SUBMISSION_LISTS[kind]
+        cursor.execute(f'''
+            SELECT row.*, su.mentor_id AS student_mentor_id
+            FROM ({select_sql} WHERE {alias}.id = %s) row
+            JOIN users su ON su.id = row.student_id
+        ''', (submission_id,))
+        row = cursor.fetchone()
+        if not row:
+            return
+        row = dict(row)
+        mentor_id = row.pop('student_mentor_id')
+        channels = ['admin', f"student:{row['student_id']}"]
+        if mentor_id:
+            channels.append(f'mentor:{mentor_id}')
+        get_broker().publish(channels, event_type, {'kind': kind, 'submission': row})
+        if update_leaderboard:
+            publish_leaderboard(cursor, mentor_id)
+        return mentor_id
+    except Exception as e:
+        print(f"Error publishing {event_type} event for {kind}/{submission_id}: {e}")
+
+def publish_leaderboard(cursor, mentor_id):
+    """Send changed leaderboard rows (with their new rank) to whoever is watching that leaderboard"""
+    broker = get_broker()
+    scopes = [('admin', None)]
+    if mentor_id:
+        scopes.append((f'mentor:{mentor_id}', mentor_id))
+    for channel, scope in scopes:
+        if not broker.has_subscribers([channel]):
+            continue  # rank_changes() diffs against the last snapshot, so nothing is lost by skipping
+        rows = leaderboard.ranking(cursor, scope)
+        changed = broker.rank_changes(channel, rows)
+        if changed:
+            broker.publish([channel], 'leaderboard', {'mentor_id': scope, 'size': len(rows), 'students': changed})
+
+def publish_graded(kind, submission_id, evaluation):
+    """EvaluationQueue listener: runs on a grading thread, so it borrows its own connection"""
     conn = get_db()
-    cursor = conn.cursor()
-    
-    if session['role'] == 'student':
-        cursor.execute('''
-            SELECT ps.*, p.title as problem_title, u.name as student_name,
-                   source_u.name as plagiarism_source_name
-            FROM problem_submissions ps
-            JOIN problems p ON ps.problem_id = p.id
-            JOIN users u ON ps.student_id = u.id
-            LEFT JOIN users source_u ON ps.plagiarism_source_student_id = source_u.id
-            WHERE ps.student_id = %s
-            ORDER BY ps.submitted_at DESC
-        ''', (session['user_id'],))
-    elif session['role'] == 'mentor':
-        cursor.execute('''
-            SELECT ps.*, p.title as problem_title, u.name as student_name,
-                   source_u.name as plagiarism_source_name
-            FROM problem_submissions ps
-            JOIN problems p ON ps.problem_id = p.id
-            JOIN users u ON ps.student_id = u.id
-            LEFT JOIN users source_u ON ps.plagiarism_source_student_id = source_u.id
-            WHERE u.mentor_id = %s
-            ORDER BY ps.submitted_at DESC
-        ''', (session['user_id'],))
+    try:
+        publish_submission(conn.cursor(), 'graded', kind, submission_id)
+        conn.commit()
+    finally:
+        conn.close()
+
+get_queue().add_listener(publish_graded)
+
+def publish_ingested(rows):
+    """SubmissionIngestor listener: an event per new aptitude submission, then each affected leaderboard once"""
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        mentors = {publish_submission(cursor, 'submission', 'aptitude', row['id'], update_leaderboard=False) for row in rows}
+        for mentor_id in mentors:
+            try:
+                publish_leaderboard(cursor, mentor_id)
+            except Exception as e:
+                print(f"Error publishing leaderboard for mentor {mentor_id}: {e}")
+        conn.commit()
+    finally:
+        conn.close()
+
+get_ingestor().add_listener(publish_ingested)
+
+@app.route('/api/events/stream', methods=['GET'])
+@login_required
+def event_stream():
+    """text/event-stream of submission, grading and leaderboard events for the current user"""
+    if session['role'] == 'admin':
+        channels = ['admin']
     else:
-        cursor.execute('''
-            SELECT ps.*, p.title as problem_title, u.name as student_name, m.name as mentor_name,
-                   source_u.name as plagiarism_source_name
-            FROM problem_submissions ps
-            JOIN problems p ON ps.problem_id = p.id
-            JOIN users u ON ps.student_id = u.id
-            JOIN users m ON p.mentor_id = m.id
-            LEFT JOIN users source_u ON ps.plagiarism_source_student_id = source_u.id
-            ORDER BY ps.submitted_at DESC
-        ''')
-    
-    submissions = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(submissions)
+        channels = [f"{session['role']}:{session['user_id']}"]
+
+    broker = get_broker()
+    subscription, backlog = broker.subscribe(channels, request.headers.get('Last-Event-ID'))
+    if subscription is None:
+        return jsonify({'success': False, 'message': 'Too many live connections'}), 503
+
+    response = Response(broker.stream(subscription, backlog), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # no proxy buffering
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    return response
 
 @app.route('/api/submit-task', methods=['POST'])
 @role_required(['student'])
@@ -537,50 +751,33 @@ def submit_task():
             file.save(file_path)
             content = file.read().decode('utf-8', errors='ignore') if not file_path.endswith(('.pdf', '.doc', '.docx')) else f"[File: {filename}]"
     
-    # AI Evaluation
-    evaluation = evaluate_task_submission(content, task['description'])
-    
-    # Store structured evaluation as JSON
-    structured_eval = {
-        'correctness': evaluation.get('correctness', 'N/A'),
-        'efficiency': evaluation.get('efficiency', 'N/A'),
-        'code_style': evaluation.get('code_style', 'N/A'),
-        'best_practices': evaluation.get('best_practices', 'N/A'),
-        'suggestions': evaluation.get('suggestions', 'N/A')
-    }
-    
+    # Persist now; the AI evaluation runs on the background grading pool
     cursor.execute('''
-        INSERT INTO task_submissions (task_id, student_id, file_path, content, submission_type, status, score, ai_feedback, ai_explanation)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        INSERT INTO task_submissions (task_id, student_id, file_path, content, submission_type, status)
+        VALUES (%s, %s, %s, %s, %s, 'pending')
      RETURNING id''', (
         task_id,
         session['user_id'],
         file_path,
         content,
-        submission_type,
-        evaluation['status'],
-        evaluation['score'],
-        evaluation['feedback'],
-        json_lib.dumps(structured_eval)
+        submission_type
     ))
     
     submission_id = cursor.fetchone()['id']
+    leaderboard.refresh_students(cursor, [session['user_id']])
     conn.commit()
+    publish_submission(cursor, 'submission', 'task', submission_id)
     conn.close()
     
+    get_queue().enqueue('task', submission_id)
     log_activity(session['user_id'], 'submit_task', f'Submitted task ID: {task_id}')
     
     return jsonify({
         'success': True,
         'submission_id': submission_id,
-        'status': evaluation['status'],
-        'score': evaluation['score'],
-        'feedback': evaluation['feedback'],
-        'correctness': evaluation.get('correctness', ''),
-        'efficiency': evaluation.get('efficiency', ''),
-        'code_style': evaluation.get('code_style', ''),
-        'best_practices': evaluation.get('best_practices', ''),
-        'suggestions': evaluation.get('suggestions', '')
+        'status': 'pending',
+        'score': 0,
+        'feedback': 'Your submission has been received and is being evaluated.'
     })
 
 @app.route('/api/submit-problem', methods=['POST'])
@@ -603,8 +800,9 @@ def submit_problem():
     if not problem:
         return jsonify({'success': False, 'message': 'Problem not found'}), 404
     
-    # Check for Plagiarism
-    is_plagiarized, similarity, source_student_id = check_plagiarism(code, problem_id, session['user_id'], cursor)
+    # Check for Plagiarism (normalized form, hash and fingerprint are computed once and stored)
+    signature = code_signature(code, language)
+    is_plagiarized, similarity, source_student_id = check_plagiarism(code, problem_id, session['user_id'], cursor, signature)
     
     focus_lost_count = data.get('focus_lost_count', 0)
     paste_attempts = data.get('paste_attempts', 0)
@@ -633,27 +831,16 @@ def submit_problem():
             'suggestions': 'Maintain focus and typing manually is required.'
         }
     else:
-        # AI Evaluation
-        evaluation = evaluate_code(
-            code,
-            language,
-            problem['description'],
-            problem['expected_output'],
-            problem['test_cases']
-        )
-    
-    # Store structured evaluation as JSON
-    structured_eval = {
-        'correctness': evaluation.get('correctness', 'N/A'),
-        'efficiency': evaluation.get('efficiency', 'N/A'),
-        'code_style': evaluation.get('code_style', 'N/A'),
-        'best_practices': evaluation.get('best_practices', 'N/A'),
-        'suggestions': evaluation.get('suggestions', 'N/A')
-    }
+        # Graded later by the background pool
+        evaluation = {
+            'score': 0,
+            'status': 'pending',
+            'feedback': 'Your submission has been received and is being evaluated.'
+        }
     
     cursor.execute('''
-        INSERT INTO problem_submissions (problem_id, student_id, code, language, submission_type, status, score, ai_feedback, ai_explanation, is_plagiarized, plagiarism_score, plagiarism_source_student_id, focus_lost_count, paste_attempts)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        INSERT INTO problem_submissions (problem_id, student_id, code, language, submission_type, status, score, ai_feedback, ai_explanation, correctness_score, efficiency_score, code_style_score, best_practices_score, is_plagiarized, plagiarism_score, plagiarism_source_student_id, focus_lost_count, paste_attempts, normalized_code, code_hash, fingerprint)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::bigint[])
      RETURNING id''', (
         problem_id,
         session['user_id'],
@@ -662,19 +849,28 @@ def submit_problem():
         submission_type,
         evaluation['status'],
         evaluation['score'],
-        evaluation['feedback'],
-        json_lib.dumps(structured_eval),
+        None if evaluation['status'] == 'pending' else evaluation['feedback'],
+        None if evaluation['status'] == 'pending' else json_lib.dumps(structured_evaluation(evaluation)),
+        *rubric_scores(evaluation).values(),
         is_plagiarized,
         similarity if is_plagiarized else 0.0,
         source_student_id if is_plagiarized else None,
         focus_lost_count,
-        paste_attempts
+        paste_attempts,
+        signature['normalized_code'],
+        signature['code_hash'],
+        signature['fingerprint']
     ))
     
     submission_id = cursor.fetchone()['id']
+    index_submission(cursor, submission_id, problem_id, session['user_id'], code, signature['fingerprint'])
+    leaderboard.refresh_students(cursor, [session['user_id']])
     conn.commit()
+    publish_submission(cursor, 'submission', 'problem', submission_id)
     conn.close()
     
+    if evaluation['status'] == 'pending':
+        get_queue().enqueue('problem', submission_id)
     log_activity(session['user_id'], 'submit_problem', f'Submitted problem ID: {problem_id}')
     
     return jsonify({
@@ -690,6 +886,94 @@ def submit_problem():
         'suggestions': evaluation.get('suggestions', '')
     })
 
+SUBMISSION_DETAIL_SQL = {
+    'task': '''
+        SELECT ts.*, t.title as task_title, u.name as student_name, u.mentor_id as student_mentor_id,
+               m.name as mentor_name
+        FROM task_submissions ts
+        JOIN tasks t ON ts.task_id = t.id
+        JOIN users u ON ts.student_id = u.id
+        LEFT JOIN users m ON t.mentor_id = m.id
+        WHERE ts.id = %s
+    ''',
+    'problem': '''
+        SELECT ps.*, p.title as problem_title, u.name as student_name, u.mentor_id as student_mentor_id,
+               m.name as mentor_name, source_u.name as plagiarism_source_name
+        FROM problem_submissions ps
+        JOIN problems p ON ps.problem_id = p.id
+        JOIN users u ON ps.student_id = u.id
+        LEFT JOIN users m ON p.mentor_id = m.id
+        LEFT JOIN users source_u ON ps.plagiarism_source_student_id = source_u.id
+        WHERE ps.id = %s
+    ''',
+    'aptitude': '''
+        SELECT s.*, t.title as test_title, s.total_questions as q_count,
+               u.name as student_name, u.mentor_id as student_mentor_id
+        FROM aptitude_submissions s
+        JOIN aptitude_tests t ON s.test_id = t.id
+        JOIN users u ON s.student_id = u.id
+        WHERE s.id = %s
+    '''
+}
+
+@app.route('/api/submissions/<string:type>/<int:submission_id>', methods=['GET'])
+@login_required
+def get_submission_detail(type, submission_id):
+    """Full row, including code and evaluation, for one submission's report"""
+    if type not in SUBMISSION_DETAIL_SQL:
+        return jsonify({'success': False, 'message': 'Unknown submission type'}), 404
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(SUBMISSION_DETAIL_SQL[type], (submission_id,))
+    submission = cursor.fetchone()
+    conn.close()
+    
+    if not submission:
+        return jsonify({'success': False, 'message': 'Submission not found'}), 404
+    submission = dict(submission)
+    student_mentor_id = submission.pop('student_mentor_id')
+    for column in ('normalized_code', 'code_hash', 'fingerprint'):  # plagiarism internals
+        submission.pop(column, None)
+    if session['role'] == 'student' and submission['student_id'] != session['user_id']:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    if session['role'] == 'mentor' and student_mentor_id != session['user_id']:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    return jsonify(submission)
+
+@app.route('/api/submissions/<string:type>/<int:submission_id>/result', methods=['GET'])
+@login_required
+def get_submission_result(type, submission_id):
+    """Polled by the student pages until the background grade is in"""
+    if type not in ('task', 'problem'):
+        return jsonify({'success': False, 'message': 'Unknown submission type'}), 404
+    table = 'task_submissions' if type == 'task' else 'problem_submissions'
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT student_id, status, score, ai_feedback, ai_explanation FROM {table} WHERE id = %s', (submission_id,))
+    submission = cursor.fetchone()
+    conn.close()
+    
+    if not submission:
+        return jsonify({'success': False, 'message': 'Submission not found'}), 404
+    if session['role'] == 'student' and submission['student_id'] != session['user_id']:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    
+    result = {
+        'success': True,
+        'submission_id': submission_id,
+        'status': submission['status'],
+        'score': submission['score'],
+        'feedback': submission['ai_feedback'] or ''
+    }
+    if submission['ai_explanation']:
+        try:
+            result.update(json_lib.loads(submission['ai_explanation']))
+        except ValueError:
+            pass
+    return jsonify(result)
+
 @app.route('/api/submissions/<string:type>/<int:submission_id>', methods=['DELETE'])
 @role_required(['student'])
 def delete_submission(type, submission_id):
@@ -705,6 +989,7 @@ def delete_submission(type, submission_id):
         return jsonify({'success': False, 'message': 'Unauthorized'}), 403
     
     cursor.execute(f'DELETE FROM {table} WHERE id = %s', (submission_id,))
+    leaderboard.refresh_students(cursor, [session['user_id']])
     conn.commit()
     conn.close()
     
@@ -743,21 +1028,19 @@ def get_hints():
 # API Routes - Users (Admin)
 # ============================================
 
+USER_LIST_SQL = '''
+    SELECT u.id, u.email, u.name, u.role, u.mentor_id, u.created_at,
+           m.name as mentor_name
+    FROM users u
+    LEFT JOIN users m ON u.mentor_id = m.id
+    ORDER BY u.role, u.name
+'''
+
 @app.route('/api/users', methods=['GET'])
 @role_required(['admin'])
 def get_users():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT u.id, u.email, u.name, u.role, u.mentor_id, u.created_at,
-               m.name as mentor_name
-        FROM users u
-        LEFT JOIN users m ON u.mentor_id = m.id
-        ORDER BY u.role, u.name
-    ''')
-    users = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(users)
+    # Streamed: the same JSON array (or ?format=ndjson) without holding every user in memory
+    return stream_list(USER_LIST_SQL, (), request.args.get('format', 'json'))
 
 @app.route('/api/users', methods=['POST'])
 @role_required(['admin'])
@@ -782,6 +1065,8 @@ def create_user():
         ))
         
         user_id = cursor.fetchone()['id']
+        if data['role'] == 'student':
+            leaderboard.refresh_students(cursor, [user_id])
         conn.commit()
         conn.close()
         
@@ -807,21 +1092,39 @@ def delete_user(user_id):
     
     return jsonify({'success': True})
 
+MENTOR_LIST_SQL = '''
+    SELECT id, name, email
+    FROM users
+    WHERE role = 'mentor'
+    ORDER BY name
+'''
+
 @app.route('/api/mentors', methods=['GET'])
 @login_required
 def get_mentors():
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT id, name, email
-        FROM users
-        WHERE role = 'mentor'
-        ORDER BY name
-    ''')
+    cursor.execute(MENTOR_LIST_SQL)
     mentors = [dict(row) for row in cursor.fetchall()]
     conn.close()
     return jsonify(mentors)
 
+MENTOR_STUDENTS_SQL = {
+    'mentor': '''
+        SELECT id, name, email, created_at
+        FROM users
+        WHERE mentor_id = %s AND role = 'student'
+        ORDER BY name
+    ''',
+    'admin': '''
+        SELECT u.id, u.name, u.email, u.created_at, m.name as mentor_name, m.id as mentor_id
+        FROM users u
+        LEFT JOIN users m ON u.mentor_id = m.id
+        WHERE u.role = 'student'
+        ORDER BY m.name, u.name
+    ''',
+}
+
 @app.route('/api/mentor-students', methods=['GET'])
 @role_required(['admin', 'mentor'])
 def get_mentor_students():
@@ -829,81 +1132,54 @@ def get_mentor_students():
     cursor = conn.cursor()
     
     if session['role'] == 'mentor':
-        cursor.execute('''
-            SELECT id, name, email, created_at
-            FROM users
-            WHERE mentor_id = %s AND role = 'student'
-            ORDER BY name
-        ''', (session['user_id'],))
+        cursor.execute(MENTOR_STUDENTS_SQL['mentor'], (session['user_id'],))
     else:
-        cursor.execute('''
-            SELECT u.id, u.name, u.email, u.created_at, m.name as mentor_name, m.id as mentor_id
-            FROM users u
-            LEFT JOIN users m ON u.mentor_id = m.id
-            WHERE u.role = 'student'
-            ORDER BY m.name, u.name
-        ''')
+        cursor.execute(MENTOR_STUDENTS_SQL['admin'])
     
     students = [dict(row) for row in cursor.fetchall()]
     conn.close()
     return jsonify(students)
 
 # ============================================
+
+# Average of each rubric criterion as a percentage of its points (see ai_evaluator.RUBRIC)
+SKILL_AVERAGES = ', '.join(
+    f'COALESCE(ROUND((AVG(ps.{criterion}_score) * 100 / {points})::numeric, 1), 0)::float8 AS {criterion}'
+    for criterion, points in RUBRIC.items()
+)
+
+SKILLS_SQL = {
+    'student': f"SELECT {SKILL_AVERAGES} FROM problem_submissions ps WHERE ps.student_id = %s",
+    'mentor': f'''
+        SELECT {SKILL_AVERAGES}
+        FROM problem_submissions ps
+        JOIN problems p ON ps.problem_id = p.id
+        WHERE p.mentor_id = %s
+    ''',
+    'admin': f"SELECT {SKILL_AVERAGES} FROM problem_submissions ps",
+}
+
 @app.route('/api/skills', methods=['GET'])
 @login_required
 def get_skills_distribution():
     conn = get_db()
     cursor = conn.cursor()
     
-    # Select AI explanations
+    etag = make_etag(data_version(cursor, ['problem_submissions', 'problems']))
+    if is_fresh(etag):
+        conn.close()
+        return not_modified(etag)
+    
     if session['role'] == 'student':
-        cursor.execute("SELECT ai_explanation FROM problem_submissions WHERE student_id = %s AND ai_explanation IS NOT NULL", (session['user_id'],))
+        cursor.execute(SKILLS_SQL['student'], (session['user_id'],))
     elif session['role'] == 'mentor':
-        cursor.execute('''
-            SELECT ps.ai_explanation 
-            FROM problem_submissions ps
-            JOIN problems p ON ps.problem_id = p.id
-            WHERE p.mentor_id = %s AND ps.ai_explanation IS NOT NULL
-        ''', (session['user_id'],))
+        cursor.execute(SKILLS_SQL['mentor'], (session['user_id'],))
     else:
-        cursor.execute("SELECT ai_explanation FROM problem_submissions WHERE ai_explanation IS NOT NULL")
-        
-    rows = cursor.fetchall()
-    conn.close()
-    
-    metrics = {
-        'correctness': {'total': 0, 'count': 0, 'max': 40},
-        'efficiency': {'total': 0, 'count': 0, 'max': 25},
-        'code_style': {'total': 0, 'count': 0, 'max': 20},
-        'best_practices': {'total': 0, 'count': 0, 'max': 15}
-    }
+        cursor.execute(SKILLS_SQL['admin'])
     
-    for row in rows:
-        try:
-            data = json_lib.loads(row['ai_explanation'])
-            
-            for key in metrics:
-                text = data.get(key, '')
-                # Extract number/number e.g. "35/40"
-                match = re.search(r'([-+]%s\d*\.%s\d+)/(\d+)', text)
-                if match:
-                    val = float(match.group(1))
-                    metrics[key]['total'] += val
-                    metrics[key]['count'] += 1
-        except:
-            continue
-            
-    # Calculate percentages
-    final_scores = {}
-    for key, data in metrics.items():
-        if data['count'] > 0:
-            avg_raw = data['total'] / data['count']
-            percent = (avg_raw / data['max']) * 100
-            final_scores[key] = round(percent, 1)
-        else:
-            final_scores[key] = 0
-            
-    return jsonify(final_scores)
+    final_scores = dict(cursor.fetchone())
+    conn.close()
+    return tag_response(jsonify(final_scores), etag)
 
 
 
@@ -922,28 +1198,7 @@ def student_leaderboard():
     else:
         mentor_id = None
     
-    # In PostgreSQL, we can't easily use aliases in the ORDER BY if they are subqueries.
-    # Using a CTE (Common Table Expression) to make it clean and portable.
-    base_query = '''
-        WITH student_stats AS (
-            SELECT 
-                u.id, u.name, u.email, m.name as mentor_name, u.mentor_id, u.role,
-                COALESCE((SELECT COUNT(*) FROM task_submissions ts 
-                          WHERE ts.student_id = u.id AND ts.status = 'accepted'), 0) as tasks_completed,
-                COALESCE((SELECT COUNT(*) FROM problem_submissions ps 
-                          WHERE ps.student_id = u.id AND ps.status = 'accepted'), 0) as problems_solved,
-                COALESCE((SELECT COUNT(*) FROM aptitude_submissions aps WHERE aps.student_id = u.id), 0) as aptitude_completed,
-                COALESCE((SELECT AVG(score) FROM task_submissions ts WHERE ts.student_id = u.id), 0) as avg_task_score,
-                COALESCE((SELECT AVG(score) FROM problem_submissions ps WHERE ps.student_id = u.id), 0) as avg_problem_score,
-                COALESCE((SELECT AVG(CASE WHEN total_questions > 0 THEN (CAST(score AS FLOAT)/total_questions)*100 ELSE 0 END) 
-                          FROM aptitude_submissions aps WHERE aps.student_id = u.id), 0) as avg_aptitude_score
-            FROM users u
-            LEFT JOIN users m ON u.mentor_id = m.id
-            WHERE u.role = 'student'
-        )
-        SELECT * FROM student_stats
-    '''
-    
+    # Served from the pre-aggregated student_leaderboard table (see leaderboard.py)
     mentor_id = request.args.get('mentor_id')
     
     if session['role'] == 'mentor' and not mentor_id:
@@ -954,14 +1209,29 @@ def student_leaderboard():
         # I'll keep it global for students unless specified.
         pass
 
-    if mentor_id:
-        cursor.execute(base_query + " WHERE mentor_id = %s ORDER BY (tasks_completed + problems_solved + aptitude_completed) DESC, avg_task_score DESC", (mentor_id,))
-    else:
-        cursor.execute(base_query + " ORDER BY (tasks_completed + problems_solved + aptitude_completed) DESC, avg_task_score DESC")
-    
-    leaderboard = [dict(row) for row in cursor.fetchall()]
+    students = leaderboard.ranking(cursor, int(mentor_id) if mentor_id else None)
     conn.close()
-    return jsonify(leaderboard)
+    return jsonify(students)
+
+MENTOR_LEADERBOARD_SQL = '''
+    WITH mentor_stats AS (
+        SELECT 
+            u.id, u.name, u.email,
+            (SELECT COUNT(*) FROM tasks t WHERE t.mentor_id = u.id) as total_tasks,
+            (SELECT COUNT(*) FROM problems p WHERE p.mentor_id = u.id) as total_problems,
+            (SELECT COUNT(*) FROM users s WHERE s.mentor_id = u.id AND s.role = 'student') as total_students,
+            (SELECT COUNT(*) FROM task_submissions ts 
+             JOIN tasks t ON ts.task_id = t.id 
+             WHERE t.mentor_id = u.id AND ts.status = 'accepted') as completed_tasks,
+            (SELECT COUNT(*) FROM problem_submissions ps 
+             JOIN problems p ON ps.problem_id = p.id 
+             WHERE p.mentor_id = u.id AND ps.status = 'accepted') as solved_problems
+        FROM users u
+        WHERE u.role = 'mentor'
+    )
+    SELECT * FROM mentor_stats
+    ORDER BY (total_tasks + total_problems) DESC
+'''
 
 @app.route('/api/leaderboard/mentors', methods=['GET'])
 @role_required(['admin'])
@@ -969,25 +1239,7 @@ def get_mentor_leaderboard_api():
     conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('''
-        WITH mentor_stats AS (
-            SELECT 
-                u.id, u.name, u.email,
-                (SELECT COUNT(*) FROM tasks t WHERE t.mentor_id = u.id) as total_tasks,
-                (SELECT COUNT(*) FROM problems p WHERE p.mentor_id = u.id) as total_problems,
-                (SELECT COUNT(*) FROM users s WHERE s.mentor_id = u.id AND s.role = 'student') as total_students,
-                (SELECT COUNT(*) FROM task_submissions ts 
-                 JOIN tasks t ON ts.task_id = t.id 
-                 WHERE t.mentor_id = u.id AND ts.status = 'accepted') as completed_tasks,
-                (SELECT COUNT(*) FROM problem_submissions ps 
-                 JOIN problems p ON ps.problem_id = p.id 
-                 WHERE p.mentor_id = u.id AND ps.status = 'accepted') as solved_problems
-            FROM users u
-            WHERE u.role = 'mentor'
-        )
-        SELECT * FROM mentor_stats
-        ORDER BY (total_tasks + total_problems) DESC
-    ''')
+    cursor.execute(MENTOR_LEADERBOARD_SQL)
     
     leaderboard = [dict(row) for row in cursor.fetchall()]
     conn.close()
@@ -997,116 +1249,113 @@ def get_mentor_leaderboard_api():
 # API Routes - Statistics
 # ============================================
 
+# Dashboards poll these on every navigation; a few seconds of staleness is fine
+stats_cache = TTLCache(max_size=4096, ttl=Config.STATS_CACHE_TTL)
+
+# One round-trip per role: every counter is a scalar subquery of a single SELECT
+STATS_SQL = {
+    'student': '''
+        SELECT
+            (SELECT COUNT(*) FROM tasks WHERE mentor_id = %(mentor_id)s AND is_active = 1) AS total_tasks,
+            (SELECT COUNT(*) FROM problems WHERE mentor_id = %(mentor_id)s AND is_active = 1) AS total_problems,
+            ts.completed_tasks, ts.avg_task_score,
+            ps.solved_problems, ps.avg_problem_score
+        FROM
+            (SELECT COUNT(*) FILTER (WHERE status = 'accepted') AS completed_tasks, COALESCE(AVG(score), 0) AS avg_task_score
+             FROM task_submissions WHERE student_id = %(student_id)s) ts,
+            (SELECT COUNT(*) FILTER (WHERE status = 'accepted') AS solved_problems, COALESCE(AVG(score), 0) AS avg_problem_score
+             FROM problem_submissions WHERE student_id = %(student_id)s) ps
+    ''',
+    'mentor': '''
+        SELECT
+            (SELECT COUNT(*) FROM tasks WHERE mentor_id = %(mentor_id)s) AS total_tasks,
+            (SELECT COUNT(*) FROM problems WHERE mentor_id = %(mentor_id)s) AS total_problems,
+            (SELECT COUNT(*) FROM users WHERE mentor_id = %(mentor_id)s AND role = 'student') AS total_students,
+            (SELECT COUNT(*) FROM task_submissions ts
+             JOIN tasks t ON ts.task_id = t.id
+             WHERE t.mentor_id = %(mentor_id)s) AS total_task_submissions,
+            (SELECT COUNT(*) FROM problem_submissions ps
+             JOIN problems p ON ps.problem_id = p.id
+             WHERE p.mentor_id = %(mentor_id)s) AS total_problem_submissions
+    ''',
+    'admin': '''
+        SELECT
+            u.total_mentors, u.total_students,
+            (SELECT COUNT(*) FROM tasks) AS total_tasks,
+            (SELECT COUNT(*) FROM problems) AS total_problems,
+            (SELECT COUNT(*) FROM task_submissions) AS total_task_submissions,
+            (SELECT COUNT(*) FROM problem_submissions) AS total_problem_submissions
+        FROM (SELECT COUNT(*) FILTER (WHERE role = 'mentor') AS total_mentors,
+                     COUNT(*) FILTER (WHERE role = 'student') AS total_students
+              FROM users) u
+    ''',
+}
+
 @app.route('/api/stats', methods=['GET'])
 @login_required
 def get_stats():
+    cache_key = ('stats', session['role'], session['user_id'])
+    stats = stats_cache.get(cache_key)
+    if stats is not None:
+        return jsonify(stats)
+    
     conn = get_db()
     cursor = conn.cursor()
     
-    stats = {}
-    
     if session['role'] == 'student':
-        student_id = session['user_id']
-        
-        cursor.execute('SELECT COUNT(*) FROM tasks WHERE mentor_id = %s AND is_active = 1', (session['mentor_id'],))
-        stats['total_tasks'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM task_submissions WHERE student_id = %s AND status = 'accepted'", (student_id,))
-        stats['completed_tasks'] = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM problems WHERE mentor_id = %s AND is_active = 1', (session['mentor_id'],))
-        stats['total_problems'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM problem_submissions WHERE student_id = %s AND status = 'accepted'", (student_id,))
-        stats['solved_problems'] = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT AVG(score) FROM task_submissions WHERE student_id = %s', (student_id,))
-        stats['avg_task_score'] = cursor.fetchone()[0] or 0
-        
-        cursor.execute('SELECT AVG(score) FROM problem_submissions WHERE student_id = %s', (student_id,))
-        stats['avg_problem_score'] = cursor.fetchone()[0] or 0
-        
+        cursor.execute(STATS_SQL['student'], {'student_id': session['user_id'], 'mentor_id': session['mentor_id']})
     elif session['role'] == 'mentor':
-        mentor_id = session['user_id']
-        
-        cursor.execute('SELECT COUNT(*) FROM tasks WHERE mentor_id = %s', (mentor_id,))
-        stats['total_tasks'] = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM problems WHERE mentor_id = %s', (mentor_id,))
-        stats['total_problems'] = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM users WHERE mentor_id = %s AND role = "student"', (mentor_id,))
-        stats['total_students'] = cursor.fetchone()[0]
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM task_submissions ts
-            JOIN tasks t ON ts.task_id = t.id
-            WHERE t.mentor_id = %s
-        ''', (mentor_id,))
-        stats['total_task_submissions'] = cursor.fetchone()[0]
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM problem_submissions ps
-            JOIN problems p ON ps.problem_id = p.id
-            WHERE p.mentor_id = %s
-        ''', (mentor_id,))
-        stats['total_problem_submissions'] = cursor.fetchone()[0]
-        
+        cursor.execute(STATS_SQL['mentor'], {'mentor_id': session['user_id']})
     else:  # admin
-        cursor.execute('SELECT COUNT(*) FROM users WHERE role = "mentor"')
-        stats['total_mentors'] = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM users WHERE role = "student"')
-        stats['total_students'] = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM tasks')
-        stats['total_tasks'] = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM problems')
-        stats['total_problems'] = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM task_submissions')
-        stats['total_task_submissions'] = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM problem_submissions')
-        stats['total_problem_submissions'] = cursor.fetchone()[0]
+        cursor.execute(STATS_SQL['admin'])
     
+    stats = dict(cursor.fetchone())
     conn.close()
+    stats_cache.set(cache_key, stats)
     return jsonify(stats)
 
 # ============================================
 # API Routes - Activity Logs
 # ============================================
 
+ACTIVITY_LOG_SQL = '''
+    SELECT al.*, u.name as user_name, u.role as user_role
+    FROM activity_logs al
+    JOIN users u ON al.user_id = u.id
+    ORDER BY al.created_at DESC
+    LIMIT 100
+'''
+
 @app.route('/api/activity-logs', methods=['GET'])
 @role_required(['admin'])
 def get_activity_logs():
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT al.*, u.name as user_name, u.role as user_role
-        FROM activity_logs al
-        JOIN users u ON al.user_id = u.id
-        ORDER BY al.created_at DESC
-        LIMIT 100
-    ''')
+    cursor.execute(ACTIVITY_LOG_SQL)
     logs = [dict(row) for row in cursor.fetchall()]
     conn.close()
     return jsonify(logs)
 
+@app.route('/api/admin/metrics', methods=['GET'])
+@role_required(['admin'])
+def get_system_metrics():
+    return jsonify({
+        'db_pool': pool_stats(),
+        'evaluation_queue': get_queue().stats(),
+        'evaluation_cache': evaluation_cache.stats(),
+        'llm': llm_metrics.stats(),
+        'stats_cache': stats_cache.stats(),
+        'activity_log': get_activity_logger().stats(),
+        'judge_workers': get_worker_pool().stats(),
+        'events': get_broker().stats(),
+        'aptitude_keys': aptitude_keys.stats(),
+        'aptitude_ingest': get_ingestor().stats(),
+        'exports': json_stream.stats()
+    })
+
 def log_activity(user_id, action, details):
-    """Log user activity"""
-    try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO activity_logs (user_id, action, details)
-            VALUES (%s, %s, %s)
-         RETURNING id''', (user_id, action, details))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Error logging activity: {e}")
+    """Queue a user activity record; activity_logger writes them in batches"""
+    get_activity_logger().log(user_id, action, details)
 
 # ============================================
 # Static Files
@@ -1138,49 +1387,59 @@ def student_aptitude():
 
 # API Routes - Aptitude
 
+# Every aptitude_tests column but the question bank, which is served from aptitude_keys
+APTITUDE_TEST_COLUMNS = '''
+    t.id, t.mentor_id, t.title, t.description, t.duration, t.is_active, t.created_at, t.end_time,
+    t.attempt_limit, t.violation_limit, t.questions_version, t.row_version
+'''
+
+APTITUDE_LIST_SQL = {
+    'student': '''
+        SELECT t.id, t.title, t.description, t.duration, t.created_at, t.end_time, t.attempt_limit, t.row_version, u.name as mentor_name,
+               (SELECT MAX(score) FROM aptitude_submissions s WHERE s.test_id = t.id AND s.student_id = %s) as my_score,
+               (SELECT COUNT(*) FROM aptitude_submissions s WHERE s.test_id = t.id AND s.student_id = %s) as attempts_taken
+        FROM aptitude_tests t
+        JOIN users u ON t.mentor_id = u.id
+        WHERE (t.mentor_id = %s OR t.mentor_id IN (SELECT id FROM users WHERE role='admin')) 
+              AND t.is_active = 1
+              AND (t.end_time IS NULL OR t.end_time > CURRENT_TIMESTAMP)
+        ORDER BY t.created_at DESC
+    ''',
+    'admin': f'''
+        SELECT {APTITUDE_TEST_COLUMNS}, jsonb_array_length(t.questions) as question_count, u.name as mentor_name,
+               (SELECT COUNT(*) FROM aptitude_submissions s WHERE s.test_id = t.id) as submissions_count,
+               (SELECT COUNT(*) FROM users WHERE role = 'student' AND (u.role = 'admin' OR mentor_id = u.id)) as total_students
+        FROM aptitude_tests t
+        JOIN users u ON t.mentor_id = u.id
+        ORDER BY t.created_at DESC
+    ''',
+    'mentor': f'''
+        SELECT {APTITUDE_TEST_COLUMNS}, jsonb_array_length(t.questions) as question_count, 
+               (SELECT COUNT(*) FROM aptitude_submissions s WHERE s.test_id = t.id) as submissions_count,
+               (SELECT COUNT(*) FROM users WHERE mentor_id = t.mentor_id AND role = 'student') as total_students
+        FROM aptitude_tests t
+        WHERE t.mentor_id = %s
+        ORDER BY t.created_at DESC
+    ''',
+}
+
 @app.route('/api/aptitude', methods=['GET'])
 @login_required
 def get_aptitude_tests():
-    conn = get_db()
-    cursor = conn.cursor()
-    
     if session['role'] == 'student':
         # Get active tests from mentor or admin (filter by end_time)
-        cursor.execute('''
-            SELECT t.id, t.title, t.description, t.duration, t.created_at, t.end_time, t.attempt_limit, u.name as mentor_name,
-                   (SELECT MAX(score) FROM aptitude_submissions s WHERE s.test_id = t.id AND s.student_id = %s) as my_score,
-                   (SELECT COUNT(*) FROM aptitude_submissions s WHERE s.test_id = t.id AND s.student_id = %s) as attempts_taken
-            FROM aptitude_tests t
-            JOIN users u ON t.mentor_id = u.id
-            WHERE (t.mentor_id = %s OR t.mentor_id IN (SELECT id FROM users WHERE role='admin')) 
-                  AND t.is_active = 1
-                  AND (t.end_time IS NULL OR t.end_time > CURRENT_TIMESTAMP)
-            ORDER BY t.created_at DESC
-        ''', (session['user_id'], session['user_id'], session['mentor_id']))
+        query = APTITUDE_LIST_SQL['student']
+        params = (session['user_id'], session['user_id'], session['mentor_id'])
     elif session['role'] == 'admin':
         # Admin sees all tests
-        cursor.execute('''
-            SELECT t.*, u.name as mentor_name,
-                   (SELECT COUNT(*) FROM aptitude_submissions s WHERE s.test_id = t.id) as submissions_count,
-                   (SELECT COUNT(*) FROM users WHERE role = 'student' AND (u.role = 'admin' OR mentor_id = u.id)) as total_students
-            FROM aptitude_tests t
-            JOIN users u ON t.mentor_id = u.id
-            ORDER BY t.created_at DESC
-        ''')
+        query = APTITUDE_LIST_SQL['admin']
+        params = ()
     else:
         # Mentor sees their tests
-        cursor.execute('''
-            SELECT t.*, 
-                   (SELECT COUNT(*) FROM aptitude_submissions s WHERE s.test_id = t.id) as submissions_count,
-                   (SELECT COUNT(*) FROM users WHERE mentor_id = t.mentor_id AND role = 'student') as total_students
-            FROM aptitude_tests t
-            WHERE t.mentor_id = %s
-            ORDER BY t.created_at DESC
-        ''', (session['user_id'],))
-        
-    tests = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(tests)
+        query = APTITUDE_LIST_SQL['mentor']
+        params = (session['user_id'],)
+
+    return list_catalog('aptitude_tests', query, params, expires_column='end_time')
 
 @app.route('/api/aptitude', methods=['POST'])
 @role_required(['mentor', 'admin'])
@@ -1195,58 +1454,150 @@ def create_aptitude_test():
     
     cursor.execute('''
         INSERT INTO aptitude_tests (mentor_id, title, description, duration, questions, end_time, attempt_limit, violation_limit)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        VALUES (%s, %s, %s, %s, %s::jsonb, %s, %s, %s)
      RETURNING id''', (session['user_id'], data['title'], data['description'], data['duration'], json_lib.dumps(data['questions']), end_time, attempt_limit, violation_limit))
     
     conn.commit()
     conn.close()
     return jsonify({'success': True})
 
+APTITUDE_TEST_SQL = 'SELECT * FROM aptitude_tests WHERE id = %s'
+
+STUDENT_APTITUDE_TEST_SQL = f'''
+    SELECT {APTITUDE_TEST_COLUMNS},
+           (SELECT COUNT(*) FROM aptitude_submissions s WHERE s.test_id = t.id AND s.student_id = %s) AS attempts_taken
+    FROM aptitude_tests t
+    WHERE t.id = %s
+'''
+
 @app.route('/api/aptitude/<int:test_id>', methods=['GET'])
 @login_required
 def get_aptitude_test(test_id):
     conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM aptitude_tests WHERE id = %s', (test_id,))
-    test = cursor.fetchone()
-    conn.close()
+    if session['role'] != 'student':
+        # Mentors and admins see the bank with its answers
+        cursor.execute(APTITUDE_TEST_SQL, (test_id,))
+        test = cursor.fetchone()
+        conn.close()
+        if not test:
+            return jsonify({'error': 'Test not found'}), 404
+        return jsonify(dict(test))
     
+    cursor.execute(STUDENT_APTITUDE_TEST_SQL, (session['user_id'], test_id))
+    test = cursor.fetchone()
     if not test:
+        conn.close()
         return jsonify({'error': 'Test not found'}), 404
-        
-    test_dict = dict(test)
-    questions = json_lib.loads(test_dict['questions'])
     
-    if session['role'] == 'student':
-        # Check attempt limit
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM aptitude_submissions WHERE test_id = %s AND student_id = %s', (test_id, session['user_id']))
-        attempts_taken = cursor.fetchone()[0]
+    test_dict = dict(test)
+    # Submissions accepted but not yet written count too
+    attempts_taken = max(test_dict.pop('attempts_taken'), get_ingestor().ledger.attempts(test_id, session['user_id']) or 0)
+    if test_dict.get('attempt_limit') and attempts_taken >= test_dict['attempt_limit']:
         conn.close()
-
-        if test_dict.get('attempt_limit') and attempts_taken >= test_dict['attempt_limit']:
-             return jsonify({'error': 'Maximum attempts reached'}), 403
-
-        # Remove correct answer from payload
-        for q in questions:
-            if 'correct' in q: del q['correct']
+        return jsonify({'error': 'Maximum attempts reached'}), 403
     
-    test_dict['questions'] = questions
-    return jsonify(test_dict)
+    # Questions without answers, serialized once per test version
+    compiled = aptitude_keys.get_compiled(cursor, test_id, test_dict['questions_version'])
+    conn.close()
+    if compiled is None:
+        return jsonify({'error': 'Test not found'}), 404
+    body = app.json.dumps(test_dict)[:-1] + ', "questions": ' + compiled.student_questions + '}'
+    return Response(body, mimetype='application/json')
+
+def delete_aptitude_rows(cursor, test_id):
+    """
+    Delete a test and everything hanging off it, children first:
+    aptitude_submissions.test_id references the test without ON DELETE CASCADE.
+    """
+    cursor.execute('DELETE FROM aptitude_submissions WHERE test_id=%s RETURNING student_id', (test_id,))
+    student_ids = [row['student_id'] for row in cursor.fetchall()]
+    cursor.execute('DELETE FROM aptitude_item_stats WHERE test_id=%s', (test_id,))
+    cursor.execute('DELETE FROM aptitude_tests WHERE id=%s', (test_id,))
+    leaderboard.refresh_students(cursor, student_ids)
 
 @app.route('/api/aptitude/<int:test_id>', methods=['DELETE'])
 @role_required(['mentor', 'admin'])
 def delete_aptitude_test(test_id):
+    # Journaled submissions for this test must reach the table before it goes
+    if not get_ingestor().flush(10):
+        return jsonify({'error': 'Submissions are still being saved, please retry'}), 409
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('DELETE FROM aptitude_tests WHERE id=%s', (test_id,))
-    cursor.execute('DELETE FROM aptitude_submissions WHERE test_id=%s', (test_id,))
+    delete_aptitude_rows(cursor, test_id)
     conn.commit()
     conn.close()
+    aptitude_keys.forget(test_id)
+    get_ingestor().ledger.forget_test(test_id)
     return jsonify({'success': True})
 
+@app.route('/api/aptitude/<int:test_id>/items', methods=['GET'])
+@role_required(['mentor', 'admin'])
+def get_aptitude_item_stats(test_id):
+    """How students answered each question, from running counts (see aptitude_items.py)"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, title, mentor_id, questions FROM aptitude_tests WHERE id = %s', (test_id,))
+    test = cursor.fetchone()
+    if not test:
+        conn.close()
+        return jsonify({'error': 'Test not found'}), 404
+    if session['role'] == 'mentor' and test['mentor_id'] != session['user_id']:
+        conn.close()
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    items = aptitude_items.item_analytics(cursor, test_id, test['questions'])
+    conn.close()
+    return jsonify({
+        'test_id': test_id,
+        'title': test['title'],
+        'submissions': max((item['attempts'] for item in items), default=0),
+        'items': items
+    })
+
+@app.route('/api/aptitude/<int:test_id>/regrade', methods=['POST'])
+@role_required(['mentor', 'admin'])
+def regrade_aptitude_test(test_id):
+    """Fix answer keys ({"corrections": {"<question>": <option>}}) and rescore every submission (see aptitude_regrade.py)"""
+    data = request.get_json(silent=True) or {}
+    corrections = data.get('corrections') or {}
+    if not isinstance(corrections, dict):
+        return jsonify({'error': 'Invalid corrections'}), 400
+    
+    # Submissions already acknowledged are rescored too; later ones are re-marked on insert (see aptitude_ingest.py)
+    if not get_ingestor().flush(10):
+        return jsonify({'error': 'Submissions are still being saved, please retry'}), 409
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT mentor_id FROM aptitude_tests WHERE id = %s', (test_id,))
+    test = cursor.fetchone()
+    if not test:
+        conn.close()
+        return jsonify({'error': 'Test not found'}), 404
+    if session['role'] == 'mentor' and test['mentor_id'] != session['user_id']:
+        conn.close()
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        result = aptitude_regrade.regrade_test(cursor, test_id, corrections, dry_run=bool(data.get('dry_run')))
+    except ValueError as e:
+        conn.rollback()
+        conn.close()
+        return jsonify({'error': str(e)}), 400
+    if data.get('dry_run'):
+        conn.rollback()
+    else:
+        conn.commit()
+        aptitude_keys.forget(test_id)
+        if result['changed']:
+            try:
+                publish_leaderboard(cursor, result['mentor_id'])
+            except Exception as e:
+                print(f"Error publishing leaderboard after regrade of test {test_id}: {e}")
+    conn.close()
+    return jsonify(result)
+
 @app.route('/api/aptitude/<int:test_id>/submit', methods=['POST'])
 @role_required(['student'])
 def submit_aptitude(test_id):
@@ -1254,166 +1605,116 @@ def submit_aptitude(test_id):
     student_answers = data.get('answers', {}) 
     focus_lost_count = data.get('focus_lost_count', 0)
     paste_attempts = data.get('paste_attempts', 0)
+    if not isinstance(student_answers, dict):
+        return jsonify({'success': False, 'error': 'Invalid answers'}), 400
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT questions FROM aptitude_tests WHERE id = %s', (test_id,))
-    row = cursor.fetchone()
-    if not row: return jsonify({'error': 'Test not found'}), 404
-    
-    questions = json_lib.loads(row['questions'])
-    score = 0
-    total = len(questions)
-    
-    for idx, q in enumerate(questions):
-        student_ans = student_answers.get(str(idx))
-        if student_ans is not None and int(student_ans) == int(q['correct']):
-            score += 1
-            
-    # Check existing submission%s Allow multiple%s Assuming single for now or overwrite.
-    # User didn't specify. I'll allow overwrite or just insert new. Insert new is safer for history.
-    cursor.execute('''
-        INSERT INTO aptitude_submissions (student_id, test_id, score, total_questions, answers, focus_lost_count, paste_attempts)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-     RETURNING id''', (session['user_id'], test_id, score, total, json_lib.dumps(student_answers), focus_lost_count, paste_attempts))
+    current = aptitude_keys.get_current(test_id)
+    if current is None:
+        return jsonify({'error': 'Test not found'}), 404
+    compiled, attempt_limit = current
+    choices, correct = compiled.mark(student_answers)
+    score = sum(correct)
+    total = len(compiled.answer_key)
     
-    conn.commit()
-    conn.close()
+    # Acknowledged once journaled; the row is inserted by the ingestor's next batch (see aptitude_ingest.py)
+    try:
+        get_ingestor().submit(test_id, session['user_id'], attempt_limit, score, total,
+                              student_answers, focus_lost_count, paste_attempts, choices, correct, compiled.version)
+    except AttemptLimitReached as e:
+        return jsonify({'success': False, 'error': str(e)}), 403
+    except IngestUnavailable as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
     
     return jsonify({'success': True, 'score': score, 'total': total})
 
+STUDENT_APTITUDE_SUBMISSION_LIST_SQL = '''
+    SELECT s.*, t.title as test_title, s.total_questions as q_count
+    FROM aptitude_submissions s
+    JOIN aptitude_tests t ON s.test_id = t.id
+'''
+
 @app.route('/api/aptitude-submissions', methods=['GET'])
 @role_required(['student'])
 def get_aptitude_submissions_list():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT s.*, t.title as test_title, s.total_questions as q_count
-        FROM aptitude_submissions s
-        JOIN aptitude_tests t ON s.test_id = t.id
-        WHERE s.student_id = %s
-        ORDER BY s.submitted_at DESC
-    ''', (session['user_id'],))
-    submissions = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(submissions)
+    # The student's own attempts, all of them (not paged)
+    return list_submissions(STUDENT_APTITUDE_SUBMISSION_LIST_SQL, 's', 'aptitude_submissions', {}, paginate=False)
+
+DASHBOARD_STATS_SQL = {
+    'student': '''
+        SELECT
+            (SELECT COUNT(*) FROM task_submissions WHERE student_id = %(user_id)s) AS tasks_submitted,
+            (SELECT COUNT(*) FROM problem_submissions WHERE student_id = %(user_id)s) AS problems_solved,
+            (SELECT COUNT(*) FROM aptitude_submissions WHERE student_id = %(user_id)s) AS aptitude_taken
+    ''',
+    # Submission totals count the mentor's students' work across all three tables
+    'mentor': '''
+        SELECT
+            (SELECT COUNT(*) FROM tasks WHERE mentor_id = %(user_id)s) AS tasks_created,
+            (SELECT COUNT(*) FROM problems WHERE mentor_id = %(user_id)s) AS problems_created,
+            (SELECT COUNT(*) FROM aptitude_tests WHERE mentor_id = %(user_id)s) AS aptitude_created,
+            (SELECT COUNT(*) FROM users WHERE mentor_id = %(user_id)s AND role = 'student') AS total_students,
+            (SELECT COUNT(*) FROM task_submissions ts JOIN users u ON ts.student_id = u.id
+             WHERE u.mentor_id = %(user_id)s)
+            + (SELECT COUNT(*) FROM problem_submissions ps JOIN users u ON ps.student_id = u.id
+               WHERE u.mentor_id = %(user_id)s)
+            + (SELECT COUNT(*) FROM aptitude_submissions aps JOIN users u ON aps.student_id = u.id
+               WHERE u.mentor_id = %(user_id)s) AS total_submissions
+    ''',
+    'admin': '''
+        SELECT
+            u.total_students, u.total_mentors,
+            (SELECT COUNT(*) FROM tasks) AS total_tasks,
+            (SELECT COUNT(*) FROM problems) AS total_problems,
+            (SELECT COUNT(*) FROM aptitude_tests) AS total_aptitude_tests,
+            (SELECT COUNT(*) FROM task_submissions) AS total_task_submissions,
+            (SELECT COUNT(*) FROM problem_submissions) AS total_problem_submissions,
+            (SELECT COUNT(*) FROM aptitude_submissions) AS total_aptitude_submissions
+        FROM (SELECT COUNT(*) FILTER (WHERE role = 'student') AS total_students,
+                     COUNT(*) FILTER (WHERE role = 'mentor') AS total_mentors
+              FROM users) u
+    ''',
+}
 
 @app.route('/api/stats/dashboard', methods=['GET'])
 @login_required
 def get_dashboard_stats():
+    role = session['role']
+    user_id = session['user_id']
+    
+    cache_key = ('dashboard', role, user_id)
+    stats = stats_cache.get(cache_key)
+    if stats is not None:
+        return jsonify(stats)
+    
     conn = get_db()
     cursor = conn.cursor()
     stats = {}
     
-    role = session['role']
-    user_id = session['user_id']
-    
     if role == 'student':
-        cursor.execute("SELECT COUNT(*) FROM task_submissions WHERE student_id = %s", (user_id,))
-        stats['tasks_submitted'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM problem_submissions WHERE student_id = %s", (user_id,))
-        stats['problems_solved'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM aptitude_submissions WHERE student_id = %s", (user_id,))
-        stats['aptitude_taken'] = cursor.fetchone()[0]
+        cursor.execute(DASHBOARD_STATS_SQL['student'], {'user_id': user_id})
+        stats = dict(cursor.fetchone())
         
     elif role == 'mentor':
-        cursor.execute("SELECT COUNT(*) FROM tasks WHERE mentor_id = %s", (user_id,))
-        stats['tasks_created'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM problems WHERE mentor_id = %s", (user_id,))
-        stats['problems_created'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM aptitude_tests WHERE mentor_id = %s", (user_id,))
-        stats['aptitude_created'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM users WHERE mentor_id = %s AND role = 'student'", (user_id,))
-        stats['total_students'] = cursor.fetchone()[0]
-        
-        # Calculate actual total submissions for mentor's students
-        cursor.execute('''
-            SELECT COUNT(*) FROM task_submissions ts 
-            JOIN users u ON ts.student_id = u.id 
-            WHERE u.mentor_id = %s
-        ''', (user_id,))
-        task_subs = cursor.fetchone()[0]
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM problem_submissions ps 
-            JOIN users u ON ps.student_id = u.id 
-            WHERE u.mentor_id = %s
-        ''', (user_id,))
-        prob_subs = cursor.fetchone()[0]
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM aptitude_submissions aps 
-            JOIN users u ON aps.student_id = u.id 
-            WHERE u.mentor_id = %s
-        ''', (user_id,))
-        apt_subs = cursor.fetchone()[0]
-        
-        stats['total_submissions'] = task_subs + prob_subs + apt_subs
+        cursor.execute(DASHBOARD_STATS_SQL['mentor'], {'user_id': user_id})
+        stats = dict(cursor.fetchone())
         
     elif role == 'admin':
-        cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'student'")
-        stats['total_students'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'mentor'")
-        stats['total_mentors'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM tasks")
-        stats['total_tasks'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM problems")
-        stats['total_problems'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM aptitude_tests")
-        stats['total_aptitude_tests'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM task_submissions")
-        task_subs = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM problem_submissions")
-        prob_subs = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM aptitude_submissions")
-        apt_subs = cursor.fetchone()[0]
-        
-        stats['total_submissions'] = task_subs + prob_subs + apt_subs
-        stats['total_task_submissions'] = task_subs
-        stats['total_problem_submissions'] = prob_subs
-        stats['total_aptitude_submissions'] = apt_subs
+        cursor.execute(DASHBOARD_STATS_SQL['admin'])
+        stats = dict(cursor.fetchone())
+        stats['total_submissions'] = (stats['total_task_submissions'] + stats['total_problem_submissions']
+                                      + stats['total_aptitude_submissions'])
 
     conn.close()
+    stats_cache.set(cache_key, stats)
     return jsonify(stats)
 
 @app.route('/api/aptitude-submissions/all', methods=['GET'])
 @role_required(['mentor', 'admin'])
 def get_all_aptitude_submissions():
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    if session['role'] == 'mentor':
-        cursor.execute('''
-            SELECT s.*, t.title as test_title, u.name as student_name
-            FROM aptitude_submissions s
-            JOIN aptitude_tests t ON s.test_id = t.id
-            JOIN users u ON s.student_id = u.id
-            WHERE u.mentor_id = %s
-            ORDER BY s.submitted_at DESC
-        ''', (session['user_id'],))
-    else: # Admin
-        cursor.execute('''
-            SELECT s.*, t.title as test_title, u.name as student_name
-            FROM aptitude_submissions s
-            JOIN aptitude_tests t ON s.test_id = t.id
-            JOIN users u ON s.student_id = u.id
-            ORDER BY s.submitted_at DESC
-        ''')
-        
-    submissions = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(submissions)
+    return list_submissions(APTITUDE_SUBMISSION_LIST_SQL, 's', 'aptitude_submissions', {
+        'student_id': ('s.student_id', int),
+        'test_id': ('s.test_id', int)
+    })
 
 @app.errorhandler(404)
 def not_found(e):
@@ -1430,4 +1731,9 @@ def server_error(e):
 if __name__ == '__main__':
     init_db()
     seed_db()
+    get_queue().recover_pending()
+    get_ingestor().start()
+    leaderboard.start_rebuilder()
+    if Config.JUDGE_WARM_WORKERS:
+        get_worker_pool().start()
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,511 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+import psycopg2
+from psycopg2.extras import execute_values
+from config import Config
+from database import get_pool
+import aptitude_items
+import aptitude_keys
+import leaderboard
+
+# Aptitude submissions arrive in bursts: a whole class submits in the seconds
+# before a test's end_time. A submit is graded in the request (the answer key
+# is cached, see aptitude_keys.py), checked against attempt_limit, appended to
+# a local journal and acknowledged once the journal is on disk. A background
+# committer then inserts journaled submissions into aptitude_submissions many
+# rows per transaction.
+#
+# Journal appends are group-committed too: concurrent submits share one
+# write() and one fsync(). Every submission carries an ingest_token that is
+# unique in the table, so replaying the journal after a crash (recover())
+# inserts each submission exactly once. The journal is truncated whenever
+# everything in it has been committed.
+#
+# attempt_limit is enforced by AttemptLedger below, in this process, before
+# the submission is acknowledged; like the event broker and the evaluation
+# queue, this assumes one app process.
+#
+# Each record carries the questions_version it was graded against. A regrade
+# can land between grading and insert, so write_batch() re-marks records
+# whose version is no longer current, under a share lock on their tests that
+# a regrade (which locks the test FOR UPDATE) has to wait for, or vice versa.
+#
+# A batch the database refuses outright (a constraint violation, e.g. its test
+# was deleted meanwhile) is split until the offending records are isolated;
+# those are appended to a dead-letter file next to the journal instead of
+# being retried forever behind everything else.
+
+# Errors that will not go away by retrying the same rows
+PERMANENT_ERRORS = (psycopg2.IntegrityError, psycopg2.DataError)
+
+class AttemptLimitReached(Exception):
+    pass
+
+class IngestUnavailable(Exception):
+    """The submission was not accepted (backlog full or journal not writable); the client should retry"""
+
+def count_attempts(test_id, student_id):
+    conn = get_pool().getconn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT COUNT(*) AS attempts FROM aptitude_submissions WHERE test_id = %s AND student_id = %s',
+            (test_id, student_id)
+        )
+        return cursor.fetchone()['attempts']
+    finally:
+        conn.close()
+
+def remark_stale(cursor, records):
+    """
+    Lock the batch's tests FOR SHARE and re-mark, in place, records graded
+    against an older question bank than the current one. Returns how many
+    were re-marked.
+    """
+    cursor.execute(
+        'SELECT id, questions_version FROM aptitude_tests WHERE id = ANY(%s) ORDER BY id FOR SHARE',
+        (sorted({r['test_id'] for r in records}),)
+    )
+    versions = {row['id']: row['questions_version'] for row in cursor.fetchall()}
+    remarked = 0
+    for record in records:
+        version = versions.get(record['test_id'])
+        if version is None or record.get('questions_version') == version:
+            continue  # a deleted test is refused by the insert (see SubmissionIngestor._write)
+        compiled = aptitude_keys.get_compiled(cursor, record['test_id'], version)
+        choices, correct = compiled.mark(record['answers'])
+        record.update(score=sum(correct), total=len(compiled.answer_key), choices=choices, correct=correct,
+                      questions_version=version)
+        remarked += 1
+    return remarked
+
+def write_batch(records):
+    """
+    Insert a batch of journaled submissions, add them to the per-question
+    statistics and refresh their students' leaderboard rows in one
+    transaction. Records graded against an outdated key are re-marked first
+    (remark_stale). Rows already inserted (journal replay) are skipped and
+    not counted again. Returns the new rows as dicts (id, student_id, test_id).
+    """
+    conn = get_pool().getconn()
+    try:
+        cursor = conn.cursor()
+        remarked = remark_stale(cursor, records)
+        if remarked:
+            print(f"Re-marked {remarked} aptitude submissions graded before a regrade")
+        values = [
+            (r['student_id'], r['test_id'], r['score'], r['total'], json.dumps(r['answers']),
+             r['focus_lost_count'], r['paste_attempts'], r['submitted_at'], r['token'])
+            for r in records
+        ]
+        rows = execute_values(cursor, '''
+            INSERT INTO aptitude_submissions
+                (student_id, test_id, score, total_questions, answers, focus_lost_count, paste_attempts, submitted_at, ingest_token)
+            VALUES %s
+            ON CONFLICT (ingest_token) DO NOTHING
+            RETURNING id, student_id, test_id, ingest_token
+        ''', values, template='(%s, %s, %s, %s, %s, %s, %s, to_timestamp(%s)::timestamp, %s::uuid)',
+            page_size=len(values), fetch=True)
+        inserted = {uuid.UUID(str(row['ingest_token'])).hex for row in rows}
+        aptitude_items.add_counts(cursor, aptitude_items.batch_counts([r for r in records if r['token'] in inserted]))
+        leaderboard.refresh_students(cursor, [r['student_id'] for r in records])
+        conn.commit()
+        return [{'id': row['id'], 'student_id': row['student_id'], 'test_id': row['test_id']} for row in rows]
+    finally:
+        conn.close()
+
+class AttemptLedger:
+    """
+    Attempts per (test_id, student_id): the committed ones, counted once from
+    the database, plus every submission accepted since. Checking and taking
+    an attempt happen under one per-student lock, so concurrent submits of
+    the same student cannot both pass the limit.
+    """
+    def __init__(self, load_count, idle_seconds=600):
+        self._load_count = load_count
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> [attempts, uncommitted, last_used]
+        self._key_locks = {}
+        self._last_sweep = time.monotonic()
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def reserve(self, test_id, student_id, limit):
+        """Take an attempt; False when `limit` (None or 0 for unlimited) is already used up"""
+        key = (test_id, student_id)
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = [self._load_count(test_id, student_id), 0, 0.0]
+                with self._lock:
+                    self._entries[key] = entry
+            entry[2] = time.monotonic()
+            if limit and entry[0] >= limit:
+                return False
+            entry[0] += 1
+            entry[1] += 1
+        self._sweep()
+        return True
+
+    def release(self, test_id, student_id):
+        """Give back an attempt whose submission was not accepted after all"""
+        with self._key_lock((test_id, student_id)):
+            entry = self._entries.get((test_id, student_id))
+            if entry:
+                entry[0] -= 1
+                entry[1] -= 1
+
+    def settle(self, keys):
+        """These submissions are committed: the database count now includes them"""
+        for key in keys:
+            with self._key_lock(key):
+                entry = self._entries.get(key)
+                if entry:
+                    entry[1] -= 1
+
+    def attempts(self, test_id, student_id):
+        """Attempts known here (committed and in flight), or None when not tracked"""
+        entry = self._entries.get((test_id, student_id))
+        return entry[0] if entry else None
+
+    def forget_test(self, test_id):
+        """Drop a test's counts (its submissions were deleted)"""
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if k[0] == test_id and not e[1]]:
+                del self._entries[key]
+
+    def _sweep(self):
+        # Idle, fully committed entries are re-read from the database when next needed
+        now = time.monotonic()
+        if now - self._last_sweep < self.idle_seconds:
+            return
+        with self._lock:
+            self._last_sweep = now
+            stale = [k for k, e in self._entries.items() if not e[1] and now - e[2] > self.idle_seconds]
+            for key in stale:
+                del self._entries[key]  # its lock stays: a submit may be waiting on it
+
+    def __len__(self):
+        return len(self._entries)
+
+class _Waiter:
+    __slots__ = ('record', 'done', 'error')
+
+    def __init__(self, record):
+        self.record = record
+        self.done = threading.Event()
+        self.error = None
+
+class SubmissionIngestor:
+    """
+    Accepts aptitude submissions (submit()) and writes them in batches of up
+    to `batch_size`, at most `flush_interval` seconds after the first one
+    waiting. At most `max_pending` submissions may be accepted but not yet
+    committed; beyond that submit() refuses new ones.
+    """
+    def __init__(self, journal_path, writer=write_batch, load_count=count_attempts, batch_size=200,
+                 flush_interval=0.05, max_pending=5000, fsync=True):
+        self.journal_path = journal_path
+        self.dead_letter_path = journal_path + '.rejected'
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.ledger = AttemptLedger(load_count)
+        self._writer = writer
+        self._listeners = []
+        self._to_journal = queue.Queue()
+        self._to_commit = queue.Queue()
+        self._cond = threading.Condition()
+        self._file_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._pending = 0
+        self._started = False
+        self._stopping = False
+        self._threads = []
+        self._accepted = 0
+        self._rejected = 0
+        self._refused = 0
+        self._committed = 0
+        self._replayed = 0
+        self._journal_syncs = 0
+        self._batches = 0
+        self._retries = 0
+        self._dead_lettered = 0
+
+    def add_listener(self, callback):
+        """callback(rows) after each committed batch, on the committer thread; rows as returned by the writer"""
+        self._listeners.append(callback)
+
+    def start(self):
+        """Replay the journal left by a previous run, then start the journal and commit threads"""
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.recover()  # raises (and start() is tried again later) while the database is unreachable
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+            for target, name in ((self._run_journal, 'aptitude-journal'), (self._run_commit, 'aptitude-commit')):
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._started = True
+
+    def recover(self):
+        """Insert whatever the journal holds (idempotently) and empty it; returns the number of new rows"""
+        if not os.path.exists(self.journal_path):
+            return 0
+        records = []
+        with open(self.journal_path, encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue  # a torn last line: that submission was never acknowledged
+        inserted = 0
+        for start in range(0, len(records), self.batch_size):
+            rows, _ = self._write(records[start:start + self.batch_size])
+            inserted += len(rows)
+            self._notify(rows)
+        with open(self.journal_path, 'w', encoding='utf-8'):
+            pass
+        with self._cond:
+            self._replayed += inserted
+        if records:
+            print(f"Replayed aptitude journal: {len(records)} records, {inserted} not yet in the database")
+        return inserted
+
+    def submit(self, test_id, student_id, attempt_limit, score, total, answers, focus_lost_count=0, paste_attempts=0,
+               choices=None, correct=None, questions_version=None):
+        """
+        Accept a graded submission; returns once it is durable in the journal.
+        `choices`/`correct` are its per-question marks (CompiledTest.mark) for
+        the item statistics and `questions_version` the version of the key it
+        was graded with. Raises AttemptLimitReached or IngestUnavailable.
+        """
+        try:
+            self.start()
+        except Exception as e:
+            raise IngestUnavailable(f'Submissions are not being accepted right now: {e}')
+        with self._cond:
+            if self._pending >= self.max_pending or self._stopping:
+                self._refused += 1
+                raise IngestUnavailable('Too many submissions waiting, please retry')
+            self._pending += 1
+        if not self.ledger.reserve(test_id, student_id, attempt_limit):
+            with self._cond:
+                self._pending -= 1
+                self._rejected += 1
+            raise AttemptLimitReached('Maximum attempts reached')
+
+        waiter = _Waiter({
+            'token': uuid.uuid4().hex,
+            'test_id': test_id,
+            'student_id': student_id,
+            'score': score,
+            'total': total,
+            'answers': answers,
+            'focus_lost_count': focus_lost_count,
+            'paste_attempts': paste_attempts,
+            'choices': choices,
+            'correct': correct,
+            'questions_version': questions_version,
+            'submitted_at': time.time()
+        })
+        self._to_journal.put(waiter)
+        waiter.done.wait()
+        if waiter.error is not None:
+            self.ledger.release(test_id, student_id)
+            with self._cond:
+                self._pending -= 1
+                self._refused += 1
+            raise IngestUnavailable(f'Could not record submission: {waiter.error}')
+        with self._cond:
+            self._accepted += 1
+        return waiter.record['token']
+
+    def _run_journal(self):
+        """Append everything waiting with one write and one fsync, then acknowledge it all"""
+        while True:
+            try:
+                waiters = [self._to_journal.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                if self._stopping:
+                    return
+                continue
+            while True:
+                try:
+                    waiters.append(self._to_journal.get_nowait())
+                except queue.Empty:
+                    break
+            lines = ''.join(json.dumps(w.record, separators=(',', ':')) + '\n' for w in waiters)
+            try:
+                with self._file_lock:
+                    self._file.write(lines)
+                    self._file.flush()
+                    if self.fsync:
+                        os.fsync(self._file.fileno())
+                with self._cond:
+                    self._journal_syncs += 1
+            except OSError as e:
+                for waiter in waiters:
+                    waiter.error = e
+                    waiter.done.set()
+                continue
+            for waiter in waiters:
+                self._to_commit.put(waiter.record)
+                waiter.done.set()
+
+    def _next_batch(self):
+        """Block for the first record, then gather more until the batch is full or the interval is up"""
+        try:
+            batch = [self._to_commit.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and not self._stopping:
+                    batch.append(self._to_commit.get(timeout=remaining))
+                else:
+                    batch.append(self._to_commit.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_commit(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if self._stopping and not self._pending:
+                    return
+                continue
+            rows, dead = self._write_with_retry(batch)
+            dead_tokens = {r['token'] for r in dead}
+            self.ledger.settle([(r['test_id'], r['student_id']) for r in batch if r['token'] not in dead_tokens])
+            for record in dead:
+                self.ledger.release(record['test_id'], record['student_id'])
+            self._notify(rows)  # before the batch stops counting as pending: flush() covers listeners too
+            # The journal is emptied before flush() wakes, and under the file lock so
+            # nothing journaled meanwhile is lost
+            with self._file_lock, self._cond:
+                self._pending -= len(batch)
+                self._committed += len(batch)
+                self._batches += 1
+                if not self._pending:
+                    self._file.truncate(0)
+                    self._file.seek(0)
+                self._cond.notify_all()
+
+    def _write(self, batch):
+        """
+        Write a batch, halving it on a permanent error until the refused records
+        are on their own; those go to the dead-letter file. Returns (rows, dead
+        records). Transient errors propagate.
+        """
+        try:
+            return self._writer(batch), []
+        except PERMANENT_ERRORS as e:
+            if len(batch) == 1:
+                self._dead_letter(batch[0], e)
+                return [], batch
+            middle = len(batch) // 2
+            rows, dead = self._write(batch[:middle])
+            more_rows, more_dead = self._write(batch[middle:])
+            return rows + more_rows, dead + more_dead
+
+    def _dead_letter(self, record, error):
+        print(f"Aptitude submission {record['token']} (test {record['test_id']}, student {record['student_id']}) "
+              f"refused by the database, moved to {self.dead_letter_path}: {error}")
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'error': str(error).strip(), 'record': record}, separators=(',', ':')) + '\n')
+        with self._cond:
+            self._dead_lettered += 1
+
+    def _write_with_retry(self, batch):
+        # The batch is already acknowledged and journaled: keep trying rather than drop it
+        delay = 0.5
+        while True:
+            try:
+                return self._write(batch)
+            except Exception as e:
+                print(f"Error writing {len(batch)} aptitude submissions, retrying in {delay:.1f}s: {e}")
+                with self._cond:
+                    self._retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    def _notify(self, rows):
+        for callback in self._listeners:
+            try:
+                callback(rows)
+            except Exception as e:
+                print(f"Error in aptitude ingest listener: {e}")
+
+    def flush(self, timeout=None):
+        """Block until every accepted submission is committed; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=10):
+        """Commit what is waiting and stop (registered with atexit); the journal covers anything left"""
+        self._stopping = True
+        if self._started:
+            self.flush(timeout)
+            for thread in self._threads:
+                thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pending': self._pending,
+                'accepted': self._accepted,
+                'committed': self._committed,
+                'rejected_attempt_limit': self._rejected,
+                'refused': self._refused,
+                'replayed': self._replayed,
+                'journal_syncs': self._journal_syncs,
+                'batches': self._batches,
+                'avg_batch': round(self._committed / self._batches, 1) if self._batches else 0.0,
+                'retries': self._retries,
+                'dead_lettered': self._dead_lettered,
+                'tracked_students': len(self.ledger)
+            }
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+def get_ingestor():
+    global _ingestor
+    if _ingestor is None:
+        with _ingestor_lock:
+            if _ingestor is None:
+                _ingestor = SubmissionIngestor(
+                    Config.APTITUDE_INGEST_JOURNAL,
+                    batch_size=Config.APTITUDE_INGEST_BATCH_SIZE,
+                    flush_interval=Config.APTITUDE_INGEST_FLUSH_INTERVAL,
+                    max_pending=Config.APTITUDE_INGEST_MAX_PENDING,
+                    fsync=Config.APTITUDE_INGEST_FSYNC
+                )
+                atexit.register(_ingestor.close)
+    return _ingestor
@@ -0,0 +1,107 @@
+import numpy as np
+from psycopg2.extras import execute_values
+
+# Per-question statistics for aptitude tests, kept as running counts in
+# aptitude_item_stats (see migrate_aptitude_item_stats.py): per question, the
+# submissions that had it, how many got it right, how many left it
+# unanswered and how many picked each option.
+#
+# The ingest batch that inserts submissions adds their counts in the same
+# transaction (write_batch in aptitude_ingest.py). A regrade changes what
+# counts as right, so it recomputes the test's rows from its answer matrix
+# (aptitude_regrade.py). Both hold a lock on the test row (the submission
+# foreign key takes one, the regrade selects it FOR UPDATE), so neither can
+# miss the other's submissions. Reading a test's statistics is O(questions)
+# whatever the number of submissions.
+
+OPTION_LIMIT = 26  # options beyond this are junk answers and counted as unanswered
+
+def batch_counts(records):
+    """{(test_id, question): [attempts, correct, unanswered, option_counts]} for journaled submissions"""
+    counts = {}
+    for record in records:
+        choices, correct = record.get('choices'), record.get('correct')
+        if choices is None or correct is None:
+            continue  # journaled before item statistics existed; the migration's backfill covers it
+        for question, (option, right) in enumerate(zip(choices, correct)):
+            entry = counts.setdefault((record['test_id'], question), [0, 0, 0, []])
+            entry[0] += 1
+            entry[1] += right
+            if 0 <= option < OPTION_LIMIT:
+                options = entry[3]
+                if option >= len(options):
+                    options.extend([0] * (option + 1 - len(options)))
+                options[option] += 1
+            else:
+                entry[2] += 1
+    return counts
+
+def matrix_counts(test_id, matrix, correct):
+    """The same counts from a whole test's answer and correctness matrices (see aptitude_regrade.py)"""
+    counts = {}
+    for question in range(matrix.shape[1]):
+        column = matrix[:, question]
+        chosen = column[(column >= 0) & (column < OPTION_LIMIT)]
+        counts[(test_id, question)] = [
+            len(column), int(correct[:, question].sum()), len(column) - len(chosen),
+            np.bincount(chosen).tolist() if len(chosen) else []
+        ]
+    return counts
+
+def add_counts(cursor, counts):
+    """Add counts onto the stored ones, creating rows as needed"""
+    if not counts:
+        return
+    rows = [(test_id, question, *entry) for (test_id, question), entry in sorted(counts.items())]
+    execute_values(cursor, '''
+        INSERT INTO aptitude_item_stats AS s (test_id, question, attempts, correct, unanswered, option_counts)
+        VALUES %s
+        ON CONFLICT (test_id, question) DO UPDATE SET
+            attempts = s.attempts + EXCLUDED.attempts,
+            correct = s.correct + EXCLUDED.correct,
+            unanswered = s.unanswered + EXCLUDED.unanswered,
+            option_counts = ARRAY(
+                SELECT COALESCE(s.option_counts[i], 0) + COALESCE(EXCLUDED.option_counts[i], 0)
+                FROM generate_series(1, GREATEST(cardinality(s.option_counts), cardinality(EXCLUDED.option_counts))) AS i
+                ORDER BY i
+            ),
+            updated_at = CURRENT_TIMESTAMP
+    ''', rows, template='(%s, %s, %s, %s, %s, %s::int[])', page_size=len(rows))
+
+def replace_counts(cursor, test_id, counts):
+    """Make `counts` the test's statistics"""
+    cursor.execute('DELETE FROM aptitude_item_stats WHERE test_id = %s', (test_id,))
+    add_counts(cursor, counts)
+
+ITEM_STATS_SQL = '''
+    SELECT question, attempts, correct, unanswered, option_counts
+    FROM aptitude_item_stats WHERE test_id = %s
+'''
+
+def item_analytics(cursor, test_id, questions):
+    """Per question of the bank `questions`: its key and how submissions answered it"""
+    cursor.execute(ITEM_STATS_SQL, (test_id,))
+    stored = {row['question']: row for row in cursor.fetchall()}
+    items = []
+    for index, question in enumerate(questions):
+        row = stored.get(index)
+        attempts = row['attempts'] if row else 0
+        option_counts = list(row['option_counts']) if row else []
+        options = question.get('options') if isinstance(question.get('options'), list) else []
+        option_counts += [0] * (len(options) - len(option_counts))
+        items.append({
+            'question': index,
+            'text': question.get('question'),
+            'correct_option': question.get('correct'),
+            'attempts': attempts,
+            'correct': row['correct'] if row else 0,
+            'unanswered': row['unanswered'] if row else 0,
+            'difficulty': round(row['correct'] / attempts, 4) if attempts else None,
+            'options': [{
+                'option': i,
+                'text': options[i] if i < len(options) else None,
+                'count': count,
+                'share': round(count / attempts, 4) if attempts else None
+            } for i, count in enumerate(option_counts)]
+        })
+    return items
@@ -0,0 +1,91 @@
+import json
+from config import Config
+from database import get_db
+from ttl_cache import TTLCache
+
+# Aptitude tests compiled once per version of their question bank. The bank
+# is a JSONB array on aptitude_tests and questions_version is bumped by
+# trigger whenever it changes (see migrate_aptitude_jsonb.py), so opening or
+# submitting a test only has to read that version: the answer key and the
+# student-facing questions (the bank without `correct`, already serialized)
+# come from here.
+
+MAX_OPTION = 32767  # option indexes are stored as int16 (see aptitude_regrade.py)
+
+class CompiledTest:
+    __slots__ = ('version', 'answer_key', 'student_questions')
+
+    def __init__(self, version, questions):
+        self.version = version
+        self.answer_key = tuple(_correct_option(q) for q in questions)
+        self.student_questions = json.dumps([{k: v for k, v in q.items() if k != 'correct'} for q in questions])
+
+    def mark(self, answers):
+        """
+        (choices, correct) for `answers` ({"<question index>": <option index>}):
+        per question, the option picked (-1 if none) and 1 if it is right
+        """
+        choices = [choice(answers.get(str(index))) for index in range(len(self.answer_key))]
+        correct = [int(c != -1 and c == key) for c, key in zip(choices, self.answer_key)]
+        return choices, correct
+
+    def grade(self, answers):
+        """Number of correct answers in `answers`"""
+        return sum(self.mark(answers)[1])
+
+def choice(answer):
+    """An answer as an option index, or -1 for a skipped question or junk (which counts as wrong)"""
+    try:
+        answer = int(answer)
+    except (TypeError, ValueError):
+        return -1
+    return answer if 0 <= answer <= MAX_OPTION else -1
+
+def _correct_option(question):
+    try:
+        return int(question['correct'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+_tests = TTLCache(max_size=Config.APTITUDE_CACHE_SIZE, ttl=Config.APTITUDE_CACHE_TTL)
+
+def get_compiled(cursor, test_id, version):
+    """The CompiledTest for `test_id` at `version`, reading the bank only on a miss; None if the test is gone"""
+    compiled = _tests.get((test_id, version))
+    if compiled is None:
+        cursor.execute('SELECT questions, questions_version FROM aptitude_tests WHERE id = %s', (test_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        # Keyed by the version actually read, in case it moved on since the caller looked
+        compiled = CompiledTest(row['questions_version'], row['questions'])
+        _tests.set((test_id, compiled.version), compiled)
+    return compiled
+
+_current = TTLCache(max_size=Config.APTITUDE_CACHE_SIZE, ttl=Config.APTITUDE_VERSION_TTL)
+
+def get_current(test_id):
+    """
+    (CompiledTest, attempt_limit) for a test's current version, or None if it
+    does not exist. The version is re-read at most every APTITUDE_VERSION_TTL
+    seconds, so a burst of submits to one test does not touch the database.
+    """
+    current = _current.get(test_id)
+    if current is None:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT questions_version, attempt_limit FROM aptitude_tests WHERE id = %s', (test_id,))
+        row = cursor.fetchone()
+        compiled = get_compiled(cursor, test_id, row['questions_version']) if row else None
+        conn.close()
+        if compiled is None:
+            return None
+        current = (compiled, row['attempt_limit'])
+        _current.set(test_id, current)
+    return current
+
+def forget(test_id):
+    _current.delete(test_id)
+
+def stats():
+    return {'compiled': _tests.stats(), 'current': _current.stats()}
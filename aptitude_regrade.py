@@ -0,0 +1,181 @@
+"""
+Bulk regrade of an aptitude test's submissions.
+
+When a question's `correct` option turns out to be wrong, every submission
+of the test has to be scored again. Answers are loaded into one dense
+submissions x questions matrix and compared with the key vector in a single
+numpy operation; only the scores that changed are written back, with one
+batched UPDATE. The same matrix gives per-question item statistics:
+
+  difficulty      share of submissions answering the question correctly
+  answered        share of submissions answering it at all
+  discrimination  correlation between getting the question right and the
+                  score on the rest of the test (corrected point-biserial);
+                  near zero or negative marks a question worth re-checking
+
+    python aptitude_regrade.py <test_id> [--fix <question>=<option> ...] [--dry-run]
+
+Also served as POST /api/aptitude/<test_id>/regrade.
+"""
+import json
+import sys
+import time
+import numpy as np
+from psycopg2.extras import execute_values
+from database import get_db
+from aptitude_keys import CompiledTest, choice
+import aptitude_items
+import leaderboard
+
+UNANSWERED = -1  # matrix cell for a skipped question or an answer that is not an option index
+
+def apply_corrections(questions, corrections):
+    """
+    The bank with `corrections` ({"<question index>": <option index>}) applied.
+    Raises ValueError for a question or option that does not exist.
+    """
+    questions = [dict(q) for q in questions]
+    for index, option in corrections.items():
+        try:
+            index, option = int(index), int(option)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid correction {index!r}: {option!r}')
+        if not 0 <= index < len(questions):
+            raise ValueError(f'No question {index}')
+        options = questions[index].get('options')
+        if option < 0 or (isinstance(options, list) and option >= len(options)):
+            raise ValueError(f'Question {index} has no option {option}')
+        questions[index]['correct'] = option
+    return questions
+
+def answer_matrix(answer_blobs, questions):
+    """int16 matrix of chosen options, one row per submission's `answers` JSON"""
+    matrix = np.full((len(answer_blobs), questions), UNANSWERED, dtype=np.int16)
+    for row, blob in enumerate(answer_blobs):
+        try:
+            answers = json.loads(blob) if isinstance(blob, str) else blob
+        except ValueError:
+            continue
+        if not isinstance(answers, dict):
+            continue
+        # Read the same way as at submit time (CompiledTest.mark)
+        matrix[row] = [choice(answers.get(str(index))) for index in range(questions)]
+    return matrix
+
+def key_vector(questions):
+    return np.array([UNANSWERED if c is None else c for c in CompiledTest(None, questions).answer_key], dtype=np.int16)
+
+def grade(matrix, key):
+    """(correct, scores): which answers are right, and the score of each submission"""
+    # A question without a valid key counts for nobody
+    correct = (matrix == key) & (key != UNANSWERED)
+    return correct, correct.sum(axis=1)
+
+def item_stats(matrix, correct, scores):
+    """Per-question difficulty, answered share and discrimination (None where undefined)"""
+    questions = matrix.shape[1]
+    if not len(scores):
+        return [{'question': i, 'difficulty': None, 'answered': None, 'discrimination': None} for i in range(questions)]
+    items = correct.astype(np.float64)
+    rest = scores[:, None] - items  # score on the other questions
+    items_c = items - items.mean(axis=0)
+    rest_c = rest - rest.mean(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Everyone right (or wrong) on a question, or on the rest: no correlation to speak of
+        discrimination = (items_c * rest_c).sum(axis=0) / np.sqrt((items_c ** 2).sum(axis=0) * (rest_c ** 2).sum(axis=0))
+    difficulty = items.mean(axis=0)
+    answered = (matrix != UNANSWERED).mean(axis=0)
+    return [{
+        'question': i,
+        'difficulty': round(float(difficulty[i]), 4),
+        'answered': round(float(answered[i]), 4),
+        'discrimination': round(float(discrimination[i]), 4) if np.isfinite(discrimination[i]) else None
+    } for i in range(questions)]
+
+def load_graded(cursor, test_id, questions):
+    """(submissions, matrix, correct, scores) for every submission of a test, graded against `questions`"""
+    cursor.execute('''
+        SELECT id, student_id, score, total_questions, answers
+        FROM aptitude_submissions WHERE test_id = %s ORDER BY id
+    ''', (test_id,))
+    submissions = cursor.fetchall()
+    matrix = answer_matrix([s['answers'] for s in submissions], len(questions))
+    correct, scores = grade(matrix, key_vector(questions))
+    return submissions, matrix, correct, scores
+
+def regrade_test(cursor, test_id, corrections=None, dry_run=False):
+    """
+    Apply `corrections` to the test's key (if any), rescore its submissions,
+    refresh the leaderboard rows of students whose score changed and
+    recompute the test's item statistics (see aptitude_items.py). Runs in
+    the caller's transaction; returns None if the test does not exist.
+    """
+    start = time.perf_counter()
+    cursor.execute('SELECT mentor_id, questions FROM aptitude_tests WHERE id = %s FOR UPDATE', (test_id,))
+    test = cursor.fetchone()
+    if not test:
+        return None
+    questions = test['questions']
+    if corrections:
+        questions = apply_corrections(questions, corrections)
+        cursor.execute('UPDATE aptitude_tests SET questions = %s::jsonb WHERE id = %s', (json.dumps(questions), test_id))
+
+    submissions, matrix, correct, scores = load_graded(cursor, test_id, questions)
+    total = len(questions)
+
+    old = np.array([s['score'] or 0 for s in submissions], dtype=np.int64)
+    stale = np.nonzero((scores != old) | np.array([s['total_questions'] != total for s in submissions], dtype=bool))[0]
+    updates = [(submissions[i]['id'], int(scores[i]), total) for i in stale]
+    if updates and not dry_run:
+        execute_values(cursor, '''
+            UPDATE aptitude_submissions s
+            SET score = v.score, total_questions = v.total_questions
+            FROM (VALUES %s) AS v (id, score, total_questions)
+            WHERE s.id = v.id
+        ''', updates, page_size=len(updates))
+        leaderboard.refresh_students(cursor, sorted({submissions[i]['student_id'] for i in stale}))
+    if not dry_run:
+        aptitude_items.replace_counts(cursor, test_id, aptitude_items.matrix_counts(test_id, matrix, correct))
+
+    return {
+        'test_id': test_id,
+        'mentor_id': test['mentor_id'],
+        'submissions': len(submissions),
+        'questions': total,
+        'changed': len(updates),
+        'mean_score_before': round(float(old.mean()), 2) if len(old) else None,
+        'mean_score_after': round(float(scores.mean()), 2) if len(scores) else None,
+        'items': item_stats(matrix, correct, scores),
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    dry_run = '--dry-run' in args
+    corrections = {}
+    positional = []
+    while args:
+        arg = args.pop(0)
+        if arg == '--fix' and args:
+            question, _, option = args.pop(0).partition('=')
+            corrections[question] = option
+        elif arg != '--dry-run':
+            positional.append(arg)
+    if len(positional) != 1:
+        sys.exit('usage: python aptitude_regrade.py <test_id> [--fix <question>=<option> ...] [--dry-run]')
+
+    conn = get_db()
+    cursor = conn.cursor()
+    result = regrade_test(cursor, int(positional[0]), corrections, dry_run)
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+    conn.close()
+    if result is None:
+        sys.exit('No such test')
+    print(f"Test {result['test_id']}: {result['submissions']} submissions, {result['changed']} rescored, "
+          f"mean {result['mean_score_before']} -> {result['mean_score_after']} ({result['seconds']}s)")
+    for item in result['items']:
+        print(f"  Q{item['question'] + 1:<3} difficulty {item['difficulty']}  answered {item['answered']}  "
+              f"discrimination {item['discrimination']}")
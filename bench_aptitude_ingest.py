@@ -0,0 +1,69 @@
+"""
+A class submitting an aptitude test at its deadline: one insert transaction
+per request (as before) against the journaled, batched ingestor. The writer
+simulates a database round trip plus per-row cost, with a fixed number of
+connections like the pool.
+
+    python bench_aptitude_ingest.py [students] [commit_ms]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from aptitude_ingest import SubmissionIngestor
+
+POOL_SIZE = 10
+ROW_MS = 0.05
+
+class SimulatedDatabase:
+    def __init__(self, commit_ms):
+        self.commit_ms = commit_ms
+        self.connections = threading.Semaphore(POOL_SIZE)
+        self.transactions = 0
+
+    def write(self, records):
+        with self.connections:
+            time.sleep((self.commit_ms + ROW_MS * len(records)) / 1000)
+            self.transactions += 1
+        return [{'id': i, 'student_id': r['student_id'], 'test_id': r['test_id']} for i, r in enumerate(records)]
+
+def burst(students, submit):
+    latencies = [0.0] * students
+    gate = threading.Barrier(students)
+    def student(i):
+        gate.wait()
+        start = time.perf_counter()
+        submit(i)
+        latencies[i] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    threads = [threading.Thread(target=student, args=(i,)) for i in range(students)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sorted(latencies)
+
+def report(label, students, elapsed, latencies, transactions):
+    print(f"{label:8} {students:5} submits  {students / elapsed:8.1f} submits/s  "
+          f"p50 {statistics.median(latencies):7.1f}ms  p95 {latencies[int(0.95 * (students - 1))]:7.1f}ms  "
+          f"{transactions} transactions")
+
+if __name__ == '__main__':
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    commit_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    db = SimulatedDatabase(commit_ms)
+    record = lambda i: {'student_id': i, 'test_id': 1}
+    elapsed, latencies = burst(students, lambda i: db.write([record(i)]))
+    report('direct', students, elapsed, latencies, db.transactions)
+
+    db = SimulatedDatabase(commit_ms)
+    ingestor = SubmissionIngestor(os.path.join(tempfile.mkdtemp(), 'aptitude.jsonl'), db.write, lambda *_: 0)
+    ingestor.start()
+    elapsed, latencies = burst(students, lambda i: ingestor.submit(1, i, 1, 3, 5, {'0': 1}))
+    ingestor.flush()
+    report('ingest', students, elapsed, latencies, db.transactions)
+    print(f"ingestor: {ingestor.stats()}")
+    ingestor.close()
@@ -0,0 +1,49 @@
+"""
+Throughput / latency of the local judge: a fresh interpreter per test case
+(cold) against the warm sandbox worker pool.
+
+    python bench_judge.py [submissions] [cases_per_submission]
+"""
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import code_runner
+from worker_pool import get_worker_pool
+
+SOLUTION = """
+import sys
+from collections import Counter
+nums = list(map(int, sys.stdin.read().split()))
+print(max(Counter(nums).items(), key=lambda kv: (kv[1], -kv[0]))[0])
+"""
+
+def make_cases(count):
+    cases = []
+    for i in range(count):
+        nums = [(i * 7 + j * 3) % 11 for j in range(200)] + [5] * 30
+        cases.append({'input': ' '.join(map(str, nums)), 'output': '5'})
+    return cases
+
+def bench(label, submissions, cases, warm):
+    # A class submitting at once: several submissions graded concurrently
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        reports = list(pool.map(lambda _: code_runner.judge(SOLUTION, 'python', cases, warm=warm), range(submissions)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(case['time_ms'] for report in reports for case in report['cases'])
+    total = len(latencies)
+    passed = sum(report['passed'] for report in reports)
+    print(f"{label:6} {total:5} cases  {total / elapsed:8.1f} cases/s  "
+          f"p50 {statistics.median(latencies):7.1f}ms  p95 {latencies[int(0.95 * (total - 1))]:7.1f}ms  "
+          f"passed {passed}/{total}")
+
+if __name__ == '__main__':
+    submissions = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    cases = make_cases(int(sys.argv[2]) if len(sys.argv) > 2 else 20)
+
+    get_worker_pool().start()  # workers are started with the app, not per request
+    bench('cold', submissions, cases, warm=False)
+    bench('warm', submissions, cases, warm=True)
+    print(f"pool: {get_worker_pool().stats()}")
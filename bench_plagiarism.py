@@ -0,0 +1,69 @@
+"""
+Plagiarism scoring cost for a problem with many prior submissions: the
+original serial SequenceMatcher.ratio() loop over character-normalized code,
+the same loop over token streams, and bounded scoring, in-thread and on the
+process pool.
+
+    python bench_plagiarism.py [prior_submissions]
+"""
+import difflib
+import random
+import re
+import sys
+import time
+from plagiarism_checker import normalize_code, score_candidates, get_executor, THRESHOLD
+
+SOLUTIONS = [
+    "def second_largest(nums):\n    uniq = sorted(set(nums))\n    return uniq[-2] if len(uniq) > 1 else None\n",
+    "def second_largest(arr):\n    first = second = float('-inf')\n    for x in arr:\n        if x > first:\n            first, second = x, first\n        elif first > x > second:\n            second = x\n    return None if second == float('-inf') else second\n",
+    "def second_largest(values):\n    best = max(values)\n    rest = [v for v in values if v != best]\n    return max(rest) if rest else None\n",
+]
+
+def make_submission(rng, index):
+    base = rng.choice(SOLUTIONS)
+    names = ['nums', 'arr', 'values', 'data', 'items', 'lst']
+    code = base.replace('nums', rng.choice(names)).replace('arr', rng.choice(names))
+    # Students pad solutions with helpers, tests and comments of varying length
+    extra = ''.join(
+        f"\n# attempt {index}-{k}\ndef helper_{index}_{k}(x):\n    return [i * {rng.randint(2, 9)} for i in range(x)]\n"
+        for k in range(rng.randint(0, 12))
+    )
+    return code + extra + f"\nprint(second_largest([{', '.join(str(rng.randint(0, 99)) for _ in range(rng.randint(3, 40)))}]))\n"
+
+def normalize_chars(code):
+    """The pre-tokenizer normalization: comments and whitespace stripped, lowercased"""
+    code = re.sub(r'#.*', '', code)
+    return ''.join(code.split()).lower()
+
+def baseline(new_code, candidates):
+    best, source = 0.0, None
+    for student_id, code in candidates:
+        similarity = difflib.SequenceMatcher(None, new_code, code, autojunk=False).ratio()
+        if similarity > best:
+            best, source = similarity, student_id
+    return best, source
+
+def timed(label, fn, reference=None):
+    start = time.perf_counter()
+    best, source = fn()
+    elapsed = time.perf_counter() - start
+    note = '' if reference is None else ('  (same verdict)' if (best >= THRESHOLD) == (reference[0] >= THRESHOLD) else '  (VERDICT DIFFERS)')
+    print(f"{label:22} {elapsed * 1000:9.1f}ms  max similarity {best:.3f}{note}")
+    return (best, source), elapsed
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rng = random.Random(42)
+    sources = [make_submission(rng, i) for i in range(count + 1)]
+    char_candidates = [(i, normalize_chars(code)) for i, code in enumerate(sources[:-1])]
+    candidates = [(i, normalize_code(code)) for i, code in enumerate(sources[:-1])]
+    new_code = normalize_code(sources[-1])
+    print(f"{count} prior submissions, avg {sum(len(c) for _, c in char_candidates) // count} normalized chars, "
+          f"{sum(len(c) for _, c in candidates) // count} tokens\n")
+
+    _, chars = timed('serial ratio(), chars', lambda: baseline(normalize_chars(sources[-1]), char_candidates))
+    reference, base = timed('serial ratio(), tokens', lambda: baseline(new_code, candidates))
+    _, bounded = timed('bounds, in-thread', lambda: score_candidates(new_code, candidates, parallel=False), reference)
+    get_executor().submit(len, '').result()  # start the pool outside the timing
+    _, pooled = timed('bounds, process pool', lambda: score_candidates(new_code, candidates, parallel=True), reference)
+    print(f"\nspeedup: tokens {chars / base:.1f}x, tokens + bounds {chars / bounded:.1f}x, tokens + bounds + pool {chars / pooled:.1f}x")
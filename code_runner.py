@@ -0,0 +1,224 @@
+import json
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from worker_pool import PoolUnavailable, get_worker_pool
+import sandbox_jail
+
+# Local judge: runs a submission against a problem's test cases in a
+# resource-limited child process and reports a verdict per case. Every run
+# (compiling included) happens in sandbox_jail.py: no network, none of the
+# host filesystem, an unprivileged uid. When the jail cannot be set up the
+# code is not run at all and judge() raises SandboxUnavailable.
+#
+# Test cases are only executable when problems.test_cases holds a JSON list:
+#     [{"input": "1 2\n", "output": "3"}, ...]
+# ("expected"/"expected_output" are accepted for "output"; a single case may
+# also use problems.expected_output). Anything else is prose for the LLM.
+
+SUPPORTED_LANGUAGES = ('python', 'c')
+
+PASSED = 'passed'
+WRONG_ANSWER = 'wrong_answer'
+RUNTIME_ERROR = 'runtime_error'
+TIME_LIMIT = 'time_limit_exceeded'
+OUTPUT_LIMIT = 'output_limit_exceeded'
+COMPILE_ERROR = 'compile_error'
+
+class SandboxUnavailable(OSError):
+    """The jail could not be set up, so nothing was run (callers grade without the judge)"""
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def parse_test_cases(test_cases, expected_output=None):
+    """[{'input': str, 'output': str}, ...] or [] when the problem has no runnable cases"""
+    if not test_cases:
+        return []
+    try:
+        raw = json.loads(test_cases)
+    except (TypeError, ValueError):
+        return []
+    if isinstance(raw, dict):
+        raw = [raw]
+    if not isinstance(raw, list):
+        return []
+
+    cases = []
+    for item in raw[:Config.JUDGE_MAX_CASES]:
+        if not isinstance(item, dict) or 'input' not in item:
+            return []
+        output = item.get('output', item.get('expected', item.get('expected_output')))
+        if output is None and len(raw) == 1:
+            output = expected_output
+        if output is None:
+            return []
+        cases.append({'input': _as_text(item['input']), 'output': _as_text(output)})
+    return cases
+
+def _as_text(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return '\n'.join(_as_text(v) for v in value)
+    return json.dumps(value)
+
+def outputs_match(actual, expected):
+    """Trailing whitespace on each line and trailing blank lines are not significant"""
+    def normalize(text):
+        return '\n'.join(line.rstrip() for line in text.replace('\r\n', '\n').strip('\n').split('\n'))
+    return normalize(actual) == normalize(expected)
+
+def _sandbox_env():
+    return {'PATH': '/usr/bin:/bin', 'HOME': sandbox_jail.SANDBOX_DIR, 'LANG': 'C.UTF-8', 'PYTHONDONTWRITEBYTECODE': '1'}
+
+def run_sandboxed(argv, workdir, stdin_text='', cpu_seconds=None, memory_mb=None, output_kb=None, wall_seconds=None):
+    """
+    Run argv jailed, with workdir as its /sandbox (argv uses paths as seen
+    from inside), under rlimits. stdout goes to a file so RLIMIT_FSIZE bounds
+    it. Returns dict(exit_code, timed_out, output_exceeded, stdout, stderr,
+    time_ms); raises SandboxUnavailable when the jail could not be set up.
+    """
+    cpu_seconds = cpu_seconds or Config.JUDGE_CPU_SECONDS
+    memory_mb = memory_mb or Config.JUDGE_MEMORY_MB
+    output_kb = output_kb or Config.JUDGE_OUTPUT_KB
+    wall_seconds = wall_seconds or cpu_seconds * 2 + 1
+
+    fd, stdout_path = tempfile.mkstemp(dir=workdir, prefix='stdout-')
+    os.close(fd)
+    status_r, status_w = os.pipe()
+    with open(stdout_path, 'wb') as stdout_file:
+        start = time.perf_counter()
+        try:
+            proc = subprocess.Popen(
+                sandbox_jail.jail_argv(workdir, argv, cpu_seconds, memory_mb, output_kb, status_fd=status_w),
+                cwd=workdir,
+                env=_sandbox_env(),
+                stdin=subprocess.PIPE,
+                stdout=stdout_file,
+                stderr=subprocess.PIPE,
+                pass_fds=(status_w,),
+                start_new_session=True  # own process group, so a timeout kills everything it spawned
+            )
+        finally:
+            os.close(status_w)
+        timed_out = False
+        try:
+            _, stderr = proc.communicate(stdin_text.encode('utf-8'), timeout=wall_seconds)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            os.killpg(proc.pid, signal.SIGKILL)
+            _, stderr = proc.communicate()
+        except BrokenPipeError:
+            # Program exited without reading all of its input
+            stderr = proc.stderr.read()
+            proc.wait()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    with os.fdopen(status_r, 'rb') as status_file:
+        status = status_file.read().decode('utf-8', errors='replace')
+    if status.startswith('error'):
+        os.unlink(stdout_path)
+        raise SandboxUnavailable(f'Sandbox unavailable, submission not run: {status}')
+
+    # Interpreters that ignore SIGXFSZ see EFBIG instead; a full file means the same thing
+    output_full = os.path.getsize(stdout_path) >= output_kb * 1024
+    with open(stdout_path, 'rb') as f:
+        stdout = f.read(output_kb * 1024).decode('utf-8', errors='replace')
+    os.unlink(stdout_path)
+
+    exit_code = proc.returncode
+    return {
+        'exit_code': exit_code,
+        'timed_out': timed_out or exit_code in (-signal.SIGXCPU, -signal.SIGKILL),
+        'output_exceeded': exit_code == -signal.SIGXFSZ or (exit_code != 0 and output_full),
+        'stdout': stdout,
+        'stderr': stderr[-2000:].decode('utf-8', errors='replace').replace(sandbox_jail.SANDBOX_DIR + '/', ''),
+        'time_ms': round(elapsed_ms, 1)
+    }
+
+def verdict_for(run, expected):
+    if run['output_exceeded']:
+        return OUTPUT_LIMIT
+    if run['timed_out']:
+        return TIME_LIMIT
+    if run['exit_code'] != 0:
+        return RUNTIME_ERROR
+    return PASSED if outputs_match(run['stdout'], expected) else WRONG_ANSWER
+
+def prepare(code, language, workdir):
+    """Write (and for C, compile) the submission. Returns (argv, compile_error_text); argv uses jail paths"""
+    jailed = sandbox_jail.SANDBOX_DIR + '/'
+    if language == 'python':
+        with open(os.path.join(workdir, 'solution.py'), 'w') as f:
+            f.write(code)
+        return [sandbox_jail.PYTHON, '-I', jailed + 'solution.py'], None
+
+    with open(os.path.join(workdir, 'solution.c'), 'w') as f:
+        f.write(code)
+    run = run_sandboxed(
+        [shutil.which('gcc') or '/usr/bin/gcc', '-O2', '-std=c11', '-o', jailed + 'solution', jailed + 'solution.c', '-lm'],
+        workdir,
+        cpu_seconds=Config.JUDGE_COMPILE_SECONDS,
+        memory_mb=max(Config.JUDGE_MEMORY_MB, 512),
+        output_kb=16384
+    )
+    if run['exit_code'] != 0 or run['timed_out']:
+        return None, run['stderr'] or 'Compilation failed'
+    return [jailed + 'solution'], None
+
+def get_executor():
+    """Shared across grading jobs so the number of live sandboxes stays bounded"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=Config.JUDGE_WORKERS, thread_name_prefix='judge')
+    return _executor
+
+def judge(code, language, cases, warm=None):
+    """
+    Run every case in parallel. Python cases go to the warm worker pool unless
+    warm=False (or JUDGE_WARM_WORKERS is off). Returns a JSON-serialisable report:
+    {'language', 'passed', 'total', 'compile_error', 'wall_ms', 'cases': [{'verdict', 'time_ms', ...}]}
+    """
+    if warm is None:
+        warm = Config.JUDGE_WARM_WORKERS
+    start = time.perf_counter()
+    report = {'language': language, 'passed': 0, 'total': len(cases), 'compile_error': None, 'cases': []}
+    workdir = tempfile.mkdtemp(prefix='judge-')
+    os.chmod(workdir, 0o700)
+    try:
+        argv, compile_error = prepare(code, language, workdir)
+        run_case = lambda case: run_sandboxed(argv, workdir, case['input'])
+        if language == 'python' and warm:
+            pool = get_worker_pool()
+            def run_case(case):
+                try:
+                    return pool.run(code, case['input'])
+                except PoolUnavailable:
+                    # Workers busy or failing to start: a fresh interpreter per case instead
+                    return run_sandboxed(argv, workdir, case['input'])
+
+        if compile_error:
+            report['compile_error'] = compile_error[:2000]
+            report['cases'] = [{'verdict': COMPILE_ERROR, 'time_ms': 0.0} for _ in cases]
+        else:
+            runs = list(get_executor().map(run_case, cases))
+            for case, run in zip(cases, runs):
+                verdict = verdict_for(run, case['output'])
+                entry = {'verdict': verdict, 'time_ms': run['time_ms']}
+                if verdict != PASSED:
+                    entry['stdout'] = run['stdout'][:500]
+                    entry['stderr'] = run['stderr'][-500:]
+                report['cases'].append(entry)
+            report['passed'] = sum(1 for c in report['cases'] if c['verdict'] == PASSED)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    report['wall_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return report
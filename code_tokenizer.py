@@ -0,0 +1,171 @@
+"""
+Language-aware tokenizer for plagiarism checks.
+
+Source code becomes a stream of small integer token ids: keywords, operators
+and common library names keep their own id, while every other identifier
+becomes ID, every number NUM and every string/char literal STR. Comments and
+layout are dropped. Renaming variables or rewording strings therefore leaves
+the stream unchanged.
+
+The stream is packed into a str, one character per token (see
+encode_tokens), so it can live in a TEXT column, be hashed, and be compared
+with difflib at C speed. Token ids are stored in the database: only ever
+append to the vocabulary lists below, and re-run the signature backfill if an
+existing id has to change.
+"""
+import io
+import re
+import tokenize
+
+TOKEN_BASE = 0x100  # token id 0 is chr(0x100); every id stays a 2-byte UTF-8 char
+
+CATEGORIES = ['ID', 'NUM', 'STR', 'NEWLINE', 'INDENT', 'DEDENT', 'OTHER']
+
+PYTHON_KEYWORDS = [
+    'False', 'None', 'True', 'and', 'as', 'assert', 'async', 'await', 'break', 'class',
+    'continue', 'def', 'del', 'elif', 'else', 'except', 'finally', 'for', 'from', 'global',
+    'if', 'import', 'in', 'is', 'lambda', 'nonlocal', 'not', 'or', 'pass', 'raise',
+    'return', 'try', 'while', 'with', 'yield', 'match', 'case'
+]
+
+C_KEYWORDS = [
+    'if', 'else', 'for', 'while', 'break', 'continue', 'return', 'case', 'class', 'try',
+    'auto', 'bool', 'char', 'const', 'default', 'do', 'double', 'enum', 'extern', 'float',
+    'goto', 'int', 'long', 'register', 'short', 'signed', 'sizeof', 'static', 'struct',
+    'switch', 'typedef', 'union', 'unsigned', 'void', 'volatile', 'inline', 'restrict',
+    'NULL', 'true', 'false', '#include', '#define', '#if', '#ifdef', '#ifndef', '#else',
+    '#endif', '#pragma', 'new', 'delete', 'this', 'public', 'private', 'protected',
+    'static_cast', 'template', 'typename', 'namespace', 'using', 'std', 'extends',
+    'implements', 'interface', 'final', 'throws', 'throw', 'catch', 'null', 'boolean',
+    'String', 'System', 'package', 'instanceof', 'super', 'vector', 'string', 'cin', 'cout',
+    'endl'
+]
+
+SQL_KEYWORDS = [
+    'from', 'as', 'and', 'or', 'not', 'in', 'is', 'null', 'case', 'else', 'with', 'delete',
+    'select', 'distinct', 'where', 'group', 'by', 'having', 'order', 'limit', 'offset',
+    'join', 'left', 'right', 'inner', 'outer', 'on', 'union', 'all', 'insert', 'into',
+    'values', 'update', 'set', 'create', 'table', 'between', 'like', 'exists', 'asc', 'desc',
+    'count', 'sum', 'avg', 'min', 'max', 'when', 'then', 'end', 'true', 'false'
+]
+
+# Library names kept distinct: which functions a solution calls says more than what it names its variables
+BUILTINS = [
+    'print', 'input', 'range', 'len', 'int', 'str', 'float', 'list', 'dict', 'set', 'tuple',
+    'sorted', 'sum', 'min', 'max', 'abs', 'map', 'filter', 'zip', 'enumerate', 'reversed',
+    'open', 'isinstance', 'append', 'split', 'join', 'strip', 'self', 'printf', 'scanf',
+    'puts', 'gets', 'fgets', 'malloc', 'calloc', 'free', 'strlen', 'strcpy', 'strcmp',
+    'memset', 'main', 'return', 'sqrt', 'pow', 'println', 'out', 'Scanner', 'nextInt'
+]
+
+OPERATORS = [
+    '(', ')', '[', ']', '{', '}', ',', ':', ';', '.', '+', '-', '*', '/', '%', '**', '//',
+    '=', '==', '!=', '<', '>', '<=', '>=', '+=', '-=', '*=', '/=', '%=', '**=', '//=', '&',
+    '|', '^', '~', '<<', '>>', '&=', '|=', '^=', '<<=', '>>=', '->', '@', '@=', ':=', '...',
+    '&&', '||', '!', '++', '--', '?', '::', '<>'
+]
+
+VOCABULARY = {}
+for _token in CATEGORIES + PYTHON_KEYWORDS + C_KEYWORDS + SQL_KEYWORDS + BUILTINS + OPERATORS:
+    VOCABULARY.setdefault(_token, len(VOCABULARY))
+
+ID, NUM, STR, NEWLINE, INDENT, DEDENT, OTHER = (VOCABULARY[name] for name in CATEGORIES)
+
+# Words each language keeps; any other word is an identifier (`values` is a keyword in SQL only)
+_WORDS = {
+    'python': frozenset(PYTHON_KEYWORDS + BUILTINS),
+    'c': frozenset(C_KEYWORDS + BUILTINS),
+    'sql': frozenset(SQL_KEYWORDS)
+}
+
+_OPERATOR_PATTERN = '|'.join(re.escape(op) for op in sorted(OPERATORS, key=len, reverse=True))
+
+def _lexer(comment, case_insensitive=False, preprocessor=False):
+    parts = [
+        r'(?P<skip>\s+|/\*.*?(?:\*/|\Z)|' + comment + r')',
+        r'(?P<str>"""[\s\S]*?(?:"""|\Z)|\'\'\'[\s\S]*?(?:\'\'\'|\Z)|"(?:\\.|[^"\\\n])*"?|\'(?:\\.|[^\'\\\n])*\'?)',
+        r'(?P<num>\.?\d(?:[\w.]|[eEpP][+-])*)',
+        r'(?P<word>[A-Za-z_$][\w$]*)',
+        r'(?P<op>' + _OPERATOR_PATTERN + r')',
+        r'(?P<other>\S)'
+    ]
+    if preprocessor:
+        # #include <...> is boilerplate: one token for the whole line
+        parts.insert(0, r'(?P<include>^[ \t]*\#[ \t]*include[^\n]*)|(?P<directive>^[ \t]*\#[ \t]*\w+)')
+    return re.compile('|'.join(parts), re.MULTILINE | re.DOTALL), case_insensitive
+
+_LEXERS = {
+    'c': _lexer(r'//[^\n]*', preprocessor=True),
+    'python': _lexer(r'\#[^\n]*'),  # only used when tokenize rejects the source
+    'sql': _lexer(r'--[^\n]*|\#[^\n]*', case_insensitive=True)
+}
+
+def _word(word, language):
+    return VOCABULARY[word] if word in _WORDS[language] else ID
+
+def lex(code, language='c'):
+    """Token ids from the regex lexer: C, C++, Java, SQL, and Python that does not tokenize"""
+    if language not in _LEXERS:
+        language = 'c'
+    pattern, case_insensitive = _LEXERS[language]
+    tokens = []
+    for match in pattern.finditer(code):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == 'skip':
+            continue
+        if kind == 'include':
+            tokens.append(VOCABULARY['#include'])
+        elif kind == 'directive':
+            tokens.append(VOCABULARY.get('#' + text.lstrip(' \t#'), OTHER))
+        elif kind == 'str':
+            tokens.append(STR)
+        elif kind == 'num':
+            tokens.append(NUM)
+        elif kind == 'word':
+            tokens.append(_word(text.lower() if case_insensitive else text, language))
+        elif kind == 'op':
+            tokens.append(VOCABULARY[text])
+        else:
+            tokens.append(OTHER)
+    return tokens
+
+def tokenize_python(code):
+    """Token ids from the stdlib tokenizer; raises SyntaxError/TokenError on source it cannot read"""
+    tokens = []
+    for token in tokenize.generate_tokens(io.StringIO(code).readline):
+        kind = token.type
+        if kind == tokenize.NAME:
+            tokens.append(_word(token.string, 'python'))
+        elif kind == tokenize.NUMBER:
+            tokens.append(NUM)
+        elif kind == tokenize.STRING:
+            tokens.append(STR)
+        elif kind == tokenize.OP:
+            tokens.append(VOCABULARY.get(token.string, OTHER))
+        elif kind == tokenize.NEWLINE:
+            tokens.append(NEWLINE)
+        elif kind == tokenize.INDENT:
+            tokens.append(INDENT)
+        elif kind == tokenize.DEDENT:
+            tokens.append(DEDENT)
+        elif kind == tokenize.ERRORTOKEN and not token.string.isspace():
+            tokens.append(OTHER)
+        # COMMENT, NL, ENCODING and ENDMARKER carry nothing to compare
+    return tokens
+
+def tokenize_code(code, language='python'):
+    """List of token ids for `code` in `language` (unknown languages use the C-family lexer)"""
+    language = (language or 'python').lower()
+    if language == 'python':
+        try:
+            return tokenize_python(code)
+        except (SyntaxError, tokenize.TokenError):
+            return lex(code, 'python')
+    return lex(code, 'sql' if language == 'sql' else 'c')
+
+def encode_tokens(tokens):
+    return ''.join(chr(TOKEN_BASE + token) for token in tokens)
+
+def decode_tokens(text):
+    return [ord(char) - TOKEN_BASE for char in text]
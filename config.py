@@ -6,8 +6,78 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     GROQ_API_KEY = os.getenv('GROQ_API_KEY', '')
+    GROQ_BASE_URL = os.getenv('GROQ_BASE_URL')  # override to point at a local stub LLM endpoint
     DATABASE_URL = os.getenv('DATABASE_URL')
     # Backup for local dev if needed, but primary is URL
     DATABASE_PATH = 'database.db'
+    # Connection pool (see database.ConnectionPool)
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+    DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 5))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))  # seconds to wait for a free connection
+    DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))  # ping idle connections older than this
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    # Background grading of submissions (see evaluation_queue.py)
+    EVAL_WORKERS = int(os.getenv('EVAL_WORKERS', 4))
+    EVAL_MAX_ATTEMPTS = int(os.getenv('EVAL_MAX_ATTEMPTS', 3))  # then the submission is rejected with an error result
+    # AI evaluation cache (see evaluation_cache.py)
+    EVAL_CACHE_SIZE = int(os.getenv('EVAL_CACHE_SIZE', 2048))
+    EVAL_CACHE_TTL = int(os.getenv('EVAL_CACHE_TTL', 3600))  # seconds in the in-process LRU
+    EVAL_CACHE_MAX_AGE_DAYS = int(os.getenv('EVAL_CACHE_MAX_AGE_DAYS', 30))  # rows older than this are ignored
+    # Shared Groq HTTP client (see ai_evaluator.get_groq_client)
+    GROQ_MAX_CONNECTIONS = int(os.getenv('GROQ_MAX_CONNECTIONS', 20))
+    GROQ_MAX_KEEPALIVE = int(os.getenv('GROQ_MAX_KEEPALIVE', 10))
+    GROQ_KEEPALIVE_EXPIRY = float(os.getenv('GROQ_KEEPALIVE_EXPIRY', 60))
+    GROQ_TIMEOUT = float(os.getenv('GROQ_TIMEOUT', 60))
+    GROQ_CONNECT_TIMEOUT = float(os.getenv('GROQ_CONNECT_TIMEOUT', 5))
+    GROQ_MAX_RETRIES = int(os.getenv('GROQ_MAX_RETRIES', 2))
+    GROQ_HTTP2 = os.getenv('GROQ_HTTP2', 'true').lower() == 'true'  # used only when the h2 package is installed
+    # Student leaderboard summary table (see leaderboard.py)
+    LEADERBOARD_MAX_STALENESS = int(os.getenv('LEADERBOARD_MAX_STALENESS', 900))  # seconds between background full rebuilds, 0 = off
+    # Per-user cache for /api/stats and /api/stats/dashboard
+    STATS_CACHE_TTL = int(os.getenv('STATS_CACHE_TTL', 15))  # seconds
+    # Submission list pagination (see pagination.py)
+    SUBMISSIONS_PAGE_SIZE = int(os.getenv('SUBMISSIONS_PAGE_SIZE', 50))
+    SUBMISSIONS_MAX_PAGE_SIZE = int(os.getenv('SUBMISSIONS_MAX_PAGE_SIZE', 200))
+    # Buffered activity logging (see activity_logger.py)
+    ACTIVITY_LOG_BATCH_SIZE = int(os.getenv('ACTIVITY_LOG_BATCH_SIZE', 200))
+    ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_LOG_FLUSH_INTERVAL', 1.0))  # seconds
+    ACTIVITY_LOG_BUFFER_SIZE = int(os.getenv('ACTIVITY_LOG_BUFFER_SIZE', 10000))
+    ACTIVITY_LOG_BLOCK_TIMEOUT = float(os.getenv('ACTIVITY_LOG_BLOCK_TIMEOUT', 0.05))  # seconds
+    # Local test-case judge (see code_runner.py)
+    JUDGE_WORKERS = int(os.getenv('JUDGE_WORKERS', 4))
+    JUDGE_CPU_SECONDS = int(os.getenv('JUDGE_CPU_SECONDS', 2))
+    JUDGE_MEMORY_MB = int(os.getenv('JUDGE_MEMORY_MB', 256))
+    JUDGE_OUTPUT_KB = int(os.getenv('JUDGE_OUTPUT_KB', 64))
+    JUDGE_COMPILE_SECONDS = int(os.getenv('JUDGE_COMPILE_SECONDS', 10))
+    JUDGE_MAX_CASES = int(os.getenv('JUDGE_MAX_CASES', 50))
+    # Warm Python sandbox workers (see worker_pool.py)
+    JUDGE_WARM_WORKERS = os.getenv('JUDGE_WARM_WORKERS', 'true').lower() == 'true'
+    JUDGE_WORKER_MAX_JOBS = int(os.getenv('JUDGE_WORKER_MAX_JOBS', 200))
+    JUDGE_WORKER_CHECKOUT_TIMEOUT = float(os.getenv('JUDGE_WORKER_CHECKOUT_TIMEOUT', 5))  # seconds before a case runs cold instead
+    # Plagiarism scoring pool (see plagiarism_checker.py)
+    PLAGIARISM_WORKERS = int(os.getenv('PLAGIARISM_WORKERS', os.cpu_count() or 2))
+    PLAGIARISM_PARALLEL_MIN = int(os.getenv('PLAGIARISM_PARALLEL_MIN', 32))
+    # Server-Sent Events for live dashboards (see event_stream.py)
+    EVENTS_MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', 200))  # open streams; each holds a server thread
+    EVENTS_HISTORY = int(os.getenv('EVENTS_HISTORY', 500))  # events kept for Last-Event-ID replay
+    EVENTS_CLIENT_QUEUE = int(os.getenv('EVENTS_CLIENT_QUEUE', 100))
+    EVENTS_HEARTBEAT_SECONDS = float(os.getenv('EVENTS_HEARTBEAT_SECONDS', 15))
+    EVENTS_STREAM_LIFETIME = float(os.getenv('EVENTS_STREAM_LIFETIME', 600))  # seconds before the browser reconnects
+    # Delta sync cursors for list endpoints (see delta_sync.py)
+    DELTA_SYNC_RETENTION_DAYS = int(os.getenv('DELTA_SYNC_RETENTION_DAYS', 7))  # tombstones kept; older cursors get a full list
+    DELTA_SYNC_MAX_ROWS = int(os.getenv('DELTA_SYNC_MAX_ROWS', 500))  # past this a submission delta becomes a full reload
+    # Compiled aptitude answer keys and student payloads (see aptitude_keys.py)
+    APTITUDE_CACHE_SIZE = int(os.getenv('APTITUDE_CACHE_SIZE', 256))  # test versions kept
+    APTITUDE_CACHE_TTL = int(os.getenv('APTITUDE_CACHE_TTL', 3600))  # seconds
+    APTITUDE_VERSION_TTL = float(os.getenv('APTITUDE_VERSION_TTL', 5))  # seconds a submit may grade against a known version
+    # Aptitude submission ingestion (see aptitude_ingest.py)
+    APTITUDE_INGEST_JOURNAL = os.getenv('APTITUDE_INGEST_JOURNAL', 'journal/aptitude_submissions.jsonl')
+    APTITUDE_INGEST_BATCH_SIZE = int(os.getenv('APTITUDE_INGEST_BATCH_SIZE', 200))
+    APTITUDE_INGEST_FLUSH_INTERVAL = float(os.getenv('APTITUDE_INGEST_FLUSH_INTERVAL', 0.05))  # seconds
+    APTITUDE_INGEST_MAX_PENDING = int(os.getenv('APTITUDE_INGEST_MAX_PENDING', 5000))
+    APTITUDE_INGEST_FSYNC = os.getenv('APTITUDE_INGEST_FSYNC', 'true').lower() == 'true'
+    # Streaming list exports (see json_stream.py)
+    EXPORT_ITERSIZE = int(os.getenv('EXPORT_ITERSIZE', 2000))  # rows fetched from the server-side cursor at a time
+    EXPORT_MAX_STREAMS = int(os.getenv('EXPORT_MAX_STREAMS', 4))  # each holds a pooled connection while it runs
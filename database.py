@@ -1,12 +1,227 @@
 import os
+import threading
+import time
+from collections import deque
 import psycopg2
+from psycopg2.extensions import connection, TRANSACTION_STATUS_IDLE
 from psycopg2.extras import DictCursor
+from flask import g, has_app_context
 from config import Config
 from werkzeug.security import generate_password_hash
 
+class PoolTimeout(psycopg2.OperationalError):
+    """Raised when no pooled connection becomes free within DB_POOL_TIMEOUT"""
+
+class PooledConnection(connection):
+    """
+    psycopg2 connection whose close() hands it back to its pool instead of
+    tearing down the socket. Connections checked out for a Flask request are
+    request-bound: close() is a no-op and the teardown handler returns them.
+    """
+    def close(self):
+        pool = getattr(self, 'pool', None)
+        if pool is None:
+            super().close()
+        elif not getattr(self, 'request_bound', False):
+            pool.putconn(self)
+
+    def discard(self):
+        """Really close the underlying connection"""
+        super().close()
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of PooledConnection objects.
+    - Keeps up to max_size connections open; up to max_overflow extra
+      connections are opened under load and closed again when returned.
+    - Callers block for up to `timeout` seconds when everything is in use.
+    - Idle connections older than health_check_interval are pinged before reuse.
+    `connect` opens one connection (psycopg2.connect's signature).
+    """
+    def __init__(self, dsn, min_size=1, max_size=10, max_overflow=5, timeout=10.0, health_check_interval=30.0,
+                 connect=psycopg2.connect):
+        self.dsn = dsn
+        self._connect_fn = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._health_check_failures = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _connect(self):
+        conn = self._connect_fn(self.dsn, connection_factory=PooledConnection, cursor_factory=DictCursor)
+        conn.pool = self
+        conn.request_bound = False
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def warmup(self):
+        """Open min_size connections up front"""
+        conns = [self.getconn() for _ in range(self.min_size)]
+        for conn in conns:
+            self.putconn(conn)
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        conn = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.max_size + self.max_overflow:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f'No database connection available after {self.timeout}s')
+                self._cond.wait(remaining)
+
+            self._in_use += 1
+            waited = time.monotonic() - start
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+        try:
+            if conn is not None and not self._is_healthy(conn):
+                with self._cond:
+                    self._health_check_failures += 1
+                conn.discard()
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        conn.request_bound = False
+        return conn
+
+    def putconn(self, conn):
+        keep = not conn.closed
+        if keep and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            # Never hand out a connection with a half-finished transaction
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                keep = False
+
+        with self._cond:
+            self._in_use -= 1
+            if keep and self._size <= self.max_size:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self._size -= 1
+                if not conn.closed:
+                    conn.discard()
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            while self._idle:
+                self._idle.pop().discard()
+                self._size -= 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'overflow': max(0, self._size - self.max_size),
+                'max_size': self.max_size,
+                'max_overflow': self.max_overflow,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'connections_created': self._created,
+                'health_check_failures': self._health_check_failures,
+                'avg_wait_ms': round(self._total_wait / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                'max_wait_ms': round(self._max_wait * 1000, 3)
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ConnectionPool(
+                    Config.DATABASE_URL,
+                    min_size=Config.DB_POOL_MIN_SIZE,
+                    max_size=Config.DB_POOL_MAX_SIZE,
+                    max_overflow=Config.DB_POOL_MAX_OVERFLOW,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    health_check_interval=Config.DB_POOL_HEALTH_CHECK_INTERVAL
+                )
+                pool.warmup()
+                _pool = pool
+    return _pool
+
 def get_db():
-    conn = psycopg2.connect(Config.DATABASE_URL, cursor_factory=DictCursor)
-    return conn
+    """
+    Check out a pooled connection.
+    Inside a Flask app context the same connection is shared for the whole
+    request and returned by close_db() at teardown; elsewhere conn.close()
+    returns it to the pool.
+    """
+    if has_app_context():
+        if 'db' not in g:
+            conn = get_pool().getconn()
+            conn.request_bound = True
+            g.db = conn
+        return g.db
+    return get_pool().getconn()
+
+def close_db(exception=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.request_bound = False
+        conn.close()
+
+def init_app(app):
+    """Return request-bound connections to the pool when the app context ends"""
+    app.teardown_appcontext(close_db)
+
+def pool_stats():
+    return get_pool().stats() if _pool is not None else {}
 
 def init_db():
     """Initialize database tables for PostgreSQL if they don't exist"""
@@ -110,7 +325,9 @@ def init_db():
             questions TEXT NOT NULL,
             is_active INTEGER DEFAULT 1,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            end_time TIMESTAMP
+            end_time TIMESTAMP,
+            attempt_limit INTEGER DEFAULT 1,
+            violation_limit INTEGER DEFAULT 3
         )
     ''')
     
@@ -142,8 +359,51 @@ def init_db():
     
     conn.commit()
     conn.close()
+
+    # Everything added since the base tables (see migrations.py; imported here
+    # because the migrate_*.py modules import this one)
+    import migrations
+    migrations.apply_all()
     print("PostgreSQL Database initialized successfully!")
 
+def run_migration(version, steps):
+    """
+    Apply a versioned migration exactly once.
+    `steps` is a list of SQL strings or callables taking a cursor; they run in
+    one transaction and `version` is recorded in schema_migrations on success.
+    Returns True if the migration ran, False if it was already applied.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version TEXT PRIMARY KEY,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('SELECT 1 FROM schema_migrations WHERE version = %s', (version,))
+        if cursor.fetchone():
+            conn.rollback()
+            print(f"Migration {version} already applied.")
+            return False
+
+        for step in steps:
+            if callable(step):
+                step(cursor)
+            else:
+                cursor.execute(step)
+
+        cursor.execute('INSERT INTO schema_migrations (version) VALUES (%s)', (version,))
+        conn.commit()
+        print(f"Migration {version} applied.")
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
 def seed_db():
     """Dummy seed_db for compatibility"""
     pass
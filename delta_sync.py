@@ -0,0 +1,172 @@
+import base64
+import sys
+import time
+from flask import jsonify, session
+from config import Config
+
+# Delta sync for list endpoints. Every synced table carries a row_version,
+# stamped by trigger with the id of the transaction that last wrote the row,
+# and deletes leave a row in sync_tombstones (see migrate_delta_sync.py).
+#
+# A list response carries an opaque X-Sync-Cursor. Passing it back as
+# ?since=<cursor> returns {changed, deleted, cursor}: rows written by any
+# transaction that had not committed when the cursor was issued, and the ids
+# of rows deleted since (or no longer visible to this user). The cursor holds
+# the xmin of a snapshot taken *before* the list query, so a delta can repeat
+# rows the client already has but never misses one.
+#
+# When a cursor cannot be honoured (another user's, older than the tombstone
+# retention, or too many changes) the endpoint answers with the full list as
+# if no cursor had been given; clients tell the two apart by the body being
+# an array.
+
+# Child submission tables whose rows feed a catalog row's derived columns
+# (submitted, submissions_count, my_score, ...)
+CHILDREN = {
+    'tasks': ('task_submissions', 'task_id'),
+    'problems': ('problem_submissions', 'problem_id'),
+    'aptitude_tests': ('aptitude_submissions', 'test_id')
+}
+
+def sync_scope():
+    """Who a cursor was issued to; a student's lists also depend on their mentor"""
+    return f"{session['role']}:{session['user_id']}:{session.get('mentor_id') or ''}"
+
+def encode_cursor(version, issued_at):
+    raw = f'{version}|{int(issued_at)}|{sync_scope()}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """
+    (version, issued_at) for a cursor from encode_cursor, or None when it must
+    be answered with a full list. Raises ValueError for anything malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+        version, issued_at, scope = raw.split('|', 2)
+        version, issued_at = int(version), int(issued_at)
+    except ValueError:
+        raise ValueError('Invalid sync cursor')
+    if scope != sync_scope() or time.time() - issued_at > Config.DELTA_SYNC_RETENTION_DAYS * 86400:
+        return None
+    return version, issued_at
+
+def snapshot_cursor(cursor):
+    """A cursor for everything the next statement on `cursor` will see"""
+    cursor.execute('''
+        SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint AS version,
+               EXTRACT(EPOCH FROM CURRENT_TIMESTAMP) AS issued_at
+    ''')
+    row = cursor.fetchone()
+    return encode_cursor(row['version'], row['issued_at'])
+
+def _tombstones(cursor, table, version, owner_sql, owner_params):
+    cursor.execute(f'''
+        SELECT DISTINCT o.row_id FROM sync_tombstones o
+        WHERE o.table_name = %s AND o.row_version >= %s AND ({owner_sql})
+    ''', [table, version] + list(owner_params))
+    return [row['row_id'] for row in cursor.fetchall()]
+
+def catalog_delta(cursor, table, list_sql, params, owner_sql, owner_params, version, issued_at,
+                  student_id=None, expires_column=None):
+    """
+    (changed, deleted) for a catalog list (tasks, problems, aptitude tests).
+
+    `list_sql`/`params` is the endpoint's own query; it must select the
+    table's id and row_version. A row counts as changed when it or one of the
+    child submissions behind its counts (only `student_id`'s, if given) was
+    written or deleted. `owner_sql` (alias `o`, which must only use mentor_id)
+    selects every row the user could see at all: rows in it that changed but
+    are missing from the list, or whose `expires_column` passed since the
+    cursor was issued, have left the user's view and are reported deleted.
+    Counts that depend on other tables (total_students) are not tracked.
+    """
+    child, fk = CHILDREN[table]
+    cursor.execute(f'''
+        SELECT q.* FROM ({list_sql}) q
+        WHERE GREATEST(
+            q.row_version,
+            (SELECT MAX(c.row_version) FROM {child} c
+             WHERE c.{fk} = q.id AND (%s::int IS NULL OR c.student_id = %s::int)),
+            (SELECT MAX(tb.row_version) FROM sync_tombstones tb
+             WHERE tb.table_name = %s AND tb.parent_id = q.id AND (%s::int IS NULL OR tb.student_id = %s::int))
+        ) >= %s
+    ''', list(params) + [student_id, student_id, child, student_id, student_id, version])
+    changed = [dict(row) for row in cursor.fetchall()]
+    changed_ids = {row['id'] for row in changed}
+
+    expiry = ''
+    expiry_params = []
+    if expires_column:
+        expiry = f' OR (o.{expires_column} > to_timestamp(%s) AND o.{expires_column} <= CURRENT_TIMESTAMP)'
+        expiry_params = [issued_at]
+    cursor.execute(f'''
+        SELECT o.id FROM {table} o
+        WHERE ({owner_sql}) AND (o.row_version >= %s{expiry})
+    ''', list(owner_params) + [version] + expiry_params)
+    hidden = {row['id'] for row in cursor.fetchall()} - changed_ids
+
+    deleted = hidden.union(_tombstones(cursor, table, version, owner_sql, owner_params))
+    return changed, sorted(deleted)
+
+def submission_delta(cursor, select_sql, alias, table, conditions, params, version, owner_sql, owner_params):
+    """
+    (changed, deleted) for a submission list, or None when more rows changed
+    than DELTA_SYNC_MAX_ROWS and the client is better off reloading.
+
+    `select_sql`/`conditions`/`params` are the list query and the filters it
+    was called with (as for pagination.keyset_page); `owner_sql` (alias `o`,
+    which must only use student_id) selects every submission the user may see.
+    Rows that changed but no longer match the filters are reported deleted.
+    """
+    limit = Config.DELTA_SYNC_MAX_ROWS
+    sql = select_sql + ' WHERE ' + ' AND '.join(list(conditions) + [f'{alias}.row_version >= %s'])
+    sql += f' ORDER BY {alias}.submitted_at DESC, {alias}.id DESC LIMIT %s'
+    cursor.execute(sql, list(params) + [version, limit + 1])
+    changed = [dict(row) for row in cursor.fetchall()]
+    if len(changed) > limit:
+        return None
+    changed_ids = {row['id'] for row in changed}
+
+    cursor.execute(f'''
+        SELECT o.id FROM {table} o
+        WHERE ({owner_sql}) AND o.row_version >= %s
+    ''', list(owner_params) + [version])
+    hidden = {row['id'] for row in cursor.fetchall()} - changed_ids
+
+    deleted = hidden.union(_tombstones(cursor, table, version, owner_sql, owner_params))
+    return changed, sorted(deleted)
+
+def sync_response(rows, token, next_cursor=None):
+    """A full list: the same plain JSON array as before, with the sync cursor in a header"""
+    response = jsonify(rows)
+    response.headers['X-Sync-Cursor'] = token
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def delta_response(changed, deleted, token):
+    response = jsonify({'changed': changed, 'deleted': deleted, 'cursor': token})
+    response.headers['X-Sync-Cursor'] = token
+    return response
+
+def prune_tombstones(cursor, days=None):
+    """Drop tombstones older than any cursor still accepted; returns the number removed"""
+    days = Config.DELTA_SYNC_RETENTION_DAYS if days is None else days
+    cursor.execute(
+        "DELETE FROM sync_tombstones WHERE deleted_at < CURRENT_TIMESTAMP - make_interval(days => %s)",
+        (days,)
+    )
+    return cursor.rowcount
+
+if __name__ == '__main__':
+    # python delta_sync.py prune   (run daily from cron)
+    if sys.argv[1:] != ['prune']:
+        sys.exit('usage: python delta_sync.py prune')
+    from database import get_db
+    conn = get_db()
+    cursor = conn.cursor()
+    removed = prune_tombstones(cursor)
+    conn.commit()
+    conn.close()
+    print(f"Pruned {removed} tombstones.")
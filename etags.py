@@ -0,0 +1,52 @@
+import hashlib
+from flask import Response, request
+from delta_sync import sync_scope
+
+# Weak ETags for read-heavy JSON lists. A list's version is the newest
+# row_version of the tables it reads (and of their tombstones), which the
+# migrations keep current by trigger and which are single index probes to
+# read. A request whose If-None-Match still matches is answered 304 before
+# the list query runs.
+#
+# row_version is a transaction id, and transactions do not commit in id
+# order: while some writer is still in flight the snapshot itself goes into
+# the tag, so the tag keeps changing until every write it may be missing is
+# visible.
+
+def data_version(cursor, tables, extra_sql=None):
+    """
+    A string that changes whenever a row of `tables` is written or deleted.
+    `extra_sql` is an optional scalar expression folded into it (for lists
+    that also change with time, e.g. tests passing their end_time).
+    """
+    newest = [f'(SELECT MAX(row_version) FROM {table})' for table in tables]
+    newest += [f"(SELECT MAX(row_version) FROM sync_tombstones WHERE table_name = '{table}')" for table in tables]
+    cursor.execute(f'''
+        SELECT GREATEST({', '.join(newest)}, 0) AS version,
+               pg_snapshot_xmin(pg_current_snapshot())::text::bigint AS xmin,
+               pg_current_snapshot()::text AS snapshot,
+               {extra_sql or 'NULL'} AS extra
+    ''')
+    row = cursor.fetchone()
+    parts = [row['version'], row['extra']]
+    if row['version'] >= row['xmin']:
+        parts.append(row['snapshot'])
+    return '|'.join(str(part) for part in parts)
+
+def make_etag(version):
+    """The tag for this user's view of `version` (lists differ per user, so the scope is part of it)"""
+    raw = f'{request.path}|{sync_scope()}|{version}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+def is_fresh(etag):
+    return request.if_none_match.contains_weak(etag)
+
+def tag_response(response, etag):
+    response.set_etag(etag, weak=True)
+    # Cached per browser, but always revalidated
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['Vary'] = 'Cookie'
+    return response
+
+def not_modified(etag):
+    return tag_response(Response(status=304), etag)
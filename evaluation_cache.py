@@ -0,0 +1,90 @@
+import hashlib
+import json
+import threading
+from config import Config
+from database import get_pool
+from ttl_cache import TTLCache
+
+# In-process LRU in front of the persistent evaluation_cache table
+_memory = TTLCache(max_size=Config.EVAL_CACHE_SIZE, ttl=Config.EVAL_CACHE_TTL)
+_lock = threading.Lock()
+_counters = {'db_hits': 0, 'misses': 0, 'stores': 0, 'errors': 0}
+
+def _count(name):
+    with _lock:
+        _counters[name] += 1
+
+def normalize_for_cache(code):
+    """Line endings and trailing whitespace never change what the code does"""
+    lines = code.replace('\r\n', '\n').replace('\r', '\n').strip('\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines)
+
+def cache_key(code, language, problem_description, expected_output, test_cases, model, prompt_version):
+    payload = json.dumps([
+        normalize_for_cache(code),
+        language,
+        problem_description,
+        expected_output or '',
+        test_cases or '',
+        model,
+        prompt_version
+    ])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def get(key):
+    result = _memory.get(key)
+    if result is not None:
+        return result
+
+    # Own connection so cache I/O never touches a request's transaction
+    conn = None
+    try:
+        conn = get_pool().getconn()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT result FROM evaluation_cache
+            WHERE cache_key = %s AND created_at > CURRENT_TIMESTAMP - make_interval(days => %s)
+        ''', (key, Config.EVAL_CACHE_MAX_AGE_DAYS))
+        row = cursor.fetchone()
+    except Exception as e:
+        print(f"Evaluation cache read error: {e}")
+        _count('errors')
+        return None
+    finally:
+        if conn is not None:
+            conn.close()
+
+    if row is None:
+        _count('misses')
+        return None
+
+    result = json.loads(row['result'])
+    _memory.set(key, result)
+    _count('db_hits')
+    return result
+
+def put(key, result, model):
+    _memory.set(key, result)
+    conn = None
+    try:
+        conn = get_pool().getconn()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO evaluation_cache (cache_key, model, result)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (cache_key) DO UPDATE SET result = EXCLUDED.result, created_at = CURRENT_TIMESTAMP
+        ''', (key, model, json.dumps(result)))
+        conn.commit()
+        _count('stores')
+    except Exception as e:
+        print(f"Evaluation cache write error: {e}")
+        _count('errors')
+    finally:
+        if conn is not None:
+            conn.close()
+
+def stats():
+    with _lock:
+        counters = dict(_counters)
+    counters['memory'] = _memory.stats()
+    return counters
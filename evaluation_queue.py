@@ -0,0 +1,210 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from database import get_db
+from ai_evaluator import RUBRIC, error_evaluation, evaluate_code, evaluate_task_submission, rubric_scores
+
+TABLES = {'problem': 'problem_submissions', 'task': 'task_submissions'}
+
+def structured_evaluation(evaluation):
+    """The per-criterion breakdown stored in ai_explanation"""
+    return {
+        'correctness': evaluation.get('correctness', 'N/A'),
+        'efficiency': evaluation.get('efficiency', 'N/A'),
+        'code_style': evaluation.get('code_style', 'N/A'),
+        'best_practices': evaluation.get('best_practices', 'N/A'),
+        'suggestions': evaluation.get('suggestions', 'N/A')
+    }
+
+# Numeric rubric columns, in RUBRIC order (see migrate_rubric_scores.py)
+RUBRIC_COLUMNS = ', '.join(f'{criterion}_score = %s' for criterion in RUBRIC)
+
+def load_job(kind, submission_id):
+    """Fetch everything the evaluator needs for a pending submission"""
+    conn = get_db()
+    cursor = conn.cursor()
+    if kind == 'problem':
+        cursor.execute('''
+            SELECT ps.code, ps.language, p.description, p.expected_output, p.test_cases
+            FROM problem_submissions ps
+            JOIN problems p ON ps.problem_id = p.id
+            WHERE ps.id = %s AND ps.status = 'pending'
+        ''', (submission_id,))
+    else:
+        cursor.execute('''
+            SELECT ts.content, t.description
+            FROM task_submissions ts
+            JOIN tasks t ON ts.task_id = t.id
+            WHERE ts.id = %s AND ts.status = 'pending'
+        ''', (submission_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def store_result(kind, submission_id, evaluation):
+    """Write the grade back; a row that is no longer pending is left alone"""
+    columns = 'status = %s, score = %s, ai_feedback = %s, ai_explanation = %s, ' + RUBRIC_COLUMNS
+    params = [
+        evaluation['status'],
+        evaluation['score'],
+        evaluation['feedback'],
+        json.dumps(structured_evaluation(evaluation))
+    ] + list(rubric_scores(evaluation).values())
+    if kind == 'problem':
+        # Per-case verdicts and timings from the local judge, when the problem has runnable cases
+        columns += ', execution_result = %s'
+        params.append(json.dumps(evaluation['execution']) if evaluation.get('execution') else None)
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        UPDATE {TABLES[kind]}
+        SET {columns}
+        WHERE id = %s AND status = 'pending'
+    ''', params + [submission_id])
+    updated = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    return updated
+
+def evaluate_job(kind, job):
+    # Model errors raise so _run retries them rather than storing a zero-score rejection
+    if kind == 'problem':
+        return evaluate_code(job['code'], job['language'], job['description'], job['expected_output'], job['test_cases'],
+                             raise_errors=True)
+    return evaluate_task_submission(job['content'], job['description'], raise_errors=True)
+
+class EvaluationQueue:
+    """
+    Grades pending submissions on a bounded pool of worker threads.
+    Jobs are (kind, submission_id) pairs where kind is 'problem' or 'task';
+    the row itself is the durable record, so recover_pending() can re-enqueue
+    anything left behind by a restart. A job that raises is retried up to
+    `max_attempts` times, `retry_delay` seconds apart (doubling); after that
+    error_evaluation() is stored so the submission does not stay pending.
+    """
+    def __init__(self, max_workers=4, loader=load_job, store=store_result, evaluator=evaluate_job,
+                 max_attempts=3, retry_delay=2.0):
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._loader = loader
+        self._store = store
+        self._evaluator = evaluator
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='evaluator')
+        self._listeners = []
+        self._cond = threading.Condition()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._retried = 0
+        self._total_seconds = 0.0
+
+    def add_listener(self, callback):
+        """callback(kind, submission_id, evaluation) runs after a grade is stored"""
+        self._listeners.append(callback)
+
+    def enqueue(self, kind, submission_id, attempt=1):
+        with self._cond:
+            self._queued += 1
+        self._executor.submit(self._run, kind, submission_id, attempt)
+
+    def _retry_later(self, kind, submission_id, attempt):
+        # Counted as queued while waiting, so drain() covers it
+        timer = threading.Timer(self.retry_delay * 2 ** (attempt - 1),
+                                lambda: self._executor.submit(self._run, kind, submission_id, attempt + 1))
+        timer.daemon = True
+        timer.start()
+
+    def _finish(self, kind, submission_id, evaluation):
+        if self._store(kind, submission_id, evaluation):
+            for callback in self._listeners:
+                try:
+                    callback(kind, submission_id, evaluation)
+                except Exception as e:
+                    print(f"Error in evaluation listener for {kind}/{submission_id}: {e}")
+
+    def _run(self, kind, submission_id, attempt=1):
+        with self._cond:
+            self._queued -= 1
+            self._running += 1
+        start = time.monotonic()
+        try:
+            job = self._loader(kind, submission_id)
+            if job is None:
+                return
+            evaluation = self._evaluator(kind, job)
+            self._finish(kind, submission_id, evaluation)
+            with self._cond:
+                self._completed += 1
+        except Exception as e:
+            if attempt < self.max_attempts:
+                print(f"Evaluation job {kind}/{submission_id} failed (attempt {attempt}), retrying: {e}")
+                with self._cond:
+                    self._queued += 1
+                    self._retried += 1
+                self._retry_later(kind, submission_id, attempt)
+                return
+            print(f"Evaluation job {kind}/{submission_id} failed after {attempt} attempts, rejecting: {e}")
+            with self._cond:
+                self._failed += 1
+            try:
+                self._finish(kind, submission_id, error_evaluation())
+            except Exception as e:
+                print(f"Could not store the failed evaluation of {kind}/{submission_id}: {e}")
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._total_seconds += time.monotonic() - start
+                self._cond.notify_all()
+
+    def drain(self, timeout=None):
+        """Block until every enqueued job has finished; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queued or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def recover_pending(self):
+        """Re-enqueue submissions still marked pending (e.g. after a restart)"""
+        conn = get_db()
+        cursor = conn.cursor()
+        count = 0
+        for kind, table in TABLES.items():
+            cursor.execute(f"SELECT id FROM {table} WHERE status = 'pending' ORDER BY id")
+            for row in cursor.fetchall():
+                self.enqueue(kind, row['id'])
+                count += 1
+        conn.close()
+        return count
+
+    def stats(self):
+        with self._cond:
+            finished = self._completed + self._failed
+            return {
+                'workers': self.max_workers,
+                'queued': self._queued,
+                'running': self._running,
+                'completed': self._completed,
+                'failed': self._failed,
+                'retried': self._retried,
+                'avg_seconds': round(self._total_seconds / finished, 3) if finished else 0.0
+            }
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = EvaluationQueue(max_workers=Config.EVAL_WORKERS, max_attempts=Config.EVAL_MAX_ATTEMPTS)
+    return _queue
@@ -0,0 +1,226 @@
+import atexit
+import json
+import queue
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+from werkzeug.http import http_date
+from config import Config
+
+# Server-Sent Events for live dashboards. Writers publish to channels
+# ('admin', 'mentor:<id>', 'student:<id>'); every open /api/events/stream
+# connection subscribes to the channels of its user and receives
+# `id: <epoch>-<n>`, `event: <type>`, `data: <json>` frames.
+#
+# The broker lives in this process, alongside the request handlers and the
+# grading pool that publish to it. A reconnecting EventSource sends
+# Last-Event-ID and is replayed the events it missed from a bounded history;
+# when that is not possible (history rolled over, server restarted) it gets a
+# `reset` event and reloads its lists in full.
+
+def _json_default(value):
+    # Same date format as flask.jsonify, so rows from events and from list endpoints look alike
+    if isinstance(value, datetime):
+        return http_date(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+class Subscription:
+    def __init__(self, channels, max_queue):
+        self.channels = frozenset(channels)
+        self.events = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+        self.active = False
+        self.resume_id = 0
+
+    def offer(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            # A client this far behind is cut off; it reconnects and catches up from history
+            self.overflowed = True
+
+class EventBroker:
+    def __init__(self, history=500, max_queue=100, max_subscribers=200, heartbeat=15.0, lifetime=600.0):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.lifetime = lifetime
+        self.epoch = format(int(time.time()), 'x')
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._history = deque(maxlen=history)
+        self._rankings = {}
+        self._next_id = 1
+        self._subscribers = 0
+        self._closed = False
+        self._published = 0
+        self._delivered = 0
+        self._replayed = 0
+        self._overflows = 0
+        self._rejected = 0
+
+    def has_subscribers(self, channels):
+        with self._lock:
+            return any(self._channels.get(channel) for channel in channels)
+
+    def publish(self, channels, event_type, data):
+        """Send an event to everyone subscribed to any of `channels`; returns the number of receivers"""
+        payload = json.dumps(data, default=_json_default)
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            event = (event_id, frozenset(channels), event_type, payload)
+            self._history.append(event)
+            receivers = set()
+            for channel in channels:
+                receivers.update(self._channels.get(channel, ()))
+            self._published += 1
+            self._delivered += len(receivers)
+        for subscription in receivers:
+            subscription.offer(event)
+        return len(receivers)
+
+    def rank_changes(self, key, rows):
+        """
+        Rows of an ordered ranking (dicts with an 'id') whose position or values
+        changed since the last call for `key`, each with its 1-based 'rank'.
+        The first call for a key returns every row.
+        """
+        snapshot = {}
+        changed = []
+        with self._lock:
+            previous = self._rankings.get(key, {})
+            for rank, row in enumerate(rows, 1):
+                row = dict(row, rank=rank)
+                signature = json.dumps(row, sort_keys=True, default=_json_default)
+                snapshot[row['id']] = signature
+                if previous.get(row['id']) != signature:
+                    changed.append(row)
+            self._rankings[key] = snapshot
+        return changed
+
+    def _parse_event_id(self, last_event_id):
+        """Sequence number to resume after, or None when the id is not from this broker's history"""
+        if not last_event_id:
+            return self._next_id - 1  # fresh page: it loads current state itself
+        epoch, _, number = last_event_id.partition('-')
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        number = int(number)
+        oldest = self._history[0][0] if self._history else self._next_id
+        if number >= self._next_id or number < oldest - 1:
+            return None
+        return number
+
+    def subscribe(self, channels, last_event_id=None):
+        """(subscription, backlog) or (None, None) when at capacity; backlog is None when a reset is needed"""
+        subscription = Subscription(channels, self.max_queue)
+        with self._lock:
+            if self._closed or self._subscribers >= self.max_subscribers:
+                self._rejected += 1
+                return None, None
+            after = self._parse_event_id(last_event_id)
+            backlog = None
+            if after is not None:
+                backlog = [e for e in self._history if e[0] > after and e[1] & subscription.channels]
+                self._replayed += len(backlog)
+            subscription.resume_id = self._next_id - 1
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+            subscription.active = True
+            self._subscribers += 1
+        return subscription, backlog
+
+    def unsubscribe(self, subscription):
+        """Safe to call more than once (the stream's finally and the response's close both do)"""
+        with self._lock:
+            if not subscription.active:
+                return
+            subscription.active = False
+            for channel in subscription.channels:
+                members = self._channels.get(channel)
+                if members is not None:
+                    members.discard(subscription)
+                    if not members:
+                        del self._channels[channel]
+            self._subscribers -= 1
+            if subscription.overflowed:
+                self._overflows += 1
+
+    def _frame(self, event):
+        event_id, _, event_type, payload = event
+        return f'id: {self.epoch}-{event_id}\nevent: {event_type}\ndata: {payload}\n\n'
+
+    def stream(self, subscription, backlog):
+        """
+        Generator of SSE frames for a subscription from subscribe(). Ends after
+        `lifetime` seconds (the browser reconnects and resumes), when the client
+        falls too far behind, or on shutdown; comments keep idle proxies open.
+        """
+        try:
+            yield 'retry: 3000\n\n'
+            if backlog is None:
+                yield f'id: {self.epoch}-{subscription.resume_id}\nevent: reset\ndata: {{}}\n\n'
+            else:
+                for event in backlog:
+                    yield self._frame(event)
+            deadline = time.monotonic() + self.lifetime
+            while not subscription.overflowed and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    event = subscription.events.get(timeout=min(self.heartbeat, remaining))
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if event is None:
+                    return
+                yield self._frame(event)
+        finally:
+            self.unsubscribe(subscription)
+
+    def close(self):
+        """Wake every open stream so server threads are not held at shutdown"""
+        with self._lock:
+            self._closed = True
+            subscriptions = {s for members in self._channels.values() for s in members}
+        for subscription in subscriptions:
+            subscription.offer(None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': self._subscribers,
+                'channels': len(self._channels),
+                'published': self._published,
+                'delivered': self._delivered,
+                'replayed': self._replayed,
+                'overflows': self._overflows,
+                'rejected': self._rejected,
+                'history': len(self._history)
+            }
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = EventBroker(
+                    history=Config.EVENTS_HISTORY,
+                    max_queue=Config.EVENTS_CLIENT_QUEUE,
+                    max_subscribers=Config.EVENTS_MAX_SUBSCRIBERS,
+                    heartbeat=Config.EVENTS_HEARTBEAT_SECONDS,
+                    lifetime=Config.EVENTS_STREAM_LIFETIME
+                )
+                atexit.register(_broker.close)
+    return _broker
@@ -0,0 +1,156 @@
+"""
+EXPLAIN ANALYZE report for the API routes in app.py.
+
+Runs each route's query against the configured database with sample ids and
+reports whether the plan touches an index. Tiny development datasets make the
+planner prefer sequential scans, so pass --no-seqscan to check that an index
+*can* serve the query (SET enable_seqscan = off).
+
+    python explain_report.py [--no-seqscan]
+"""
+import json
+import sys
+from flask import session
+from werkzeug.datastructures import MultiDict
+import app
+from aptitude_items import ITEM_STATS_SQL
+from database import get_db
+from leaderboard import RANKING_SQL
+from pagination import keyset_page
+from plagiarism_checker import CANDIDATES_SQL, EXACT_COPY_SQL, TOP_CANDIDATES
+
+HOT_TABLES = {
+    'users', 'tasks', 'problems', 'aptitude_tests',
+    'task_submissions', 'problem_submissions', 'aptitude_submissions', 'activity_logs',
+    'problem_submission_fingerprints', 'student_leaderboard', 'aptitude_item_stats'
+}
+
+class CaptureCursor:
+    """Stands in for a cursor to record the query a helper would run"""
+    def execute(self, sql, params):
+        self.sql, self.params = sql, params
+
+    def fetchall(self):
+        return []
+
+def submission_list(select_sql, alias, role, samples, paginate=True):
+    """The query list_submissions runs for `role`'s first page (or whole list when not paged)"""
+    with app.app.test_request_context():
+        session.update(role=role, user_id=samples['mentor_id'] if role == 'mentor' else samples['student_id'])
+        conditions, params = app.submission_scope(alias)
+    if not paginate:
+        return app.submission_list_sql(select_sql, alias, conditions), params
+    capture = CaptureCursor()
+    keyset_page(capture, select_sql, alias, conditions, params, MultiDict(), {})
+    return capture.sql, capture.params
+
+def route_queries(samples):
+    """(route, sql, params) for every list and stats route, using the SQL the routes themselves run"""
+    student, mentor, test = samples['student_id'], samples['mentor_id'], samples['test_id']
+    queries = [
+        ('GET /login', app.USER_BY_EMAIL_SQL, (samples['email'],)),
+        ('GET /api/users', app.USER_LIST_SQL, ()),
+        ('GET /api/mentors', app.MENTOR_LIST_SQL, ()),
+        ('GET /api/mentor-students (mentor)', app.MENTOR_STUDENTS_SQL['mentor'], (mentor,)),
+        ('GET /api/mentor-students (admin)', app.MENTOR_STUDENTS_SQL['admin'], ()),
+    ]
+    for path, catalog in [('tasks', app.TASK_LIST_SQL), ('problems', app.PROBLEM_LIST_SQL)]:
+        queries += [
+            (f'GET /api/{path} (student)', catalog['student'], (student, mentor)),
+            (f'GET /api/{path} (mentor)', catalog['mentor'], (mentor,)),
+            (f'GET /api/{path} (admin)', catalog['admin'], ()),
+        ]
+    queries += [
+        ('GET /api/aptitude (student)', app.APTITUDE_LIST_SQL['student'], (student, student, mentor)),
+        ('GET /api/aptitude (mentor)', app.APTITUDE_LIST_SQL['mentor'], (mentor,)),
+        ('GET /api/aptitude (admin)', app.APTITUDE_LIST_SQL['admin'], ()),
+        ('GET /api/aptitude/<id> (student)', app.STUDENT_APTITUDE_TEST_SQL, (student, test)),
+        ('GET /api/aptitude/<id> (mentor)', app.APTITUDE_TEST_SQL, (test,)),
+        ('GET /api/aptitude/<id>/items', ITEM_STATS_SQL, (test,)),
+    ]
+    for path, select_sql, alias in [('task-submissions', app.TASK_SUBMISSION_LIST_SQL, 'ts'),
+                                    ('problem-submissions', app.PROBLEM_SUBMISSION_LIST_SQL, 'ps')]:
+        for role in ('student', 'mentor', 'admin'):
+            queries.append((f'GET /api/{path} ({role})', *submission_list(select_sql, alias, role, samples)))
+    queries += [
+        ('GET /api/aptitude-submissions', *submission_list(
+            app.STUDENT_APTITUDE_SUBMISSION_LIST_SQL, 's', 'student', samples, paginate=False)),
+        ('GET /api/aptitude-submissions/all (mentor)', *submission_list(
+            app.APTITUDE_SUBMISSION_LIST_SQL, 's', 'mentor', samples)),
+        ('GET /api/aptitude-submissions/all (admin)', *submission_list(
+            app.APTITUDE_SUBMISSION_LIST_SQL, 's', 'admin', samples)),
+        ('POST /api/submit-problem (exact copy)', EXACT_COPY_SQL, (samples['problem_id'], 'x', student)),
+        ('POST /api/submit-problem (plagiarism)', CANDIDATES_SQL,
+         (samples['problem_id'], student, [1, 2, 3], TOP_CANDIDATES)),
+        ('GET /api/skills (student)', app.SKILLS_SQL['student'], (student,)),
+        ('GET /api/skills (mentor)', app.SKILLS_SQL['mentor'], (mentor,)),
+        ('GET /api/skills (admin)', app.SKILLS_SQL['admin'], ()),
+        ('GET /api/leaderboard/students', RANKING_SQL, {'mentor_id': mentor}),
+        ('GET /api/leaderboard/mentors', app.MENTOR_LEADERBOARD_SQL, ()),
+        ('GET /api/stats (student)', app.STATS_SQL['student'], {'student_id': student, 'mentor_id': mentor}),
+        ('GET /api/stats (mentor)', app.STATS_SQL['mentor'], {'mentor_id': mentor}),
+        ('GET /api/stats (admin)', app.STATS_SQL['admin'], ()),
+        ('GET /api/stats/dashboard (student)', app.DASHBOARD_STATS_SQL['student'], {'user_id': student}),
+        ('GET /api/stats/dashboard (mentor)', app.DASHBOARD_STATS_SQL['mentor'], {'user_id': mentor}),
+        ('GET /api/stats/dashboard (admin)', app.DASHBOARD_STATS_SQL['admin'], ()),
+        ('GET /api/activity-logs', app.ACTIVITY_LOG_SQL, ()),
+    ]
+    return queries
+
+def load_samples(cursor):
+    """Pick real ids so the plans reflect actual data distribution"""
+    samples = {'email': '', 'student_id': 0, 'mentor_id': 0, 'problem_id': 0, 'task_id': 0, 'test_id': 0}
+    cursor.execute("SELECT id, email, mentor_id FROM users WHERE role = 'student' AND mentor_id IS NOT NULL LIMIT 1")
+    row = cursor.fetchone()
+    if row:
+        samples.update(student_id=row['id'], email=row['email'], mentor_id=row['mentor_id'])
+    for key, table in [('problem_id', 'problems'), ('task_id', 'tasks'), ('test_id', 'aptitude_tests')]:
+        cursor.execute(f'SELECT id FROM {table} ORDER BY id LIMIT 1')
+        row = cursor.fetchone()
+        if row:
+            samples[key] = row['id']
+    return samples
+
+def walk_plan(node, found):
+    node_type = node.get('Node Type', '')
+    relation = node.get('Relation Name')
+    if 'Index' in node_type:
+        found['indexes'].add(node.get('Index Name', node_type))
+    elif node_type == 'Seq Scan' and relation in HOT_TABLES:
+        found['seq_scans'].add(relation)
+    for child in node.get('Plans', []):
+        walk_plan(child, found)
+
+def run_report(disable_seqscan=False):
+    conn = get_db()
+    cursor = conn.cursor()
+    samples = load_samples(cursor)
+    if disable_seqscan:
+        cursor.execute('SET enable_seqscan = off')
+
+    failures = 0
+    queries = route_queries(samples)
+    print(f"{'ROUTE':45} {'MS':>9}  RESULT")
+    for route, sql, params in queries:
+        cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        found = {'indexes': set(), 'seq_scans': set()}
+        walk_plan(plan[0]['Plan'], found)
+
+        ok = bool(found['indexes'])
+        failures += 0 if ok else 1
+        detail = ', '.join(sorted(found['indexes'])) or 'no index used'
+        if found['seq_scans']:
+            detail += f" | seq scan: {', '.join(sorted(found['seq_scans']))}"
+        print(f"{route:45} {plan[0]['Execution Time']:9.2f}  {'PASS' if ok else 'FAIL'}  {detail}")
+
+    conn.rollback()
+    conn.close()
+    print(f"\n{len(queries) - failures}/{len(queries)} routes use an index")
+    return failures == 0
+
+if __name__ == '__main__':
+    ok = run_report(disable_seqscan='--no-seqscan' in sys.argv)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,124 @@
+import functools
+import threading
+import uuid
+from flask import Response, current_app
+from config import Config
+from database import get_pool
+
+# Streaming exports for lists that can be as large as a whole table (users,
+# every submission). The query runs on a named (server-side) cursor and rows
+# are fetched EXPORT_ITERSIZE at a time, serialized and sent as they arrive,
+# so a worker holds one batch of rows rather than the whole result twice
+# (fetchall() plus the jsonify'd string) before the first byte goes out.
+#
+# format=json produces the same JSON array the non-streaming endpoint returns;
+# format=ndjson produces one JSON object per line. The response has no
+# Content-Length, and an error half-way through can only end the stream
+# early, which a client sees as a truncated (unparseable) body.
+#
+# Each stream holds a pooled connection until it finishes, so at most
+# EXPORT_MAX_STREAMS run at once.
+
+FORMATS = {'json': 'application/json', 'ndjson': 'application/x-ndjson'}
+
+_slots = threading.BoundedSemaphore(Config.EXPORT_MAX_STREAMS)
+_stats_lock = threading.Lock()
+_stats = {'active': 0, 'streams': 0, 'rejected': 0, 'rows': 0, 'bytes': 0, 'errors': 0}
+
+class TooManyStreams(Exception):
+    pass
+
+def _count(**deltas):
+    with _stats_lock:
+        for key, delta in deltas.items():
+            _stats[key] += delta
+
+def encode_rows(rows, fmt, dumps, chunk_rows):
+    """Chunks of a JSON array or NDJSON body, `chunk_rows` rows per chunk"""
+    opening, separator, closing = ('[', ',', ']') if fmt == 'json' else ('', '\n', '\n')
+    chunk = [opening]
+    count = 0
+    for row in rows:
+        if count:
+            chunk.append(separator)
+        chunk.append(dumps(dict(row)))
+        count += 1
+        if count % chunk_rows == 0:
+            yield ''.join(chunk)
+            chunk = []
+    if fmt == 'json' or count:
+        chunk.append(closing)
+    tail = ''.join(chunk)
+    if tail:
+        yield tail
+
+def stream_query(sql, params=(), fmt='json', itersize=None):
+    """
+    A streaming Response for `sql`. The query is declared before returning,
+    so a bad statement still fails the request normally. Raises ValueError
+    for an unknown format and TooManyStreams when every slot is taken.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of: {', '.join(FORMATS)}")
+    itersize = itersize or Config.EXPORT_ITERSIZE
+    if not _slots.acquire(blocking=False):
+        _count(rejected=1)
+        raise TooManyStreams('Too many exports in progress, please retry')
+    conn = None
+    try:
+        conn = get_pool().getconn()
+        cursor = conn.cursor(name=f'export_{uuid.uuid4().hex}')
+        cursor.itersize = itersize
+        cursor.execute(sql, params)
+    except Exception:
+        if conn is not None:
+            conn.close()
+        _slots.release()
+        raise
+    _count(active=1, streams=1)
+    # Same date and decimal handling as jsonify, and its compact separators
+    dumps = functools.partial(current_app.json.dumps, separators=(',', ':'))
+    sent = [0]
+    released = threading.Lock()
+
+    def release():
+        # Runs from the generator and from the response's close, whichever comes
+        # first: a body that is never iterated (HEAD) never reaches the generator's finally
+        if not released.acquire(blocking=False):
+            return
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        conn.close()  # rolls back the read-only transaction the named cursor lives in
+        _slots.release()
+        _count(active=-1, bytes=sent[0])
+
+    def generate():
+        try:
+            for chunk in encode_rows(_counted(cursor), fmt, dumps, itersize):
+                sent[0] += len(chunk)
+                yield chunk
+        except Exception as e:
+            _count(errors=1)
+            print(f"Error streaming export: {e}")
+        finally:
+            # Also reached when the client disconnects and the server closes the generator
+            release()
+
+    response = Response(generate(), mimetype=FORMATS[fmt])
+    response.call_on_close(release)
+    return response
+
+def _counted(rows):
+    count = 0
+    try:
+        for row in rows:
+            count += 1
+            yield row
+    finally:
+        _count(rows=count)
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,138 @@
+import threading
+import time
+from config import Config
+from database import get_db
+
+# One aggregate pass per submission table instead of six correlated subqueries
+# per student. Restricted to a set of students when %(ids)s is not NULL.
+UPSERT_SQL = '''
+    INSERT INTO student_leaderboard (
+        student_id, name, email, mentor_id, mentor_name,
+        tasks_completed, problems_solved, aptitude_completed, total_completed,
+        avg_task_score, avg_problem_score, avg_aptitude_score, refreshed_at
+    )
+    SELECT
+        u.id, u.name, u.email, u.mentor_id, m.name,
+        COALESCE(ts.completed, 0), COALESCE(ps.completed, 0), COALESCE(aps.completed, 0),
+        COALESCE(ts.completed, 0) + COALESCE(ps.completed, 0) + COALESCE(aps.completed, 0),
+        COALESCE(ts.avg_score, 0), COALESCE(ps.avg_score, 0), COALESCE(aps.avg_score, 0),
+        CURRENT_TIMESTAMP
+    FROM users u
+    LEFT JOIN users m ON u.mentor_id = m.id
+    LEFT JOIN (
+        SELECT student_id, COUNT(*) FILTER (WHERE status = 'accepted') AS completed, AVG(score) AS avg_score
+        FROM task_submissions
+        WHERE %(ids)s::int[] IS NULL OR student_id = ANY(%(ids)s::int[])
+        GROUP BY student_id
+    ) ts ON ts.student_id = u.id
+    LEFT JOIN (
+        SELECT student_id, COUNT(*) FILTER (WHERE status = 'accepted') AS completed, AVG(score) AS avg_score
+        FROM problem_submissions
+        WHERE %(ids)s::int[] IS NULL OR student_id = ANY(%(ids)s::int[])
+        GROUP BY student_id
+    ) ps ON ps.student_id = u.id
+    LEFT JOIN (
+        SELECT student_id, COUNT(*) AS completed,
+               AVG(CASE WHEN total_questions > 0 THEN (CAST(score AS FLOAT)/total_questions)*100 ELSE 0 END) AS avg_score
+        FROM aptitude_submissions
+        WHERE %(ids)s::int[] IS NULL OR student_id = ANY(%(ids)s::int[])
+        GROUP BY student_id
+    ) aps ON aps.student_id = u.id
+    WHERE u.role = 'student' AND (%(ids)s::int[] IS NULL OR u.id = ANY(%(ids)s::int[]))
+    ON CONFLICT (student_id) DO UPDATE SET
+        name = EXCLUDED.name,
+        email = EXCLUDED.email,
+        mentor_id = EXCLUDED.mentor_id,
+        mentor_name = EXCLUDED.mentor_name,
+        tasks_completed = EXCLUDED.tasks_completed,
+        problems_solved = EXCLUDED.problems_solved,
+        aptitude_completed = EXCLUDED.aptitude_completed,
+        total_completed = EXCLUDED.total_completed,
+        avg_task_score = EXCLUDED.avg_task_score,
+        avg_problem_score = EXCLUDED.avg_problem_score,
+        avg_aptitude_score = EXCLUDED.avg_aptitude_score,
+        refreshed_at = EXCLUDED.refreshed_at
+'''
+
+RANKING_SQL = '''
+    SELECT student_id AS id, name, email, mentor_name, mentor_id, 'student' AS role,
+           tasks_completed, problems_solved, aptitude_completed,
+           avg_task_score, avg_problem_score, avg_aptitude_score
+    FROM student_leaderboard
+    WHERE %(mentor_id)s::int IS NULL OR mentor_id = %(mentor_id)s::int
+    ORDER BY total_completed DESC, avg_task_score DESC, student_id
+'''
+
+_rebuilder = None
+_rebuilder_lock = threading.Lock()
+
+def refresh_students(cursor, student_ids):
+    """
+    Recompute the leaderboard rows of the given students. Call it in the same
+    transaction as the submission write so readers never see a stale row.
+    """
+    student_ids = sorted({int(s) for s in student_ids if s is not None})
+    if student_ids:
+        cursor.execute(UPSERT_SQL, {'ids': student_ids})
+
+def ranking(cursor, mentor_id=None):
+    """Leaderboard rows in rank order, for one mentor's students or for everyone"""
+    cursor.execute(RANKING_SQL, {'mentor_id': mentor_id})
+    return [dict(row) for row in cursor.fetchall()]
+
+def rebuild(cursor):
+    """Recompute every row and drop rows for users who are no longer students"""
+    cursor.execute(UPSERT_SQL, {'ids': None})
+    cursor.execute('''
+        DELETE FROM student_leaderboard sl
+        WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id = sl.student_id AND u.role = 'student')
+    ''')
+
+def _rebuild_forever(interval):
+    while True:
+        try:
+            conn = get_db()
+            try:
+                rebuild(conn.cursor())
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Error rebuilding student leaderboard: {e}")
+        time.sleep(interval)
+
+def start_rebuilder(interval=None):
+    """
+    Staleness bound: incremental refreshes keep rows current, but anything they
+    miss (manual SQL, renamed users) is corrected by a full rebuild on a
+    background thread every LEADERBOARD_MAX_STALENESS seconds (0 disables
+    it; `python leaderboard.py` rebuilds by hand). Requests only read.
+    """
+    global _rebuilder
+    interval = Config.LEADERBOARD_MAX_STALENESS if interval is None else interval
+    if interval <= 0:
+        return
+    with _rebuilder_lock:
+        if _rebuilder is None:
+            _rebuilder = threading.Thread(target=_rebuild_forever, args=(interval,), name='leaderboard-rebuild', daemon=True)
+            _rebuilder.start()
+
+def on_graded(kind, submission_id, evaluation):
+    """EvaluationQueue listener: a background grade changes accepted counts and averages"""
+    table = 'task_submissions' if kind == 'task' else 'problem_submissions'
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT student_id FROM {table} WHERE id = %s', (submission_id,))
+    row = cursor.fetchone()
+    if row:
+        refresh_students(cursor, [row['student_id']])
+        conn.commit()
+    conn.close()
+
+if __name__ == '__main__':
+    # Manual rebuild: python leaderboard.py
+    conn = get_db()
+    rebuild(conn.cursor())
+    conn.commit()
+    conn.close()
+    print("Student leaderboard rebuilt.")
@@ -0,0 +1,16 @@
+from database import run_migration
+
+VERSION = '022_aptitude_ingest_token'
+
+# Submissions are journaled locally before they are inserted (see
+# aptitude_ingest.py); the token makes replaying the journal idempotent
+def migrate():
+    print("Migrating database: adding ingest tokens to aptitude submissions...")
+    run_migration(VERSION, [
+        'ALTER TABLE aptitude_submissions ADD COLUMN IF NOT EXISTS ingest_token UUID',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_aptitude_subs_ingest_token ON aptitude_submissions (ingest_token)',
+        'CREATE INDEX IF NOT EXISTS idx_aptitude_subs_test_student ON aptitude_submissions (test_id, student_id)'
+    ])
+
+if __name__ == '__main__':
+    migrate()
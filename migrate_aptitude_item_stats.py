@@ -0,0 +1,35 @@
+from database import run_migration
+import aptitude_items
+from aptitude_regrade import load_graded
+
+VERSION = '024_aptitude_item_stats'
+
+def backfill(cursor):
+    """Item statistics for the submissions made before the table existed"""
+    cursor.execute('SELECT id, questions FROM aptitude_tests ORDER BY id')
+    for test in cursor.fetchall():
+        _, matrix, correct, _ = load_graded(cursor, test['id'], test['questions'])
+        aptitude_items.replace_counts(cursor, test['id'], aptitude_items.matrix_counts(test['id'], matrix, correct))
+        print(f"  test {test['id']}: {len(matrix)} submissions")
+
+# Running per-question counts for aptitude tests (see aptitude_items.py)
+def migrate():
+    print("Migrating database: adding aptitude item statistics...")
+    run_migration(VERSION, [
+        '''
+        CREATE TABLE IF NOT EXISTS aptitude_item_stats (
+            test_id INTEGER NOT NULL,
+            question INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            unanswered INTEGER NOT NULL DEFAULT 0,
+            option_counts INTEGER[] NOT NULL DEFAULT '{}',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (test_id, question)
+        )
+        ''',
+        backfill
+    ])
+
+if __name__ == '__main__':
+    migrate()
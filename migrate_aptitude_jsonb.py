@@ -0,0 +1,30 @@
+from database import run_migration
+
+VERSION = '021_aptitude_jsonb'
+
+# Any change to a question bank gets a new version, so compiled answer keys
+# cached under the old one (see aptitude_keys.py) are never used for it
+VERSION_FUNCTION = '''
+    CREATE OR REPLACE FUNCTION aptitude_bump_questions_version() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.questions IS DISTINCT FROM OLD.questions THEN
+            NEW.questions_version := OLD.questions_version + 1;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+'''
+
+def migrate():
+    print("Migrating database: storing aptitude questions as versioned JSONB...")
+    run_migration(VERSION, [
+        'ALTER TABLE aptitude_tests ALTER COLUMN questions TYPE JSONB USING questions::jsonb',
+        'ALTER TABLE aptitude_tests ADD COLUMN IF NOT EXISTS questions_version INTEGER NOT NULL DEFAULT 1',
+        VERSION_FUNCTION,
+        'DROP TRIGGER IF EXISTS aptitude_tests_questions_version ON aptitude_tests',
+        '''CREATE TRIGGER aptitude_tests_questions_version BEFORE UPDATE OF questions ON aptitude_tests
+           FOR EACH ROW EXECUTE FUNCTION aptitude_bump_questions_version()'''
+    ])
+
+if __name__ == '__main__':
+    migrate()
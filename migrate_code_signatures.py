@@ -0,0 +1,66 @@
+import sys
+from psycopg2.extras import execute_values
+from database import get_db, run_migration
+from plagiarism_checker import code_signature
+
+VERSION = '014_code_signatures'
+
+def backfill(batch_size=500):
+    """
+    Fill normalized_code / code_hash / fingerprint for existing rows, one
+    committed batch at a time, and rewrite their problem_submission_fingerprints
+    rows to match. Only rows with code_hash IS NULL are picked up, so an
+    interrupted run simply continues where it stopped.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    last_id = 0
+    total = 0
+    while True:
+        cursor.execute('''
+            SELECT id, problem_id, student_id, code, language FROM problem_submissions
+            WHERE code_hash IS NULL AND id > %s
+            ORDER BY id
+            LIMIT %s
+        ''', (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        values = []
+        index_rows = []
+        for row in rows:
+            signature = code_signature(row['code'], row['language'])
+            values.append((row['id'], signature['normalized_code'], signature['code_hash'], signature['fingerprint']))
+            index_rows.extend((row['id'], row['problem_id'], row['student_id'], h) for h in signature['fingerprint'])
+        execute_values(cursor, '''
+            UPDATE problem_submissions ps
+            SET normalized_code = v.normalized_code, code_hash = v.code_hash, fingerprint = v.fingerprint
+            FROM (VALUES %s) AS v (id, normalized_code, code_hash, fingerprint)
+            WHERE ps.id = v.id
+        ''', values, template='(%s, %s, %s, %s::bigint[])', page_size=len(values))
+        cursor.execute('DELETE FROM problem_submission_fingerprints WHERE submission_id = ANY(%s)', ([row['id'] for row in rows],))
+        execute_values(cursor, '''
+            INSERT INTO problem_submission_fingerprints (submission_id, problem_id, student_id, hash) VALUES %s
+        ''', index_rows, page_size=1000)
+        conn.commit()
+
+        last_id = rows[-1]['id']
+        total += len(rows)
+        print(f"  backfilled {total} submissions (up to id {last_id})")
+    conn.close()
+    return total
+
+def migrate(batch_size=500):
+    print("Migrating database: storing normalized code, hash and fingerprint per submission...")
+    run_migration(VERSION, [
+        'ALTER TABLE problem_submissions ADD COLUMN IF NOT EXISTS normalized_code TEXT',
+        'ALTER TABLE problem_submissions ADD COLUMN IF NOT EXISTS code_hash TEXT',
+        'ALTER TABLE problem_submissions ADD COLUMN IF NOT EXISTS fingerprint BIGINT[]',
+        'CREATE INDEX IF NOT EXISTS idx_problem_subs_problem_hash ON problem_submissions (problem_id, code_hash)'
+    ])
+    # Outside the schema transaction so a large table is processed in resumable batches
+    print(f"Backfilled {backfill(batch_size)} submissions.")
+
+if __name__ == '__main__':
+    migrate(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
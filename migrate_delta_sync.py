@@ -0,0 +1,79 @@
+from database import run_migration
+
+VERSION = '018_delta_sync'
+
+# Tables whose list endpoints accept ?since=<cursor> (see delta_sync.py)
+TABLES = ['tasks', 'problems', 'aptitude_tests', 'task_submissions', 'problem_submissions', 'aptitude_submissions']
+
+# row_version is the 64-bit id of the last transaction that wrote the row;
+# a cursor is the xmin of an earlier snapshot, so "changed since" is a range scan
+STAMP_FUNCTION = '''
+    CREATE OR REPLACE FUNCTION sync_stamp_row_version() RETURNS trigger AS $$
+    BEGIN
+        NEW.row_version := pg_current_xact_id()::text::bigint;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+'''
+
+# One function for every table: whichever of the owner/parent columns it has end up in the tombstone
+TOMBSTONE_FUNCTION = '''
+    CREATE OR REPLACE FUNCTION sync_record_delete() RETURNS trigger AS $$
+    DECLARE
+        old_row JSONB := to_jsonb(OLD);
+    BEGIN
+        INSERT INTO sync_tombstones (table_name, row_id, parent_id, student_id, mentor_id, row_version)
+        VALUES (
+            TG_TABLE_NAME,
+            (old_row->>'id')::int,
+            COALESCE(old_row->>'task_id', old_row->>'problem_id', old_row->>'test_id')::int,
+            (old_row->>'student_id')::int,
+            (old_row->>'mentor_id')::int,
+            pg_current_xact_id()::text::bigint
+        );
+        RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql
+'''
+
+def versioning_steps(table):
+    """row_version column, index and triggers for one table"""
+    # Existing rows keep version 0: older than any cursor, so only full lists return them
+    return [
+        f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS row_version BIGINT NOT NULL DEFAULT 0',
+        f'CREATE INDEX IF NOT EXISTS idx_{table}_row_version ON {table} (row_version)',
+        f'DROP TRIGGER IF EXISTS {table}_stamp_row_version ON {table}',
+        f'''CREATE TRIGGER {table}_stamp_row_version BEFORE INSERT OR UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION sync_stamp_row_version()''',
+        f'DROP TRIGGER IF EXISTS {table}_record_delete ON {table}',
+        f'''CREATE TRIGGER {table}_record_delete AFTER DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION sync_record_delete()'''
+    ]
+
+def migrate():
+    print("Migrating database: adding row versions and tombstones for delta sync...")
+    steps = [
+        '''
+        CREATE TABLE IF NOT EXISTS sync_tombstones (
+            id BIGSERIAL PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            parent_id INTEGER,
+            student_id INTEGER,
+            mentor_id INTEGER,
+            row_version BIGINT NOT NULL,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_sync_tombstones_version ON sync_tombstones (table_name, row_version)',
+        'CREATE INDEX IF NOT EXISTS idx_sync_tombstones_parent ON sync_tombstones (table_name, parent_id, row_version)',
+        'CREATE INDEX IF NOT EXISTS idx_sync_tombstones_deleted ON sync_tombstones (deleted_at)',
+        STAMP_FUNCTION,
+        TOMBSTONE_FUNCTION
+    ]
+    for table in TABLES:
+        steps += versioning_steps(table)
+    run_migration(VERSION, steps)
+
+if __name__ == '__main__':
+    migrate()
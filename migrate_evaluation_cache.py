@@ -0,0 +1,20 @@
+from database import run_migration
+
+VERSION = '005_evaluation_cache'
+
+def migrate():
+    print("Migrating database for the AI evaluation cache...")
+    run_migration(VERSION, [
+        '''
+        CREATE TABLE IF NOT EXISTS evaluation_cache (
+            cache_key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_evaluation_cache_created ON evaluation_cache (created_at)'
+    ])
+
+if __name__ == '__main__':
+    migrate()
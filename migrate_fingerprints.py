@@ -0,0 +1,30 @@
+from database import run_migration
+from plagiarism_checker import index_submission
+
+VERSION = '003_plagiarism_fingerprints'
+
+def backfill(cursor):
+    cursor.execute('SELECT id, problem_id, student_id, code FROM problem_submissions WHERE code IS NOT NULL')
+    rows = cursor.fetchall()
+    for row in rows:
+        index_submission(cursor, row['id'], row['problem_id'], row['student_id'], row['code'])
+    print(f"Fingerprinted {len(rows)} existing submissions")
+
+def migrate():
+    print("Migrating database for plagiarism fingerprint index...")
+    run_migration(VERSION, [
+        '''
+        CREATE TABLE IF NOT EXISTS problem_submission_fingerprints (
+            submission_id INTEGER NOT NULL REFERENCES problem_submissions(id) ON DELETE CASCADE,
+            problem_id INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            hash BIGINT NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_fingerprints_problem_hash ON problem_submission_fingerprints (problem_id, hash)',
+        'CREATE INDEX IF NOT EXISTS idx_fingerprints_submission ON problem_submission_fingerprints (submission_id)',
+        backfill
+    ])
+
+if __name__ == '__main__':
+    migrate()
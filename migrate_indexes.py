@@ -0,0 +1,47 @@
+from database import run_migration
+
+VERSION = '002_hot_path_indexes'
+
+# (index name, table, column list) - shaped after the WHERE / JOIN / ORDER BY
+# clauses used by the API routes in app.py
+INDEXES = [
+    # users: role filters, mentor -> students lookups
+    ('idx_users_role', 'users', 'role'),
+    ('idx_users_mentor_role', 'users', 'mentor_id, role'),
+
+    # content lists: WHERE mentor_id = %s ORDER BY created_at DESC
+    ('idx_tasks_mentor_created', 'tasks', 'mentor_id, created_at DESC'),
+    ('idx_problems_mentor_created', 'problems', 'mentor_id, created_at DESC'),
+    ('idx_aptitude_tests_mentor_created', 'aptitude_tests', 'mentor_id, created_at DESC'),
+
+    # task submissions: per-task counts, leaderboard, student history, admin list
+    ('idx_task_subs_task_student', 'task_submissions', 'task_id, student_id'),
+    ('idx_task_subs_student_status', 'task_submissions', 'student_id, status'),
+    ('idx_task_subs_student_submitted', 'task_submissions', 'student_id, submitted_at DESC'),
+    ('idx_task_subs_submitted', 'task_submissions', 'submitted_at DESC'),
+
+    # problem submissions: plagiarism lookups, leaderboard, student history, admin list
+    ('idx_problem_subs_problem_student', 'problem_submissions', 'problem_id, student_id'),
+    ('idx_problem_subs_student_status', 'problem_submissions', 'student_id, status'),
+    ('idx_problem_subs_student_submitted', 'problem_submissions', 'student_id, submitted_at DESC'),
+    ('idx_problem_subs_submitted', 'problem_submissions', 'submitted_at DESC'),
+
+    # aptitude submissions: attempt counts, student history, mentor/admin list
+    ('idx_aptitude_subs_test_student', 'aptitude_submissions', 'test_id, student_id'),
+    ('idx_aptitude_subs_student_submitted', 'aptitude_submissions', 'student_id, submitted_at DESC'),
+    ('idx_aptitude_subs_submitted', 'aptitude_submissions', 'submitted_at DESC'),
+
+    # activity logs: admin feed and per-user lookups
+    ('idx_activity_logs_created', 'activity_logs', 'created_at DESC'),
+    ('idx_activity_logs_user', 'activity_logs', 'user_id'),
+]
+
+def migrate():
+    print("Migrating database: adding indexes for hot query paths...")
+    steps = [f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})' for name, table, columns in INDEXES]
+    # Refresh planner statistics so the new indexes are considered right away
+    steps += [f'ANALYZE {table}' for table in sorted({table for _, table, _ in INDEXES})]
+    run_migration(VERSION, steps)
+
+if __name__ == '__main__':
+    migrate()
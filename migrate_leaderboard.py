@@ -0,0 +1,32 @@
+from database import run_migration
+import leaderboard
+
+VERSION = '007_student_leaderboard'
+
+def migrate():
+    print("Migrating database for the pre-aggregated student leaderboard...")
+    run_migration(VERSION, [
+        '''
+        CREATE TABLE IF NOT EXISTS student_leaderboard (
+            student_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            mentor_id INTEGER,
+            mentor_name TEXT,
+            tasks_completed INTEGER NOT NULL DEFAULT 0,
+            problems_solved INTEGER NOT NULL DEFAULT 0,
+            aptitude_completed INTEGER NOT NULL DEFAULT 0,
+            total_completed INTEGER NOT NULL DEFAULT 0,
+            avg_task_score DOUBLE PRECISION NOT NULL DEFAULT 0,
+            avg_problem_score DOUBLE PRECISION NOT NULL DEFAULT 0,
+            avg_aptitude_score DOUBLE PRECISION NOT NULL DEFAULT 0,
+            refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_leaderboard_mentor_rank ON student_leaderboard (mentor_id, total_completed DESC, avg_task_score DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_leaderboard_rank ON student_leaderboard (total_completed DESC, avg_task_score DESC)',
+        leaderboard.rebuild
+    ])
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,68 @@
+import json
+import sys
+from psycopg2.extras import execute_values
+from database import get_db, run_migration
+from ai_evaluator import RUBRIC, rubric_scores
+
+VERSION = '020_rubric_scores'
+
+TABLES = ['problem_submissions', 'task_submissions']
+COLUMNS = [f'{criterion}_score' for criterion in RUBRIC]
+
+def backfill(table, batch_size=500):
+    """
+    Parse the rubric lines of already graded rows into the numeric columns,
+    one committed batch at a time. Rows whose lines carry no points (exam
+    violations, evaluation errors) stay NULL and are left out of averages.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    last_id = 0
+    total = 0
+    while True:
+        cursor.execute(f'''
+            SELECT id, ai_explanation FROM {table}
+            WHERE id > %s AND ai_explanation IS NOT NULL AND correctness_score IS NULL
+            ORDER BY id
+            LIMIT %s
+        ''', (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        values = []
+        for row in rows:
+            try:
+                explanation = json.loads(row['ai_explanation'])
+            except (TypeError, ValueError):
+                continue
+            scores = rubric_scores(explanation if isinstance(explanation, dict) else {})
+            if any(score is not None for score in scores.values()):
+                values.append((row['id'], *scores.values()))
+        if values:
+            execute_values(cursor, f'''
+                UPDATE {table} t
+                SET {', '.join(f'{column} = v.{column}' for column in COLUMNS)}
+                FROM (VALUES %s) AS v (id, {', '.join(COLUMNS)})
+                WHERE t.id = v.id
+            ''', values, template='(%s' + ', %s::float8' * len(COLUMNS) + ')', page_size=len(values))
+        conn.commit()
+
+        last_id = rows[-1]['id']
+        total += len(values)
+        print(f"  {table}: backfilled {total} rows (up to id {last_id})")
+    conn.close()
+    return total
+
+def migrate(batch_size=500):
+    print("Migrating database: storing AI rubric scores as numbers...")
+    run_migration(VERSION, [
+        f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} DOUBLE PRECISION'
+        for table in TABLES for column in COLUMNS
+    ])
+    # Outside the schema transaction so a large table is processed in resumable batches
+    for table in TABLES:
+        print(f"Backfilled {backfill(table, batch_size)} {table}.")
+
+if __name__ == '__main__':
+    migrate(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
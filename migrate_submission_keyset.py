@@ -0,0 +1,26 @@
+from database import run_migration
+
+VERSION = '009_submission_keyset_indexes'
+
+# Submission lists page by (submitted_at, id) newest first (see pagination.py).
+# Having id as the tie-breaker in the index lets each page be a single range scan.
+INDEXES = [
+    ('idx_task_subs_keyset', 'task_submissions', 'submitted_at DESC, id DESC'),
+    ('idx_task_subs_student_keyset', 'task_submissions', 'student_id, submitted_at DESC, id DESC'),
+    ('idx_problem_subs_keyset', 'problem_submissions', 'submitted_at DESC, id DESC'),
+    ('idx_problem_subs_student_keyset', 'problem_submissions', 'student_id, submitted_at DESC, id DESC'),
+    ('idx_aptitude_subs_keyset', 'aptitude_submissions', 'submitted_at DESC, id DESC'),
+]
+
+# Superseded by the keyset indexes above
+REPLACED = ['idx_task_subs_submitted', 'idx_problem_subs_submitted', 'idx_aptitude_subs_submitted']
+
+def migrate():
+    print("Migrating database: adding keyset pagination indexes for submission lists...")
+    steps = [f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})' for name, table, columns in INDEXES]
+    steps += [f'DROP INDEX IF EXISTS {name}' for name in REPLACED]
+    steps += [f'ANALYZE {table}' for table in sorted({table for _, table, _ in INDEXES})]
+    run_migration(VERSION, steps)
+
+if __name__ == '__main__':
+    migrate()
@@ -1,14 +1,10 @@
 import json
-import psycopg2
 from psycopg2.extras import execute_values
-import os
-from dotenv import load_dotenv
 import time
-
-load_dotenv()
+from database import get_db
 
 def get_conn():
-    return psycopg2.connect(os.getenv('DATABASE_URL'))
+    return get_db()
 
 def migrate():
     log_file = open('migration_debug.log', 'w', encoding='utf-8')
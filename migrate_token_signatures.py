@@ -0,0 +1,17 @@
+import sys
+from database import run_migration
+from migrate_code_signatures import backfill
+
+VERSION = '016_token_signatures'
+
+def migrate(batch_size=500):
+    print("Migrating database: recomputing plagiarism signatures from token streams...")
+    # Character-based signatures never match token-based ones; clearing code_hash
+    # queues every row for the (resumable) backfill below.
+    run_migration(VERSION, [
+        'UPDATE problem_submissions SET normalized_code = NULL, code_hash = NULL, fingerprint = NULL'
+    ])
+    print(f"Recomputed {backfill(batch_size)} submissions.")
+
+if __name__ == '__main__':
+    migrate(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
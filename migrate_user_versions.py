@@ -0,0 +1,13 @@
+from database import run_migration
+from migrate_delta_sync import versioning_steps
+
+VERSION = '019_user_versions'
+
+# List ETags (see etags.py) also cover the users table: student counts and
+# mentor names in the lists change when users are added, moved or renamed
+def migrate():
+    print("Migrating database: adding row versions to users...")
+    run_migration(VERSION, versioning_steps('users'))
+
+if __name__ == '__main__':
+    migrate()
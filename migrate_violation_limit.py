@@ -1,11 +1,7 @@
-import psycopg2
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from database import get_db
 
 def migrate():
-    conn = psycopg2.connect(os.getenv('DATABASE_URL'))
+    conn = get_db()
     cur = conn.cursor()
     
     try:
@@ -0,0 +1,29 @@
+import importlib
+
+# Versioned schema migrations (see database.run_migration), oldest first.
+# init_db() applies them after creating the base tables, so a fresh database
+# ends up with the same schema as one that ran each script by hand; already
+# applied versions are skipped. Add new migrate_*.py modules to the end.
+MIGRATIONS = [
+    'migrate_indexes',              # 002
+    'migrate_fingerprints',         # 003
+    'migrate_evaluation_cache',     # 005
+    'migrate_leaderboard',          # 007
+    'migrate_submission_keyset',    # 009
+    'migrate_code_signatures',      # 014
+    'migrate_token_signatures',     # 016
+    'migrate_delta_sync',           # 018
+    'migrate_user_versions',        # 019
+    'migrate_rubric_scores',        # 020
+    'migrate_aptitude_jsonb',       # 021
+    'migrate_aptitude_ingest',      # 022
+    'migrate_aptitude_item_stats',  # 024
+]
+
+def apply_all():
+    """Run every migration in order; each one is a no-op if its version is recorded"""
+    for name in MIGRATIONS:
+        importlib.import_module(name).migrate()
+
+if __name__ == '__main__':
+    apply_all()
@@ -0,0 +1,74 @@
+import base64
+from datetime import datetime
+from flask import jsonify
+from config import Config
+
+# Keyset pagination for the submission lists: pages are ordered newest first by
+# (submitted_at, id) and the client passes back an opaque cursor for the next one.
+# Unlike OFFSET, every page is an index range scan regardless of depth.
+
+def encode_cursor(submitted_at, row_id):
+    raw = f'{submitted_at.isoformat()}|{row_id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Raises ValueError for anything that is not a cursor issued by encode_cursor"""
+    try:
+        raw = base64.b64decode(token + '=' * (-len(token) % 4), altchars=b'-_', validate=True).decode('utf-8')
+        submitted_at, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(submitted_at), int(row_id)
+    except ValueError:
+        raise ValueError('Invalid cursor')
+
+def page_size(args):
+    limit = args.get('limit', Config.SUBMISSIONS_PAGE_SIZE, type=int)
+    return max(1, min(limit, Config.SUBMISSIONS_MAX_PAGE_SIZE))
+
+def apply_filters(conditions, params, args, filters):
+    """`conditions`/`params` plus one equality test per filter present in `args`"""
+    conditions = list(conditions)
+    params = list(params)
+    for arg, (column, arg_type) in filters.items():
+        value = args.get(arg, type=arg_type)
+        if value is not None and value != '':
+            conditions.append(f'{column} = %s')
+            params.append(value)
+    return conditions, params
+
+def keyset_page(cursor, select_sql, alias, conditions, params, args, filters):
+    """
+    Fetch one page of `select_sql` (SELECT ... FROM ... JOINs, no WHERE/ORDER BY).
+    `alias` is the submissions table alias, `conditions`/`params` the role's
+    access restrictions, and `filters` maps optional query args to
+    (column, type). Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    conditions, params = apply_filters(conditions, params, args, filters)
+
+    token = args.get('cursor')
+    if token:
+        submitted_at, row_id = decode_cursor(token)
+        conditions.append(f'({alias}.submitted_at, {alias}.id) < (%s, %s)')
+        params += [submitted_at, row_id]
+
+    limit = page_size(args)
+    sql = select_sql
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    # One extra row tells us whether there is a next page without a COUNT(*)
+    sql += f' ORDER BY {alias}.submitted_at DESC, {alias}.id DESC LIMIT %s'
+    params.append(limit + 1)
+
+    cursor.execute(sql, params)
+    rows = [dict(row) for row in cursor.fetchall()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['submitted_at'], rows[-1]['id'])
+    return rows, next_cursor
+
+def page_response(rows, next_cursor):
+    """The body stays a plain JSON array; the next cursor travels in a header"""
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
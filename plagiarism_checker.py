@@ -1,61 +1,213 @@
 
 import difflib
-import re
+import hashlib
+import multiprocessing
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from psycopg2.extras import execute_values
+from config import Config
+from code_tokenizer import tokenize_code, encode_tokens
 
-def normalize_code(code):
+KGRAM_SIZE = 6       # tokens of normalized code per k-gram
+WINNOW_WINDOW = 4    # any shared run of KGRAM_SIZE + WINNOW_WINDOW - 1 tokens is guaranteed to share a fingerprint
+TOP_CANDIDATES = 5   # candidates scored with SequenceMatcher
+THRESHOLD = 0.85     # similarity at or above which a submission is flagged
+# Identifiers and literals are canonicalized, so short independent solutions
+# (a two-line read-and-print, a five-line fib loop: 25-60 tokens) often
+# normalize to the same stream. Below this size a match says nothing.
+MIN_TOKENS = 100
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def normalize_code(code, language='python'):
     """
-    Normalize code to reduce false negatives from formatting changes.
-    - Removes whitespace
-    - Removes comments (basic)
-    - Lowercases everything
+    Normalize code to reduce false negatives from formatting changes and renames:
+    the code_tokenizer token stream (comments and layout dropped, identifiers and
+    literals canonicalized), one character per token.
     """
-    # Remove single line comments (python style #)
-    code = re.sub(r'#.*', '', code)
-    # Remove single line comments (C/Java style //)
-    code = re.sub(r'//.*', '', code)
-    # Remove whitespace
-    code = ''.join(code.split())
-    return code.lower()
+    return encode_tokens(tokenize_code(code or '', language))
 
-def check_plagiarism(new_code, problem_id, student_id, cursor):
+def fingerprint(normalized_code):
     """
-    Check if the new code is plagiarized from existing submissions.
-    Returns: (is_plagiarized, max_similarity, source_student_id)
+    Winnowing (Schleimer et al.): hash every k-gram and keep the minimum hash
+    of each sliding window. Returns the set of selected hashes.
+    """
+    if len(normalized_code) < KGRAM_SIZE:
+        return set()
+
+    hashes = [
+        zlib.crc32(normalized_code[i:i + KGRAM_SIZE].encode('utf-8'))
+        for i in range(len(normalized_code) - KGRAM_SIZE + 1)
+    ]
+    if len(hashes) <= WINNOW_WINDOW:
+        return {min(hashes)}
+
+    selected = set()
+    for i in range(len(hashes) - WINNOW_WINDOW + 1):
+        selected.add(min(hashes[i:i + WINNOW_WINDOW]))
+    return selected
+
+def code_signature(code, language='python'):
+    """
+    Everything plagiarism checks need from a submission, computed once at insert
+    time and stored on the row: normalized_code, code_hash, fingerprint.
     """
-    threshold = 0.85  # 85% similarity threshold
-    
-    # Get all previous accepted/rejected (but not from same student) submissions for this problem
+    normalized = normalize_code(code, language)
+    return {
+        'normalized_code': normalized,
+        'code_hash': hashlib.sha256(normalized.encode('utf-8')).hexdigest(),
+        'fingerprint': sorted(fingerprint(normalized))
+    }
+
+def index_submission(cursor, submission_id, problem_id, student_id, code, hashes=None, language='python'):
+    """Store the fingerprints of a freshly inserted submission"""
+    if hashes is None:
+        hashes = fingerprint(normalize_code(code, language))
+    if not hashes:
+        return
+    execute_values(cursor, '''
+        INSERT INTO problem_submission_fingerprints (submission_id, problem_id, student_id, hash)
+        VALUES %s
+    ''', [(submission_id, problem_id, student_id, h) for h in hashes])
+
+EXACT_COPY_SQL = '''
+    SELECT student_id FROM problem_submissions
+    WHERE problem_id = %s AND code_hash = %s AND student_id != %s
+    ORDER BY id
+    LIMIT 1
+'''
+
+CANDIDATES_SQL = '''
+    SELECT f.submission_id, COUNT(*) AS shared
+    FROM problem_submission_fingerprints f
+    WHERE f.problem_id = %s AND f.student_id != %s AND f.hash = ANY(%s)
+    GROUP BY f.submission_id
+    ORDER BY shared DESC
+    LIMIT %s
+'''
+
+def find_exact_copy(cursor, code_hash, problem_id, student_id):
+    """Earliest other student whose normalized code is identical, via idx_problem_subs_problem_hash"""
+    cursor.execute(EXACT_COPY_SQL, (problem_id, code_hash, student_id))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def find_candidates(cursor, hashes, problem_id, student_id, limit=TOP_CANDIDATES):
+    """Other students' submissions sharing the most fingerprints with `hashes`"""
+    cursor.execute(CANDIDATES_SQL, (problem_id, student_id, list(hashes), limit))
+    submission_ids = [row[0] for row in cursor.fetchall()]
+    if not submission_ids:
+        return []
+
     cursor.execute('''
-        SELECT student_id, code 
-        FROM problem_submissions 
-        WHERE problem_id = %s AND student_id != %s AND code IS NOT NULL
-    ''', (problem_id, student_id))
-    
-    previous_submissions = cursor.fetchall()
-    
-    normalized_new_code = normalize_code(new_code)
-    
-    if len(normalized_new_code) < 20: # Skip very short snippets
-        return False, 0.0, None
+        SELECT student_id, normalized_code, code, language
+        FROM problem_submissions
+        WHERE id = ANY(%s) AND code IS NOT NULL
+    ''', (submission_ids,))
+    # Rows from before the backfill have no stored normalized_code yet
+    return [
+        (row[0], row[1] if row[1] is not None else normalize_code(row[2], row[3]))
+        for row in cursor.fetchall()
+    ]
+
+def score_pair(code_a, code_b, threshold=THRESHOLD):
+    """
+    SequenceMatcher.ratio() with early rejection. Each bound is cheaper than the
+    next and never below the true ratio, so a pair whose bound is under the
+    threshold cannot be plagiarism and skips the O(n*m) comparison.
+    Returns (similarity, exact); when exact is False similarity is only an upper bound.
+    """
+    total = len(code_a) + len(code_b)
+    if not total:
+        return 0.0, True
+    length_bound = 2.0 * min(len(code_a), len(code_b)) / total
+    if length_bound < threshold:
+        return length_bound, False
+
+    # No autojunk: in a token stream the frequent tokens (ID, '(', ...) are the structure
+    matcher = difflib.SequenceMatcher(None, code_a, code_b, autojunk=False)
+    bound = matcher.real_quick_ratio()
+    if bound < threshold:
+        return bound, False
+    bound = matcher.quick_ratio()
+    if bound < threshold:
+        return bound, False
+    return matcher.ratio(), True
+
+def _score_batch(code, others, threshold):
+    return [score_pair(code, other, threshold) for other in others]
+
+def get_executor():
+    """Process pool for the full ratios: SequenceMatcher is pure Python and holds the GIL"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # forkserver: never fork the multi-threaded web process itself
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                _executor = ProcessPoolExecutor(
+                    max_workers=Config.PLAGIARISM_WORKERS,
+                    mp_context=multiprocessing.get_context(method)
+                )
+    return _executor
+
+def score_candidates(normalized_code, candidates, threshold=THRESHOLD, parallel=None):
+    """
+    Score normalized code against [(student_id, normalized_code), ...].
+    Batches are spread over the process pool once there are at least
+    PLAGIARISM_PARALLEL_MIN candidates; small batches are cheaper in-thread.
+    Returns (max_similarity, source_student_id) over exactly scored pairs.
+    """
+    if not candidates:
+        return 0.0, None
+    if parallel is None:
+        parallel = len(candidates) >= Config.PLAGIARISM_PARALLEL_MIN
+
+    others = [code for _, code in candidates]
+    if parallel:
+        executor = get_executor()
+        chunk = max(1, len(others) // (Config.PLAGIARISM_WORKERS * 4))
+        futures = [
+            executor.submit(_score_batch, normalized_code, others[i:i + chunk], threshold)
+            for i in range(0, len(others), chunk)
+        ]
+        scores = [score for future in futures for score in future.result()]
+    else:
+        scores = _score_batch(normalized_code, others, threshold)
 
     max_similarity = 0.0
     source_student_id = None
-    
-    # Check against all previous submissions
-    for prev_student_id, prev_code in previous_submissions:
-        if not prev_code:
-            continue
-            
-        normalized_prev_code = normalize_code(prev_code)
-        
-        # Calculate similarity ratio
-        matcher = difflib.SequenceMatcher(None, normalized_new_code, normalized_prev_code)
-        similarity = matcher.ratio()
-        
-        if similarity > max_similarity:
+    for (student_id, _), (similarity, exact) in zip(candidates, scores):
+        if exact and similarity > max_similarity:
             max_similarity = similarity
-            source_student_id = prev_student_id
-            
-    is_plagiarized = max_similarity >= threshold
-    
+            source_student_id = student_id
+    return max_similarity, source_student_id
+
+def check_plagiarism(new_code, problem_id, student_id, cursor, signature=None, language='python'):
+    """
+    Check if the new code is plagiarized from existing submissions.
+    An identical normalized copy is found with one indexed hash lookup; otherwise
+    candidates come from the fingerprint index and are scored with
+    score_candidates(). Pairs rejected by a bound are below the threshold, so
+    the returned similarity is exact whenever it matters (>= threshold).
+    Pass the submission's code_signature() to avoid normalizing twice.
+    Returns: (is_plagiarized, max_similarity, source_student_id)
+    """
+    if signature is None:
+        signature = code_signature(new_code, language)
+    normalized_new_code = signature['normalized_code']
+
+    if len(normalized_new_code) < MIN_TOKENS: # Skip very short snippets
+        return False, 0.0, None
+
+    source_student_id = find_exact_copy(cursor, signature['code_hash'], problem_id, student_id)
+    if source_student_id is not None:
+        return True, 1.0, source_student_id
+
+    candidates = find_candidates(cursor, signature['fingerprint'], problem_id, student_id)
+    max_similarity, source_student_id = score_candidates(normalized_new_code, candidates)
+    is_plagiarized = max_similarity >= THRESHOLD
+
     return is_plagiarized, max_similarity, source_student_id
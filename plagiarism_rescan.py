@@ -0,0 +1,203 @@
+"""
+Offline all-pairs plagiarism rescan.
+
+The submit-time check is one-way: a submission is only compared with earlier
+ones, so whoever hands their code around first is never flagged. This job
+compares every pair of submissions for a problem, groups students into copy
+rings and rewrites is_plagiarized / plagiarism_score /
+plagiarism_source_student_id for the whole problem.
+
+It deliberately leaves status and score alone. A rescan also flags whoever
+was copied from, whose submission was graded fairly at the time. Turning a
+flag into a rejection after the fact is left to the mentor, who sees the
+flags, scores and copy rings. Only the submit-time check auto-rejects.
+
+    python plagiarism_rescan.py [problem_id ...] [--dry-run]
+
+Pairs are narrowed in three stages so thousands of submissions stay cheap:
+  1. an upper bound on shared fingerprints for all pairs at once, from a
+     matrix product of per-bucket fingerprint counts (numpy),
+  2. exact fingerprint containment for the surviving pairs,
+  3. plagiarism_checker.score_pair() (bounded SequenceMatcher, on the
+     plagiarism process pool) for the pairs that are still plausible.
+"""
+import sys
+import time
+import numpy as np
+from psycopg2.extras import execute_values
+from config import Config
+from database import get_db
+from plagiarism_checker import code_signature, score_pair, get_executor, THRESHOLD, MIN_TOKENS
+
+BUCKETS = 2048        # fingerprint hashes are folded into this many count columns
+MIN_CONTAINMENT = 0.3 # share of the smaller fingerprint set two submissions must have in common to be scored
+ROW_CHUNK = 1024      # rows of the pairwise bound computed per matrix product
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+def load_submissions(cursor, problem_id):
+    cursor.execute('''
+        SELECT id, student_id, code, language, normalized_code, fingerprint
+        FROM problem_submissions
+        WHERE problem_id = %s AND code IS NOT NULL
+        ORDER BY id
+    ''', (problem_id,))
+    submissions = []
+    for row in cursor.fetchall():
+        if row['normalized_code'] is None or row['fingerprint'] is None:
+            # Not backfilled yet (see migrate_code_signatures.py)
+            signature = code_signature(row['code'], row['language'])
+            normalized, hashes = signature['normalized_code'], signature['fingerprint']
+        else:
+            normalized, hashes = row['normalized_code'], row['fingerprint']
+        submissions.append({
+            'id': row['id'],
+            'student_id': row['student_id'],
+            'normalized_code': normalized,
+            'fingerprint': np.unique(np.asarray(hashes, dtype=np.int64))
+        })
+    return submissions
+
+def candidate_pairs(submissions, min_containment=MIN_CONTAINMENT):
+    """
+    (i, j) index pairs, i < j, from different students whose fingerprints
+    overlap by at least min_containment of the smaller set.
+    """
+    n = len(submissions)
+    sizes = np.array([len(s['fingerprint']) for s in submissions], dtype=np.float32)
+    students = np.array([s['student_id'] for s in submissions])
+
+    # Per-bucket counts: dot(counts_a, counts_b) >= |A ∩ B| for any bucketing,
+    # so the matrix product is a safe upper bound on every pair's overlap.
+    counts = np.zeros((n, BUCKETS), dtype=np.float32)
+    for row, submission in enumerate(submissions):
+        np.add.at(counts[row], submission['fingerprint'] % BUCKETS, 1)
+
+    pairs = []
+    for start in range(0, n, ROW_CHUNK):
+        stop = min(start + ROW_CHUNK, n)
+        bound = counts[start:stop] @ counts.T
+        smaller = np.minimum.outer(sizes[start:stop], sizes)
+        plausible = (bound >= min_containment * smaller) & (smaller > 0)
+        plausible &= students[start:stop, None] != students[None, :]
+        rows, cols = np.nonzero(plausible)
+        rows += start
+        keep = rows < cols
+        pairs.extend(zip(rows[keep].tolist(), cols[keep].tolist()))
+
+    # Exact containment on the survivors (fingerprints are sorted and unique)
+    exact = []
+    for i, j in pairs:
+        a, b = submissions[i]['fingerprint'], submissions[j]['fingerprint']
+        shared = len(np.intersect1d(a, b, assume_unique=True))
+        if shared >= min_containment * min(len(a), len(b)):
+            exact.append((i, j))
+    return exact
+
+def _score_pairs(codes, pairs, threshold):
+    return [score_pair(codes[i], codes[j], threshold) for i, j in pairs]
+
+def score_pairs(submissions, pairs, threshold=THRESHOLD):
+    """(similarity, exact) per pair, as score_pair() returns it"""
+    codes = [s['normalized_code'] for s in submissions]
+    if len(pairs) < Config.PLAGIARISM_PARALLEL_MIN:
+        return _score_pairs(codes, pairs, threshold)
+    chunk = max(1, len(pairs) // (Config.PLAGIARISM_WORKERS * 4))
+    executor = get_executor()
+    futures = []
+    for k in range(0, len(pairs), chunk):
+        batch = pairs[k:k + chunk]
+        # Only ship the code each batch needs to the worker processes
+        needed = {index for pair in batch for index in pair}
+        futures.append(executor.submit(_score_pairs, {index: codes[index] for index in needed}, batch, threshold))
+    return [score for future in futures for score in future.result()]
+
+def rescan_problem(cursor, problem_id, dry_run=False):
+    start = time.perf_counter()
+    submissions = [s for s in load_submissions(cursor, problem_id) if len(s['normalized_code']) >= MIN_TOKENS]
+    pairs = candidate_pairs(submissions)
+    scores = score_pairs(submissions, pairs)
+
+    best = {}  # submission index -> (similarity, other submission index)
+    rings = UnionFind(len(submissions))
+    for (i, j), (similarity, exact) in zip(pairs, scores):
+        if not exact or similarity < THRESHOLD:
+            continue
+        rings.union(i, j)
+        for a, b in ((i, j), (j, i)):
+            # Prefer the most similar match; on ties, the earlier submission is the likelier source
+            if a not in best or (similarity, -b) > (best[a][0], -best[a][1]):
+                best[a] = (similarity, b)
+
+    updates = []
+    for index, submission in enumerate(submissions):
+        if index in best:
+            similarity, other = best[index]
+            updates.append((submission['id'], True, round(similarity, 4), submissions[other]['student_id']))
+        else:
+            updates.append((submission['id'], False, 0.0, None))
+
+    if updates and not dry_run:
+        execute_values(cursor, '''
+            UPDATE problem_submissions ps
+            SET is_plagiarized = v.is_plagiarized,
+                plagiarism_score = v.plagiarism_score,
+                plagiarism_source_student_id = v.source_student_id
+            FROM (VALUES %s) AS v (id, is_plagiarized, plagiarism_score, source_student_id)
+            WHERE ps.id = v.id
+              AND (ps.is_plagiarized IS DISTINCT FROM v.is_plagiarized
+                   OR ps.plagiarism_score IS DISTINCT FROM v.plagiarism_score
+                   OR ps.plagiarism_source_student_id IS DISTINCT FROM v.source_student_id)
+        ''', updates, template='(%s, %s, %s::float, %s::int)', page_size=1000)
+
+    members = {}
+    for index in best:
+        members.setdefault(rings.find(index), set()).add(submissions[index]['student_id'])
+    return {
+        'problem_id': problem_id,
+        'submissions': len(submissions),
+        'all_pairs': len(submissions) * (len(submissions) - 1) // 2,
+        'candidate_pairs': len(pairs),
+        'flagged': len(best),
+        'rings': sorted(sorted(students) for students in members.values() if len(students) > 1),
+        'seconds': round(time.perf_counter() - start, 2)
+    }
+
+def rescan(problem_ids=None, dry_run=False):
+    conn = get_db()
+    cursor = conn.cursor()
+    if not problem_ids:
+        cursor.execute('SELECT DISTINCT problem_id FROM problem_submissions ORDER BY problem_id')
+        problem_ids = [row['problem_id'] for row in cursor.fetchall()]
+
+    results = []
+    for problem_id in problem_ids:
+        result = rescan_problem(cursor, problem_id, dry_run)
+        # One transaction per problem: a failure later on keeps earlier problems' results
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+        print(f"Problem {problem_id}: {result['submissions']} submissions, "
+              f"{result['candidate_pairs']}/{result['all_pairs']} pairs scored, "
+              f"{result['flagged']} flagged, rings {result['rings']} ({result['seconds']}s)")
+        results.append(result)
+    conn.close()
+    return results
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--dry-run']
+    rescan([int(arg) for arg in args], dry_run='--dry-run' in sys.argv)
@@ -0,0 +1,293 @@
+"""
+Jail for submitted code, used by code_runner.run_sandboxed() for every case
+and by worker_pool.SandboxWorker for each warm worker:
+
+    python -I sandbox_jail.py [--status-fd N] <workdir> <cpu_seconds> <memory_mb> <output_kb> -- <argv...>
+
+The program runs with:
+  - fresh network, IPC, UTS, mount and PID namespaces (no network at all;
+    no other process on the machine can be seen or signalled),
+  - a root that is an empty tmpfs holding read-only binds of /usr (and the
+    /bin, /lib* it implies), the interpreter's prefix, a few /dev nodes, a
+    private /tmp and the workdir as /sandbox; nothing else of the host
+    filesystem (the app, its .env, home directories) exists in it,
+  - uid/gid 65534 (nobody) without capabilities and with no_new_privs,
+  - the given rlimits (0 means unlimited).
+
+When the app runs as root the uid switch is a plain setuid(). Otherwise the
+jail needs unprivileged user namespaces: the app's uid becomes root of a
+namespace (to build the mounts) and the program runs as 65534 in a nested
+one. If any step fails the program is not run: the launcher exits with
+SETUP_FAILED and reports "error: <reason>" on --status-fd (after a run it
+reports "ok"). Each step is checked; nothing is best effort.
+
+Kept free of project imports: -I leaves the app directory off sys.path.
+"""
+import ctypes
+import os
+import resource
+import signal
+import sys
+
+SANDBOX_DIR = '/sandbox'
+JAIL_UID = 65534
+JAIL_GID = 65534
+SETUP_FAILED = 125
+
+PYTHON = os.path.realpath(sys.executable)  # a venv's bin/python is a symlink to something under base_prefix
+LAUNCHER = os.path.abspath(__file__)
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUTS = 0x04000000
+CLONE_NEWIPC = 0x08000000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWPID = 0x20000000
+CLONE_NEWNET = 0x40000000
+
+MS_RDONLY = 0x1
+MS_NOSUID = 0x2
+MS_NODEV = 0x4
+MS_NOEXEC = 0x8
+MS_REMOUNT = 0x20
+MS_NOATIME = 0x400
+MS_NODIRATIME = 0x800
+MS_BIND = 0x1000
+MS_REC = 0x4000
+MS_PRIVATE = 0x40000
+MS_RELATIME = 0x200000
+
+PR_SET_PDEATHSIG = 1
+PR_SET_DUMPABLE = 4
+PR_SET_NO_NEW_PRIVS = 38
+
+SYSTEM_DIRS = ('/usr', '/bin', '/sbin', '/lib', '/lib32', '/lib64', '/libx32')
+SYSTEM_FILES = ('/etc/ld.so.cache', '/etc/alternatives')
+DEVICES = ('/dev/null', '/dev/zero', '/dev/full', '/dev/random', '/dev/urandom')
+
+_libc = ctypes.CDLL(None, use_errno=True)
+_libc.mount.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_ulong, ctypes.c_char_p]
+_libc.prctl.argtypes = [ctypes.c_int, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong]
+
+class JailError(Exception):
+    pass
+
+def jail_argv(workdir, argv, cpu_seconds=0, memory_mb=0, output_kb=0, status_fd=None):
+    """Command line that runs `argv` (paths as seen inside the jail) jailed in `workdir`"""
+    prefix = [PYTHON, '-I', LAUNCHER]
+    if status_fd is not None:
+        prefix += ['--status-fd', str(status_fd)]
+    return prefix + [workdir, str(cpu_seconds), str(memory_mb), str(output_kb), '--'] + list(argv)
+
+def _check(result, what):
+    if result != 0:
+        raise JailError(f'{what}: {os.strerror(ctypes.get_errno())}')
+
+def _bytes(value):
+    return None if value is None else os.fsencode(value)
+
+def _mount(source, target, fstype, flags, data=None):
+    _check(_libc.mount(_bytes(source), _bytes(target), _bytes(fstype), flags, _bytes(data)), f'mount {target}')
+
+def _prctl(option, value):
+    _check(_libc.prctl(option, value, 0, 0, 0), f'prctl {option}')
+
+def _locked_flags(path):
+    # A remount inside a user namespace may not clear flags the original mount has
+    flag = os.statvfs(path).f_flag
+    flags = flag & (MS_RDONLY | MS_NOSUID | MS_NODEV | MS_NOEXEC | MS_NOATIME | MS_NODIRATIME)
+    if flag & os.ST_RELATIME:
+        flags |= MS_RELATIME
+    return flags
+
+def _bind(source, target, writable=False, devices=False):
+    if os.path.isdir(source):
+        os.makedirs(target, exist_ok=True)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        open(target, 'a').close()
+    _mount(source, target, None, MS_BIND)
+    flags = MS_BIND | MS_REMOUNT | MS_NOSUID | _locked_flags(source)
+    if not writable:
+        flags |= MS_RDONLY
+    if not devices:
+        flags |= MS_NODEV
+    _mount(None, target, None, flags)
+
+def _write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+def _map_user(inside_uid, inside_gid, outside_uid, outside_gid):
+    _write('/proc/self/setgroups', 'deny')
+    _write('/proc/self/uid_map', f'{inside_uid} {outside_uid} 1')
+    _write('/proc/self/gid_map', f'{inside_gid} {outside_gid} 1')
+
+def build_root(workdir, privileged):
+    """Namespaces and the jail's root filesystem; returns the root's path (in this mount namespace only)"""
+    uid, gid = os.geteuid(), os.getegid()
+    flags = CLONE_NEWNS | CLONE_NEWNET | CLONE_NEWIPC | CLONE_NEWUTS | CLONE_NEWPID
+    if not privileged:
+        flags |= CLONE_NEWUSER
+    _check(_libc.unshare(flags), 'unshare (are user namespaces enabled?)' if not privileged else 'unshare')
+    if not privileged:
+        _map_user(0, 0, uid, gid)
+    _mount(None, '/', None, MS_REC | MS_PRIVATE)  # nothing below propagates back to the host
+
+    root = os.path.join(workdir, '.root')
+    os.makedirs(root, exist_ok=True)
+    _mount('tmpfs', root, 'tmpfs', MS_NOSUID | MS_NODEV, 'size=1m,mode=0755')
+    for path in SYSTEM_DIRS:
+        if os.path.islink(path):
+            os.symlink(os.readlink(path), root + path)
+        elif os.path.isdir(path):
+            _bind(path, root + path)
+    for path in SYSTEM_FILES:
+        if os.path.exists(path):
+            _bind(path, root + path)
+    # The interpreter's own prefix (stdlib, libpython) when it lives outside /usr
+    for path in {os.path.realpath(sys.base_prefix), os.path.dirname(os.path.dirname(PYTHON))}:
+        if path != '/' and not any(path == d or path.startswith(d + '/') for d in SYSTEM_DIRS):
+            _bind(path, root + path)
+    for path in DEVICES:
+        if os.path.exists(path):
+            _bind(path, root + path, writable=True, devices=True)
+    os.makedirs(root + '/tmp')
+    _mount('tmpfs', root + '/tmp', 'tmpfs', MS_NOSUID | MS_NODEV, 'size=64m,mode=1777')
+    _bind(workdir, root + SANDBOX_DIR, writable=True)
+    _mount(None, root, None, MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV)
+    if privileged:
+        os.chown(workdir, JAIL_UID, JAIL_GID)  # the program may create files next to its own
+    return root
+
+def drop_privileges(root, privileged, cpu_seconds, memory_mb, output_kb):
+    """In the process that will exec the program"""
+    if not privileged:
+        # Nested namespace in which our uid is 65534: exec drops every capability.
+        # Writing our own maps needs /proc/self to be ours again (init made itself undumpable)
+        _prctl(PR_SET_DUMPABLE, 1)
+        _check(_libc.unshare(CLONE_NEWUSER), 'unshare user namespace')
+        _map_user(JAIL_UID, JAIL_GID, 0, 0)
+    os.chroot(root)
+    os.chdir(SANDBOX_DIR)
+    if privileged:
+        os.setgroups([])
+        os.setgid(JAIL_GID)
+        os.setuid(JAIL_UID)
+    if os.getuid() != JAIL_UID or os.geteuid() != JAIL_UID or os.getgid() != JAIL_GID:
+        raise JailError('could not switch to the sandbox uid')
+    try:
+        os.setuid(0)
+    except OSError:
+        pass
+    else:
+        raise JailError('uid switch is reversible')
+    _prctl(PR_SET_NO_NEW_PRIVS, 1)
+
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    if cpu_seconds:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    if memory_mb:
+        memory = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    if output_kb:
+        output = output_kb * 1024
+        resource.setrlimit(resource.RLIMIT_FSIZE, (output, output))
+    os.environ.update(HOME=SANDBOX_DIR, TMPDIR='/tmp')
+
+def _report_error(fd, error):
+    text = f'E{type(error).__name__}: {error}'.replace('\n', ' ')
+    os.write(fd, text.encode('utf-8', 'replace')[:4000])
+
+def _detach_stdio():
+    # Only the program keeps the caller's pipes open, so EOF means it is gone
+    null = os.open('/dev/null', os.O_RDWR)
+    os.dup2(null, 0)
+    os.dup2(null, 1)
+    os.close(null)
+
+def launch(workdir, cpu_seconds, memory_mb, output_kb, argv):
+    """
+    Run argv jailed and wait for it. Returns (status, error): the program's
+    wait status, or error text when the jail could not be set up.
+    """
+    privileged = os.geteuid() == 0
+    root = build_root(workdir, privileged)
+    report_r, report_w = os.pipe()  # not inheritable: the program's exec closes its copy
+    init = os.fork()
+    if init == 0:
+        # PID 1 of the new namespace: runs the program as its child and reports how it ended;
+        # when it exits every process left in the namespace is killed
+        try:
+            os.close(report_r)
+            _prctl(PR_SET_PDEATHSIG, 9)
+            _prctl(PR_SET_DUMPABLE, 0)
+            program = os.fork()
+            if program == 0:
+                try:
+                    drop_privileges(root, privileged, cpu_seconds, memory_mb, output_kb)
+                    os.execv(argv[0], argv)
+                except BaseException as e:
+                    _report_error(report_w, e)
+                    os._exit(SETUP_FAILED)
+            _detach_stdio()
+            os.chroot(root)
+            while True:
+                pid, status = os.waitpid(-1, 0)
+                if pid == program:
+                    os.write(report_w, f'\nS{status}'.encode())
+                    os._exit(0)
+        except BaseException as e:
+            _report_error(report_w, e)
+            os._exit(SETUP_FAILED)
+
+    os.close(report_w)
+    _prctl(PR_SET_DUMPABLE, 0)
+    _detach_stdio()
+    os.waitpid(init, 0)
+    report = b''
+    while True:
+        chunk = os.read(report_r, 4096)
+        if not chunk:
+            break
+        report += chunk
+    # "E<error>" from a failed setup, then "S<wait status>" once the program is reaped
+    lines = report.decode('utf-8', 'replace').split('\n')
+    if lines[0].startswith('E'):
+        return None, lines[0][1:]
+    if lines[-1].startswith('S'):
+        return int(lines[-1][1:]), None
+    return signal.SIGKILL, None  # init was killed (timeout): report it like a killed program
+
+def main():
+    args = sys.argv[1:]
+    status_fd = None
+    if args[:1] == ['--status-fd']:
+        status_fd = int(args[1])
+        os.set_inheritable(status_fd, False)
+        args = args[2:]
+    separator = args.index('--')
+    workdir, cpu_seconds, memory_mb, output_kb = args[:separator]
+    argv = args[separator + 1:]
+
+    def report(text):
+        if status_fd is not None:
+            os.write(status_fd, text.encode('utf-8', 'replace'))
+
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    try:
+        status, error = launch(os.path.abspath(workdir), int(cpu_seconds), int(memory_mb), int(output_kb), argv)
+    except Exception as e:
+        status, error = None, f'{type(e).__name__}: {e}'
+    if error is not None:
+        report(f'error: {error}')
+        os.write(2, f'sandbox: {error}\n'.encode('utf-8', 'replace'))
+        os._exit(SETUP_FAILED)
+    report('ok')
+    if os.WIFSIGNALED(status):
+        # Die the same way, so callers see -SIGKILL, -SIGXCPU, ... as before
+        signal.signal(os.WTERMSIG(status), signal.SIG_DFL)
+        os.kill(os.getpid(), os.WTERMSIG(status))
+    os._exit(os.WEXITSTATUS(status))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Warm Python sandbox worker, started by worker_pool.WarmPythonPool inside
+sandbox_jail.py (the pool copies this file into the worker's directory) as
+
+    python -I /sandbox/sandbox_worker.py /sandbox <app directory>
+
+It refuses to serve anything unless it really is jailed (see check_jail).
+It pays interpreter start-up and the common imports once, then serves
+(code, input) jobs over stdin/stdout as 4-byte length-prefixed JSON. Every
+job runs in a forked child under rlimits, so one submission never sees
+another's state. Kept free of project imports: -I leaves the app directory
+off sys.path.
+"""
+import json
+import os
+import resource
+import select
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import time
+import traceback
+
+# Pre-imported so forked jobs get them for free
+import bisect, collections, dataclasses, decimal, fractions, functools, heapq  # noqa: E401,F401
+import itertools, math, random, re, statistics, string, typing  # noqa: E401,F401
+
+def read_message(stream):
+    header = stream.read(4)
+    if len(header) < 4:
+        return None
+    (length,) = struct.unpack('>I', header)
+    return json.loads(stream.read(length).decode('utf-8'))
+
+def write_message(stream, message):
+    data = json.dumps(message).encode('utf-8')
+    stream.write(struct.pack('>I', len(data)) + data)
+    stream.flush()
+
+def run_child(job, stdin_path, stdout_path, stderr_path):
+    """In the forked child: limits, redirect fds, exec the submission. Never returns."""
+    try:
+        os.setsid()
+        resource.setrlimit(resource.RLIMIT_CPU, (job['cpu'], job['cpu'] + 1))
+        memory = job['memory_mb'] * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        output = job['output_kb'] * 1024
+        resource.setrlimit(resource.RLIMIT_FSIZE, (output, output))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+        for fd, path, flags in ((0, stdin_path, os.O_RDONLY), (1, stdout_path, os.O_WRONLY), (2, stderr_path, os.O_WRONLY)):
+            target = os.open(path, flags)
+            os.dup2(target, fd)
+            os.close(target)
+        sys.stdin = open(0, 'r', closefd=False)
+        sys.stdout = open(1, 'w', closefd=False)
+        sys.stderr = open(2, 'w', closefd=False)
+    except BaseException:
+        os._exit(70)
+
+    code = 0
+    try:
+        exec(compile(job['code'], 'solution.py', 'exec'), {'__name__': '__main__', '__builtins__': __builtins__})
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except OSError:
+        code = code or 1
+    os._exit(code)
+
+def wait_child(pid, wall_seconds):
+    """(status, rusage, timed_out); kills the child's process group on timeout"""
+    deadline = time.monotonic() + wall_seconds
+    pidfd = os.pidfd_open(pid) if hasattr(os, 'pidfd_open') else None
+    try:
+        while True:
+            done, status, usage = os.wait4(pid, os.WNOHANG)
+            if done:
+                return status, usage, False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                os.killpg(pid, signal.SIGKILL)
+                _, status, usage = os.wait4(pid, 0)
+                return status, usage, True
+            if pidfd is not None:
+                select.select([pidfd], [], [], remaining)
+            else:
+                time.sleep(min(remaining, 0.002))
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+def run_job(job, workdir):
+    paths = {}
+    for name in ('stdin', 'stdout', 'stderr'):
+        fd, paths[name] = tempfile.mkstemp(dir=workdir, prefix=name + '-')
+        os.close(fd)
+    with open(paths['stdin'], 'w') as f:
+        f.write(job['input'])
+
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        run_child(job, paths['stdin'], paths['stdout'], paths['stderr'])
+    status, usage, timed_out = wait_child(pid, job['wall'])
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    output_limit = job['output_kb'] * 1024
+    output_full = os.path.getsize(paths['stdout']) >= output_limit
+    with open(paths['stdout'], 'rb') as f:
+        stdout = f.read(output_limit).decode('utf-8', errors='replace')
+    with open(paths['stderr'], 'rb') as f:
+        stderr = f.read()[-2000:].decode('utf-8', errors='replace')
+    for path in paths.values():
+        os.unlink(path)
+
+    if os.WIFSIGNALED(status):
+        exit_code = -os.WTERMSIG(status)
+    else:
+        exit_code = os.WEXITSTATUS(status)
+    return {
+        'exit_code': exit_code,
+        'timed_out': timed_out or exit_code in (-signal.SIGXCPU, -signal.SIGKILL),
+        'output_exceeded': exit_code == -signal.SIGXFSZ or (exit_code != 0 and output_full),
+        'stdout': stdout,
+        'stderr': stderr,
+        'time_ms': round(elapsed_ms, 1),
+        'cpu_ms': round((usage.ru_utime + usage.ru_stime) * 1000, 1),
+        'max_rss_kb': usage.ru_maxrss
+    }
+
+def check_jail(app_dir):
+    """Reasons this process is not safely jailed; empty when it is"""
+    problems = []
+    if os.getuid() == 0 or os.geteuid() == 0:
+        problems.append('running as root')
+    interfaces = [name for _, name in socket.if_nameindex()]
+    if any(name != 'lo' for name in interfaces):
+        problems.append(f'network interfaces visible: {interfaces}')
+    if os.path.exists(app_dir):
+        problems.append('host filesystem visible')
+    return problems
+
+def main():
+    workdir, app_dir = sys.argv[1], sys.argv[2]  # private directory owned (and removed) by the pool
+    os.chdir(workdir)
+
+    requests, replies = sys.stdin.buffer, sys.stdout.buffer
+    problems = check_jail(app_dir)
+    if problems:
+        write_message(replies, {'ready': False, 'error': 'not jailed: ' + '; '.join(problems)})
+        return
+    write_message(replies, {'ready': True, 'pid': os.getpid()})
+    while True:
+        job = read_message(requests)
+        if job is None:
+            return
+        try:
+            reply = run_job(job, workdir)
+        except Exception as e:
+            reply = {'error': f'{type(e).__name__}: {e}'}
+        write_message(replies, reply)
+
+if __name__ == '__main__':
+    main()
@@ -235,6 +235,215 @@ async function apiRequest(url, method = 'GET', data = null) {
     }
 }
 
+// Submissions are graded in the background; poll until the result is in
+async function pollSubmissionResult(type, submissionId, intervalMs = 1500, maxAttempts = 120) {
+    for (let attempt = 0; attempt < maxAttempts; attempt++) {
+        const response = await fetch(`/api/submissions/${type}/${submissionId}/result`);
+        const result = await response.json();
+        if (!response.ok || result.status !== 'pending') {
+            return result;
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+    throw new Error('Evaluation is taking longer than expected');
+}
+
+// Submission lists are paginated; the cursor for the next page comes back in X-Next-Cursor.
+// `state` is { items, nextCursor } and accumulates pages when loadMore is true.
+async function loadPage(state, url, loadMore = false) {
+    if (state.fromCache) {
+        // Re-render after applyLiveRow(): the items are already up to date
+        state.fromCache = false;
+        return state.items;
+    }
+    let pageUrl = url;
+    const separator = url.includes('?') ? '&' : '?';
+    const resync = !loadMore && state.syncCursor && state.syncUrl === url;
+    if (loadMore && state.nextCursor) {
+        pageUrl += `${separator}cursor=${encodeURIComponent(state.nextCursor)}`;
+    } else if (resync) {
+        // Reloading the same list: only fetch what changed since the first page
+        pageUrl += `${separator}since=${encodeURIComponent(state.syncCursor)}`;
+    }
+    const response = await fetch(pageUrl);
+    const body = await response.json();
+    if (resync && !response.ok) {
+        state.syncCursor = null;
+        return loadPage(state, url);
+    }
+    if (!Array.isArray(body)) {
+        state.items = mergeDelta(state.items, body);
+    } else {
+        state.items = loadMore ? state.items.concat(body) : body;
+        state.nextCursor = response.headers.get('X-Next-Cursor');
+    }
+    if (!loadMore) {
+        state.syncCursor = response.headers.get('X-Sync-Cursor');
+        state.syncUrl = url;
+    }
+    return state.items;
+}
+
+// Apply a {changed, deleted} delta from a ?since= request to rows in newest-first
+// order: changed rows replace their old copy in place, new ones go on top
+function mergeDelta(items, delta) {
+    const deleted = new Set(delta.deleted);
+    const changed = new Map(delta.changed.map(row => [row.id, row]));
+    const kept = items.filter(item => !deleted.has(item.id));
+    const added = delta.changed.filter(row => !kept.some(item => item.id === row.id));
+    return added.concat(kept.map(item => changed.get(item.id) || item));
+}
+
+// Last responses of cached endpoints live in sessionStorage (per tab, cleared at login)
+function readCache(key) {
+    try {
+        return JSON.parse(sessionStorage.getItem(key));
+    } catch (e) {
+        return null;
+    }
+}
+
+function writeCache(key, value) {
+    try {
+        sessionStorage.setItem(key, JSON.stringify(value));
+    } catch (e) {
+        sessionStorage.removeItem(key);  // over quota: just fetch in full next time
+    }
+}
+
+// GET a JSON endpoint that sends an ETag (/api/skills). The cached body is sent
+// back as If-None-Match; while nothing changed the server answers 304 without
+// running its query and the cached body is reused.
+async function cachedJson(url) {
+    const key = `etag:${url}`;
+    const cached = readCache(key);
+    const response = await fetch(url, { headers: cached ? { 'If-None-Match': cached.etag } : {} });
+    if (response.status === 304 && cached) return cached.body;
+    const body = await response.json();
+    if (!response.ok) throw new Error(body.message || 'Request failed');
+    const etag = response.headers.get('ETag');
+    if (etag) writeCache(key, { etag, body });
+    return body;
+}
+
+// Full list from /api/tasks, /api/problems, /api/aptitude and the like. The last
+// copy, its ETag and its X-Sync-Cursor are cached: an unchanged list costs one
+// 304, a changed one only the rows that changed (?since=), merged in here.
+async function syncList(url) {
+    const key = `sync:${url}`;
+    const cached = readCache(key);
+    const requestUrl = cached ? `${url}${url.includes('?') ? '&' : '?'}since=${encodeURIComponent(cached.cursor)}` : url;
+    const headers = cached && cached.etag ? { 'If-None-Match': cached.etag } : {};
+    const response = await fetch(requestUrl, { headers });
+    if (response.status === 304 && cached) return cached.items;
+    const body = await response.json();
+    if (!response.ok) {
+        sessionStorage.removeItem(key);
+        if (cached) return syncList(url);
+        throw new Error(body.message || 'Request failed');
+    }
+    // The server answers with the full array when the cursor can no longer be used
+    const items = Array.isArray(body) ? body : mergeDelta(cached.items, body);
+    const cursor = response.headers.get('X-Sync-Cursor');
+    if (cursor) writeCache(key, { cursor, etag: response.headers.get('ETag'), items });
+    return items;
+}
+
+function loadMoreButton(state, onclick) {
+    if (!state.nextCursor) return '';
+    return `
+        <div style="text-align: center; margin-top: 1rem;">
+            <button class="btn btn-sm btn-secondary" onclick="${onclick}">
+                <i class="fas fa-chevron-down"></i> Load more
+            </button>
+        </div>
+    `;
+}
+
+// Live updates over Server-Sent Events. `handlers` maps an event type to a
+// callback taking the parsed data:
+//   submission  { kind, submission }   a new task/problem/aptitude submission (list row)
+//   graded      { kind, submission }   background grading finished for a submission
+//   leaderboard { mentor_id, size, students }   rows whose rank or totals changed
+//   reset       {}   events were missed (e.g. server restart); reload the page's lists
+// EventSource reconnects by itself and resumes from the last event it saw.
+function subscribeEvents(handlers) {
+    if (!window.EventSource) return null;
+    const source = new EventSource('/api/events/stream');
+    Object.entries(handlers).forEach(([type, handler]) => {
+        source.addEventListener(type, event => handler(JSON.parse(event.data)));
+    });
+    return source;
+}
+
+// Put a row from a live event into a loadPage() state and re-render it with the
+// page's own loader, without another request. New rows go on top; `insert` false
+// only updates rows already on the page.
+function applyLiveRow(state, row, render, insert = true) {
+    const index = state.items.findIndex(item => item.id === row.id);
+    if (index >= 0) {
+        state.items[index] = { ...state.items[index], ...row };
+    } else if (insert) {
+        state.items.unshift(row);
+    } else {
+        return;
+    }
+    state.fromCache = true;
+    return render(true);
+}
+
+// Apply a 'submission' (insert) or 'graded' (update only) event to a page's lists.
+// `lists` maps a submission kind to the page's [loadPage() state, loader], or to a
+// callback (row, insert) for a list kept some other way; other kinds are ignored.
+function applyLiveSubmission(lists, data, insert) {
+    const target = lists[data.kind];
+    if (!target) return;
+    if (typeof target === 'function') return target({ ...data.submission, type: data.kind }, insert);
+    const [state, render] = target;
+    return applyLiveRow(state, data.submission, render, insert);
+}
+
+// Merge a row into an array mixing several kinds (a dashboard's recent submissions),
+// matching on type and id. False when the row is not there and `insert` is false.
+function mergeLiveRow(rows, row, insert) {
+    const index = rows.findIndex(item => item.type === row.type && item.id === row.id);
+    if (index >= 0) {
+        rows[index] = { ...rows[index], ...row };
+    } else if (insert) {
+        rows.unshift(row);
+    } else {
+        return false;
+    }
+    return true;
+}
+
+// Merge a 'leaderboard' event into rows in rank order. Every row whose rank moved
+// is in the event, so rows not in it keep their position.
+function mergeRanking(students, event) {
+    const changed = new Map(event.students.map(student => [student.id, student]));
+    const merged = students
+        .map((student, index) => changed.get(student.id) || { ...student, rank: student.rank || index + 1 })
+        .concat(event.students.filter(student => !students.some(existing => existing.id === student.id)));
+    merged.sort((a, b) => a.rank - b.rank || changed.has(b.id) - changed.has(a.id));
+    // A row that left the board shares its stale rank with the row that moved up into it
+    return merged.filter((student, index) => index === 0 || student.rank !== merged[index - 1].rank).slice(0, event.size);
+}
+
+// List rows carry no code or evaluation; fetch the full submission before showing its report
+async function openSubmissionReport(type, submissionId, render) {
+    try {
+        const response = await fetch(`/api/submissions/${type}/${submissionId}`);
+        const submission = await response.json();
+        if (!response.ok) {
+            showToast('error', 'Error', submission.message || 'Failed to load submission');
+            return;
+        }
+        render(submission);
+    } catch (error) {
+        showToast('error', 'Error', 'Failed to load submission');
+    }
+}
+
 // ============================================
 // Utility Functions
 // ============================================
@@ -374,6 +583,10 @@ function showEmptyState(container, icon, title, message, action = null) {
 
 document.addEventListener('DOMContentLoaded', function() {
     initTheme();
+    if (window.location.pathname === '/login') {
+        // Cached lists belong to whoever was signed in before
+        Object.keys(sessionStorage).filter(key => key.startsWith('sync:') || key.startsWith('etag:')).forEach(key => sessionStorage.removeItem(key));
+    }
     initTabs();
     initFileUpload();
     
@@ -0,0 +1,39 @@
+import threading
+import time
+from activity_logger import ActivityLogger
+
+def test_activity_logger():
+    batches = []
+    release = threading.Event()
+
+    def writer(events):
+        release.wait(5)  # hold the first batch so the buffer fills up behind it
+        batches.append(list(events))
+
+    logger = ActivityLogger(writer=writer, batch_size=10, flush_interval=0.2, max_buffer=20, block_timeout=0.01)
+    for i in range(25):
+        logger.log(1, 'login', f'event {i}')
+    time.sleep(0.1)
+
+    # Writer is stuck on one batch of 10, 15 are buffered; the buffer takes 5 more, then sheds
+    for i in range(25, 40):
+        logger.log(1, 'login', f'event {i}')
+    release.set()
+
+    assert logger.flush(timeout=5)
+    stats = logger.stats()
+    print(f"Batches {[len(b) for b in batches]}, stats {stats}")
+    assert stats['dropped'] == 10
+    assert stats['flushed'] == 30 and stats['pending'] == 0
+    assert all(len(b) <= 10 for b in batches)
+    details = [e[2] for b in batches for e in b]
+    assert details == sorted(details, key=lambda d: int(d.split()[1]))  # write order is log order
+
+    # Events logged right before shutdown are written by close()
+    logger.log(2, 'logout', 'last event')
+    logger.close()
+    assert batches[-1][-1][2] == 'last event'
+    assert logger.stats()['flushed'] == 31
+
+if __name__ == '__main__':
+    test_activity_logger()
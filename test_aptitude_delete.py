@@ -0,0 +1,46 @@
+import re
+from app import delete_aptitude_rows
+
+class FakeTables:
+    """A cursor over aptitude_tests / aptitude_submissions that enforces the foreign key like Postgres"""
+    def __init__(self):
+        self.tests = {1, 2}
+        self.submissions = [(10, 1, 5), (11, 1, 6), (12, 2, 5)]  # (id, test_id, student_id)
+        self.item_stats = {(1, 0), (1, 1), (2, 0)}
+        self.refreshed = None
+        self.result = []
+
+    def execute(self, sql, params=None):
+        sql = ' '.join(sql.split())
+        if sql.startswith('DELETE FROM aptitude_tests'):
+            if any(test_id == params[0] for _, test_id, _ in self.submissions):
+                raise AssertionError('ForeignKeyViolation: aptitude_submissions still references the test')
+            self.tests.discard(params[0])
+        elif sql.startswith('DELETE FROM aptitude_submissions'):
+            self.result = [{'student_id': s} for _, t, s in self.submissions if t == params[0]]
+            self.submissions = [row for row in self.submissions if row[1] != params[0]]
+        elif sql.startswith('DELETE FROM aptitude_item_stats'):
+            self.item_stats = {key for key in self.item_stats if key[0] != params[0]}
+        elif re.match(r'INSERT INTO student_leaderboard', sql):
+            self.refreshed = params['ids']
+        else:
+            raise AssertionError(f'unexpected query {sql[:60]}')
+
+    def fetchall(self):
+        result, self.result = self.result, []
+        return result
+
+def test_aptitude_delete():
+    tables = FakeTables()
+    delete_aptitude_rows(tables, 1)
+    assert tables.tests == {2} and tables.submissions == [(12, 2, 5)] and tables.item_stats == {(2, 0)}
+    assert tables.refreshed == [5, 6]  # the students whose attempts went away
+
+    # A test nobody took is deleted just the same
+    tables.submissions, tables.refreshed = [], None
+    delete_aptitude_rows(tables, 2)
+    assert tables.tests == set() and tables.refreshed is None
+
+if __name__ == '__main__':
+    test_aptitude_delete()
+    print("aptitude_delete OK")
@@ -0,0 +1,133 @@
+import os
+import tempfile
+import threading
+import psycopg2
+from aptitude_ingest import AttemptLimitReached, SubmissionIngestor, remark_stale
+
+class FakeTests:
+    """A cursor over aptitude_tests after a regrade: test 5 is at version 2, where question 1's key became option 1"""
+    QUESTIONS = [{'options': ['a', 'b'], 'correct': 0}, {'options': ['a', 'b'], 'correct': 1}]
+
+    def execute(self, sql, params):
+        self.sql = sql
+
+    def fetchall(self):
+        return [{'id': 5, 'questions_version': 2}]
+
+    def fetchone(self):
+        return {'questions': self.QUESTIONS, 'questions_version': 2}
+
+class FakeTable:
+    """Stands in for aptitude_submissions: unique on the ingest token, like the real index"""
+    def __init__(self):
+        self.rows = {}
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def write(self, records):
+        with self.lock:
+            self.batches.append(len(records))
+            new = []
+            for record in records:
+                if record['token'] not in self.rows:
+                    self.rows[record['token']] = record
+                    new.append({'id': len(self.rows), 'student_id': record['student_id'], 'test_id': record['test_id']})
+            return new
+
+    def count(self, test_id, student_id):
+        with self.lock:
+            return sum(1 for r in self.rows.values() if (r['test_id'], r['student_id']) == (test_id, student_id))
+
+def test_aptitude_ingest():
+    journal = os.path.join(tempfile.mkdtemp(), 'journal', 'aptitude.jsonl')
+    table = FakeTable()
+    ingestor = SubmissionIngestor(journal, table.write, table.count, batch_size=50, flush_interval=0.05, fsync=False)
+    notified = []
+    ingestor.add_listener(notified.extend)
+
+    # A burst of students submitting at once: acknowledged after the journal, inserted in batches
+    threads = [threading.Thread(target=ingestor.submit, args=(1, student, 1, 3, 5, {'0': 1})) for student in range(120)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert ingestor.flush(5)
+    assert len(table.rows) == 120 and len(notified) == 120
+    assert len(table.batches) < 120 and max(table.batches) <= 50
+    assert os.path.getsize(journal) == 0  # truncated once everything was committed
+
+    # The same student submitting twice at once under attempt_limit 1: exactly one gets in
+    outcomes = []
+    def attempt():
+        try:
+            outcomes.append(ingestor.submit(2, 7, 1, 1, 1, {}))
+        except AttemptLimitReached:
+            outcomes.append(None)
+    threads = [threading.Thread(target=attempt) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(1 for o in outcomes if o) == 1
+    assert ingestor.ledger.attempts(2, 7) == 1
+    try:
+        ingestor.submit(1, 0, 1, 0, 5, {})  # counted from the table, not just this run
+        assert False, 'expected AttemptLimitReached'
+    except AttemptLimitReached:
+        pass
+    ingestor.submit(1, 0, None, 0, 5, {})  # no limit
+    ingestor.close()
+    stats = ingestor.stats()
+    assert stats['pending'] == 0 and stats['committed'] == 122 and stats['rejected_attempt_limit'] == 10
+
+    # A crash after acknowledging but before inserting: the next start replays the journal once
+    lines = [
+        '{"token":"a1","test_id":3,"student_id":1,"score":1,"total":1,"answers":{},"focus_lost_count":0,"paste_attempts":0,"submitted_at":0}\n',
+        '{"token":"a2","test_id":3,"student_id":2,"score":0,"total":1,"answers":{},"focus_lost_count":0,"paste_attempts":0,"submitted_at":0}\n',
+        '{"token":"a3","test_id":3,'  # torn write, never acknowledged
+    ]
+    with open(journal, 'w') as f:
+        f.writelines(lines)
+    table.write([{'token': 'a1', 'test_id': 3, 'student_id': 1}])  # this one made it before the crash
+    restarted = SubmissionIngestor(journal, table.write, table.count, fsync=False)
+    restarted.start()
+    assert restarted.stats()['replayed'] == 1 and table.count(3, 2) == 1 and table.count(3, 1) == 1
+    assert os.path.getsize(journal) == 0
+    restarted.close()
+
+    # Graded with the key from before a regrade: re-marked against the current one on insert
+    records = [
+        {'test_id': 5, 'answers': {'0': 0, '1': 1}, 'score': 1, 'total': 2, 'questions_version': 1},
+        {'test_id': 5, 'answers': {'0': 0, '1': 0}, 'score': 1, 'total': 2, 'questions_version': 2},
+        {'test_id': 6, 'answers': {}, 'score': 0, 'total': 2, 'questions_version': 1}  # test deleted meanwhile
+    ]
+    assert remark_stale(FakeTests(), records) == 1
+    assert records[0]['score'] == 2 and records[0]['correct'] == [1, 1] and records[0]['questions_version'] == 2
+    assert records[1]['score'] == 1 and records[2]['score'] == 0
+
+    # Rows the database refuses for good (their test was deleted) are split out and
+    # dead-lettered; the rest of the batch is committed and the committer moves on
+    def strict_write(records):
+        if any(r['test_id'] == 9 for r in records):
+            raise psycopg2.IntegrityError('insert violates foreign key constraint')
+        return table.write(records)
+    strict = SubmissionIngestor(journal, strict_write, table.count, batch_size=50, flush_interval=0.2, fsync=False)
+    threads = [threading.Thread(target=strict.submit, args=(9 if student % 10 == 0 else 4, student, 1, 1, 1, {}))
+               for student in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert strict.flush(5)
+    dead = strict.stats()['dead_lettered']
+    assert dead == 4 and strict.stats()['retries'] == 0
+    assert sum(table.count(4, student) for student in range(40)) == 36
+    with open(strict.dead_letter_path) as f:
+        assert len(f.readlines()) == 4
+    assert strict.ledger.attempts(9, 0) == 0  # the refused attempt is given back
+    strict.close()
+    print(f"aptitude_ingest stats {stats}")
+
+if __name__ == '__main__':
+    test_aptitude_ingest()
+    print("aptitude_ingest OK")
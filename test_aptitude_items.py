@@ -0,0 +1,63 @@
+import json
+import random
+from aptitude_keys import CompiledTest
+from aptitude_items import OPTION_LIMIT, batch_counts, item_analytics, matrix_counts
+from aptitude_regrade import answer_matrix, grade, key_vector
+
+class StatsCursor:
+    """Just enough of a cursor for item_analytics()"""
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params):
+        self.test_id = params[0]
+
+    def fetchall(self):
+        return [r for r in self.rows if r['test_id'] == self.test_id]
+
+def add(stored, counts):
+    """What add_counts() does to the table"""
+    for key, (attempts, correct, unanswered, options) in counts.items():
+        entry = stored.setdefault(key, [0, 0, 0, []])
+        entry[0] += attempts
+        entry[1] += correct
+        entry[2] += unanswered
+        entry[3] += [0] * (len(options) - len(entry[3]))
+        for option, count in enumerate(options):
+            entry[3][option] += count
+
+def test_aptitude_items():
+    rng = random.Random(3)
+    questions = [{'question': f'Q{i}', 'options': ['a', 'b', 'c', 'd'], 'correct': i % 4} for i in range(6)]
+    compiled = CompiledTest(1, questions)
+    submissions = [{str(i): rng.choice([0, 1, 2, 3, '2', 'x', 40]) for i in range(6) if rng.random() < 0.8}
+                   for _ in range(200)]
+
+    # Counts added batch by batch at ingest equal the counts a regrade computes from scratch
+    records = []
+    for answers in submissions:
+        choices, correct = compiled.mark(answers)
+        records.append({'test_id': 9, 'choices': choices, 'correct': correct})
+    incremental = {}
+    for start in range(0, len(records), 37):
+        add(incremental, batch_counts(records[start:start + 37]))
+    matrix = answer_matrix([json.dumps(a) for a in submissions], len(questions))
+    correct, scores = grade(matrix, key_vector(questions))
+    assert incremental == matrix_counts(9, matrix, correct)
+    assert sum(incremental[(9, q)][1] for q in range(6)) == scores.sum()
+    assert all(len(entry[3]) <= OPTION_LIMIT for entry in incremental.values())  # 40 is junk, not an option
+    assert batch_counts([{'test_id': 9, 'token': 'old'}]) == {}  # journaled before item statistics
+
+    # Served per question of the bank, with every option listed even if nobody picked it
+    rows = [{'test_id': 9, 'question': q, 'attempts': a, 'correct': c, 'unanswered': u, 'option_counts': o}
+            for (_, q), (a, c, u, o) in incremental.items() if q != 5]
+    items = item_analytics(StatsCursor(rows), 9, questions)
+    assert [item['attempts'] for item in items] == [200] * 5 + [0]
+    assert items[0]['difficulty'] == round(incremental[(9, 0)][1] / 200, 4)
+    assert [o['text'] for o in items[5]['options']] == ['a', 'b', 'c', 'd'] and items[5]['difficulty'] is None
+    assert sum(o['count'] for o in items[1]['options']) + items[1]['unanswered'] == 200
+    print(f"aptitude_items first item {items[0]}")
+
+if __name__ == '__main__':
+    test_aptitude_items()
+    print("aptitude_items OK")
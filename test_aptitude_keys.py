@@ -0,0 +1,30 @@
+import json
+from aptitude_keys import CompiledTest
+
+QUESTIONS = [
+    {'question': '2 + 2?', 'options': ['3', '4'], 'correct': 1},
+    {'question': '3 * 3?', 'options': ['9', '6'], 'correct': '0'},
+    {'question': 'Unanswerable', 'options': ['a', 'b']}
+]
+
+def test_aptitude_keys():
+    test = CompiledTest(1, QUESTIONS)
+    assert test.answer_key == (1, 0, None)
+
+    # Students never see `correct`; everything else goes through untouched
+    payload = json.loads(test.student_questions)
+    assert all('correct' not in q for q in payload)
+    assert [q['options'] for q in payload] == [q['options'] for q in QUESTIONS]
+
+    # String or int option indexes; junk answers count as wrong instead of failing the submit
+    assert test.grade({'0': 1, '1': '0', '2': 0}) == 2
+    assert test.grade({'0': '1', '1': 'nine'}) == 1
+    assert test.grade({}) == 0
+
+    # Per-question marks behind the score, for the item statistics
+    assert test.mark({'0': '1', '1': 1, '2': 0}) == ([1, 1, 0], [1, 0, 0])
+    assert test.mark({'0': -2, '1': 'nine'}) == ([-1, -1, -1], [0, 0, 0])
+
+if __name__ == '__main__':
+    test_aptitude_keys()
+    print("aptitude_keys OK")
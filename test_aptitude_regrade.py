@@ -0,0 +1,56 @@
+import json
+import random
+import numpy as np
+from aptitude_keys import CompiledTest
+from aptitude_regrade import answer_matrix, apply_corrections, grade, item_stats, key_vector
+
+def test_aptitude_regrade():
+    rng = random.Random(7)
+    questions = [{'question': f'Q{i}', 'options': ['a', 'b', 'c', 'd'], 'correct': i % 4} for i in range(12)]
+    questions[5]['correct'] = 'x'  # a broken key counts for nobody
+    junk = [None, 'b', '9', 2.0, True, [1], -1, 70000]
+    blobs = []
+    for _ in range(300):
+        answers = {str(i): rng.choice([0, 1, 2, 3, str(rng.randrange(4)), rng.choice(junk)])
+                   for i in range(12) if rng.random() < 0.9}
+        answers['99'] = 1  # no such question
+        blobs.append(json.dumps(answers))
+    blobs += ['not json', '[]', None]
+
+    # Same scores as grading one submission at a time
+    compiled = CompiledTest(1, questions)
+    matrix = answer_matrix(blobs, len(questions))
+    correct, scores = grade(matrix, key_vector(questions))
+    expected = [compiled.grade(json.loads(b)) if b and b.startswith('{') else 0 for b in blobs]
+    assert scores.tolist() == expected
+
+    # Fixing a key changes exactly the scores of those who chose the old or new option
+    fixed = apply_corrections(questions, {'0': 2})
+    assert questions[0]['correct'] == 0 and fixed[0]['correct'] == 2
+    _, rescored = grade(matrix, key_vector(fixed))
+    touched = (matrix[:, 0] == 0) | (matrix[:, 0] == 2)
+    assert np.array_equal(rescored != scores, touched)
+    for bad in ({'12': 0}, {'0': 4}, {'0': 'x'}):
+        try:
+            apply_corrections(questions, bad)
+            assert False, f'expected ValueError for {bad}'
+        except ValueError:
+            pass
+
+    # Item statistics: an easy question everyone gets, one only strong students get, one nobody can
+    matrix = np.array([[0, 1, 0], [0, 1, 0], [0, 0, 0], [0, 0, 0], [0, -1, 0]], dtype=np.int16)
+    key = np.array([0, 1, -1], dtype=np.int16)
+    strong = np.array([[1, 1]] * 2 + [[1, 0]] * 3, dtype=np.int16)  # answers to a 4th and 5th question
+    matrix = np.hstack([matrix, strong])
+    key = np.append(key, [1, 1]).astype(np.int16)
+    correct, scores = grade(matrix, key)
+    stats = item_stats(matrix, correct, scores)
+    assert stats[0]['difficulty'] == 1.0 and stats[0]['discrimination'] is None
+    assert stats[1]['difficulty'] == 0.4 and stats[1]['answered'] == 0.8 and stats[1]['discrimination'] > 0.9
+    assert stats[2]['difficulty'] == 0.0 and stats[2]['discrimination'] is None
+    assert item_stats(matrix[:0], correct[:0], scores[:0])[0]['difficulty'] is None
+    print(f"aptitude_regrade items {stats}")
+
+if __name__ == '__main__':
+    test_aptitude_regrade()
+    print("aptitude_regrade OK")
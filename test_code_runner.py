@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import code_runner
+from worker_pool import WarmPythonPool, WorkerError, get_worker_pool
+
+ADD_CASES = code_runner.parse_test_cases(json.dumps([
+    {"input": "1 2\n", "output": "3"},
+    {"input": "10 -4\n", "output": "6\n"},
+    {"input": "0 0\n", "output": "1"}
+]))
+
+def verdicts(report):
+    return [case['verdict'] for case in report['cases']]
+
+def test_code_runner():
+    assert code_runner.parse_test_cases('[1, 2, 3], target=5') == []  # prose examples stay with the LLM
+    assert code_runner.parse_test_cases('{"input": "2"}', '4') == [{'input': '2', 'output': '4'}]
+
+    report = code_runner.judge("a, b = map(int, input().split())\nprint(a + b)\n", 'python', ADD_CASES)
+    print(f"python: {verdicts(report)} in {report['wall_ms']}ms")
+    assert verdicts(report) == ['passed', 'passed', 'wrong_answer'] and report['passed'] == 2
+
+    assert verdicts(code_runner.judge("while True:\n    pass\n", 'python', ADD_CASES[:1])) == ['time_limit_exceeded']
+    assert verdicts(code_runner.judge("raise SystemExit(3)\n", 'python', ADD_CASES[:1])) == ['runtime_error']
+    assert verdicts(code_runner.judge("print('x' * 10 ** 7)\n", 'python', ADD_CASES[:1])) == ['output_limit_exceeded']
+    assert verdicts(code_runner.judge("x = bytearray(2 * 1024 ** 3)\n", 'python', ADD_CASES[:1])) == ['runtime_error']
+
+    # Cold path (fresh interpreter per case) agrees with the warm workers
+    report = code_runner.judge("a, b = map(int, input().split())\nprint(a + b)\n", 'python', ADD_CASES, warm=False)
+    assert verdicts(report) == ['passed', 'passed', 'wrong_answer']
+
+    # Submissions see neither the app's files nor the network, and run unprivileged
+    probe = code_runner.parse_test_cases(json.dumps([{'input': '', 'output': 'False False 65534'}]))
+    spy = ("import os, socket\n"
+           f"seen = os.path.exists({os.path.abspath(code_runner.__file__)!r})\n"
+           "try:\n    socket.create_connection(('1.1.1.1', 80), timeout=1); online = True\n"
+           "except OSError:\n    online = False\n"
+           "print(seen, online, os.getuid())\n")
+    assert verdicts(code_runner.judge(spy, 'python', probe, warm=False)) == ['passed']
+    assert verdicts(code_runner.judge(spy, 'python', probe)) == ['passed']
+
+    # Workers that hit a limit are replaced rather than reused
+    pool = get_worker_pool()
+    recycled = pool.stats()['recycled']
+    code_runner.judge("while True:\n    pass\n", 'python', ADD_CASES[:1])
+    assert pool.stats()['recycled'] == recycled + 1
+
+    # A pool whose workers cannot start times out at checkout and the case runs cold
+    def broken():
+        raise WorkerError('cannot start')
+    dead = WarmPythonPool(size=1, checkout_timeout=0.2, spawn=broken)
+    code_runner.get_worker_pool = lambda: dead
+    try:
+        report = code_runner.judge("a, b = map(int, input().split())\nprint(a + b)\n", 'python', ADD_CASES)
+    finally:
+        code_runner.get_worker_pool = get_worker_pool
+        dead.close()
+    assert verdicts(report) == ['passed', 'passed', 'wrong_answer']
+    assert dead.stats()['spawn_failures'] >= 1 and dead.stats()['ran_cold'] == 3
+
+    if shutil.which('gcc'):
+        c_code = '#include <stdio.h>\nint main() { int a, b; scanf("%d %d", &a, &b); printf("%d\\n", a + b); return 0; }\n'
+        report = code_runner.judge(c_code, 'c', ADD_CASES)
+        print(f"c: {verdicts(report)} in {report['wall_ms']}ms")
+        assert verdicts(report) == ['passed', 'passed', 'wrong_answer']
+
+        report = code_runner.judge('int main() { return missing; }\n', 'c', ADD_CASES)
+        assert report['compile_error'] and report['passed'] == 0
+
+if __name__ == '__main__':
+    test_code_runner()
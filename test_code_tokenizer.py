@@ -0,0 +1,44 @@
+from code_tokenizer import tokenize_code, STR
+from plagiarism_checker import code_signature, score_pair
+
+ORIGINAL = '''def total(nums):
+    # running sum
+    result = 0
+    for n in nums:
+        result += n * 2
+    return result
+
+print(total([1, 2, 3]))
+'''
+
+RENAMED = '''def add_all(values):
+    acc = 0  # copied, then renamed
+    for v in values:
+        acc += v * 7
+    return acc
+print(add_all([4, 5, 6]))
+'''
+
+def test_code_tokenizer():
+    # Renames, comments, literals and layout do not change the stream
+    assert tokenize_code(ORIGINAL) == tokenize_code(RENAMED)
+    assert code_signature(ORIGINAL)['code_hash'] == code_signature(RENAMED)['code_hash']
+
+    # '#' and '//' inside strings are not comments; /* */ blocks are
+    assert tokenize_code("url = 'http://x/#top'\n") == tokenize_code("url = 'y'\n")
+    assert STR in tokenize_code("url = 'http://x/#top'\n")
+    c_a = '#include <stdio.h>\nint main() { /* read\n n */ int n; scanf("%d", &n); printf("%d\\n", n * 2); return 0; }'
+    c_b = '#include<stdio.h>\nint main()\n{\n    int k; // input\n    scanf("%d", &k);\n    printf("%d // twice\\n", k * 2);\n    return 0;\n}\n'
+    assert tokenize_code(c_a, 'c') == tokenize_code(c_b, 'c')
+
+    # Source the Python tokenizer rejects still produces tokens
+    assert tokenize_code("def f(:\n    return 'unterminated\n")
+
+    different = "import sys\nfor line in sys.stdin:\n    a, b = line.split()\n    print(int(a) - int(b))\n"
+    similarity, _ = score_pair(code_signature(ORIGINAL)['normalized_code'], code_signature(different)['normalized_code'])
+    print(f"renamed copy: identical tokens; unrelated solution: {similarity:.2f}")
+    assert similarity < 0.85
+
+if __name__ == '__main__':
+    test_code_tokenizer()
+    print("code_tokenizer OK")
@@ -0,0 +1,87 @@
+import threading
+import time
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+from database import ConnectionPool, PoolTimeout
+
+class FakeInfo:
+    def __init__(self):
+        self.transaction_status = TRANSACTION_STATUS_IDLE
+
+class FakeConnection:
+    """Just enough of a PooledConnection for the pool: transaction state, rollback, discard"""
+    def __init__(self, broken=False):
+        self.closed = 0
+        self.info = FakeInfo()
+        self.rollbacks = 0
+        self.broken = broken
+
+    def rollback(self):
+        if self.broken:
+            raise psycopg2.OperationalError('server closed the connection')
+        self.rollbacks += 1
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def discard(self):
+        self.closed = 1
+
+class FakeConnect:
+    def __init__(self):
+        self.opened = []
+
+    def __call__(self, dsn, **kwargs):
+        assert dsn == 'fake://db'
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+def test_connection_pool():
+    connect = FakeConnect()
+    pool = ConnectionPool('fake://db', min_size=1, max_size=2, max_overflow=1, timeout=0.2, connect=connect)
+    pool.warmup()
+    assert pool.stats()['size'] == 1 and pool.stats()['idle'] == 1
+
+    # Up to max_size + max_overflow connections; the overflow one is closed when returned
+    a, b, c = pool.getconn(), pool.getconn(), pool.getconn()
+    assert len(connect.opened) == 3 and pool.stats()['overflow'] == 1 and pool.stats()['in_use'] == 3
+
+    # Everything in use: getconn waits `timeout` and gives up
+    start = time.monotonic()
+    try:
+        pool.getconn()
+        assert False, 'expected PoolTimeout'
+    except PoolTimeout:
+        pass
+    assert time.monotonic() - start >= 0.2 and pool.stats()['timeouts'] == 1
+
+    # ...unless one comes back in the meantime (over max_size, so it is closed and a fresh one opened)
+    threading.Timer(0.05, pool.putconn, args=(c,)).start()
+    d = pool.getconn()
+    assert c.closed and d is connect.opened[-1] and len(connect.opened) == 4 and pool.stats()['in_use'] == 3
+    pool.putconn(d)
+    assert d.closed and pool.stats()['size'] == 2 and pool.stats()['overflow'] == 0
+    pool.putconn(b)
+    assert not b.closed and pool.stats()['idle'] == 1
+
+    # A half-finished transaction is rolled back before the connection is reused
+    a.info.transaction_status = TRANSACTION_STATUS_INTRANS
+    pool.putconn(a)
+    assert a.rollbacks == 1 and not a.closed
+    reused = pool.getconn()
+    assert reused is a and reused.info.transaction_status == TRANSACTION_STATUS_IDLE
+
+    # One whose rollback fails is dropped, not handed out again
+    reused.broken = True
+    reused.info.transaction_status = TRANSACTION_STATUS_INTRANS
+    pool.putconn(reused)
+    assert reused.closed and pool.stats()['size'] == 1 and pool.stats()['in_use'] == 0
+    fresh = pool.getconn()
+    assert fresh is b
+    pool.putconn(fresh)
+    pool.closeall()
+    assert pool.stats()['size'] == 0
+    print(f"connection_pool stats {pool.stats()}")
+
+if __name__ == '__main__':
+    test_connection_pool()
+    print("connection_pool OK")
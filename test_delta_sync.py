@@ -0,0 +1,33 @@
+import time
+from flask import Flask, session
+from config import Config
+from delta_sync import decode_cursor, encode_cursor
+
+def test_delta_sync():
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    with app.test_request_context():
+        session.update(role='student', user_id=7, mentor_id=3)
+        token = encode_cursor(123456, time.time())
+        version, issued_at = decode_cursor(token)
+        assert version == 123456 and abs(issued_at - time.time()) < 2
+
+        # Garbage is a client error; a cursor that is merely unusable means "send everything"
+        for bad in ['', 'not a cursor', encode_cursor(1, 0)[:-3] + '!!!']:
+            try:
+                decode_cursor(bad)
+                assert False, bad
+            except ValueError:
+                pass
+        old = encode_cursor(1, time.time() - (Config.DELTA_SYNC_RETENTION_DAYS + 1) * 86400)
+        assert decode_cursor(old) is None
+
+        # Another user's cursor, or this student's after a mentor change, gets a full list
+        session['mentor_id'] = 4
+        assert decode_cursor(token) is None
+        session.update(role='mentor', user_id=3, mentor_id=None)
+        assert decode_cursor(token) is None
+
+if __name__ == '__main__':
+    test_delta_sync()
+    print("delta_sync OK")
@@ -0,0 +1,22 @@
+from flask import Flask, session
+from etags import is_fresh, make_etag, not_modified
+
+def test_etags():
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    with app.test_request_context('/api/tasks'):
+        session.update(role='mentor', user_id=3)
+        etag = make_etag('42|None')
+        assert make_etag('42|None') == etag and make_etag('43|None') != etag
+        session.update(role='mentor', user_id=4)
+        assert make_etag('42|None') != etag  # another user's list never matches
+
+    with app.test_request_context('/api/tasks', headers={'If-None-Match': f'W/"{etag}"'}):
+        assert is_fresh(etag) and not is_fresh(etag + 'x')
+        response = not_modified(etag)
+        assert response.status_code == 304 and response.headers['ETag'] == f'W/"{etag}"'
+        assert 'no-cache' in response.headers['Cache-Control']
+
+if __name__ == '__main__':
+    test_etags()
+    print("etags OK")
@@ -0,0 +1,103 @@
+import json
+from types import SimpleNamespace
+import ai_evaluator
+import evaluation_cache
+from ai_evaluator import evaluate_code
+
+STUB_REPLY = {
+    "score": 82,
+    "status": "accepted",
+    "feedback": "Stub evaluation.",
+    "correctness": "Correct - 34/40",
+    "efficiency": "O(n) - 20/25",
+    "code_style": "Readable - 16/20",
+    "best_practices": "Fine - 12/15",
+    "suggestions": "None."
+}
+
+class FakeCursor:
+    """The evaluation_cache table as a dict of cache_key -> JSON result"""
+    def __init__(self, table):
+        self.table = table
+        self.row = None
+
+    def execute(self, sql, params):
+        if sql.strip().startswith('SELECT'):
+            result = self.table.get(params[0])
+            self.row = {'result': result} if result is not None else None
+        else:
+            key, model, result = params
+            self.table[key] = result
+
+    def fetchone(self):
+        return self.row
+
+class FakeConn:
+    def __init__(self, table):
+        self.table = table
+
+    def cursor(self):
+        return FakeCursor(self.table)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+class FakePool:
+    def __init__(self, table):
+        self.table = table
+
+    def getconn(self):
+        return FakeConn(self.table)
+
+def test_evaluation_cache():
+    table = {}
+    calls = []
+    def stub_llm(operation, **kwargs):
+        calls.append(kwargs['model'])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(STUB_REPLY)))])
+
+    chat_completion, get_pool = ai_evaluator._chat_completion, evaluation_cache.get_pool
+    model, prompt_version = ai_evaluator.MODEL, ai_evaluator.PROMPT_VERSION
+    ai_evaluator._chat_completion = stub_llm
+    evaluation_cache.get_pool = lambda: FakePool(table)
+    try:
+        code = "def second(nums):\n    values = sorted(set(nums))\n    return values[-2] if len(values) > 1 else None\n"
+        first = evaluate_code(code, 'python', 'Second largest')
+        assert calls == [model] and first['score'] == 82 and len(table) == 1
+
+        # Same code (line endings and trailing spaces aside), language and prompt: no model call
+        assert evaluate_code(code.replace('\n', '  \r\n'), 'python', 'Second largest') == first
+        assert len(calls) == 1
+
+        # A restarted process has an empty memory layer; the table still answers
+        db_hits = evaluation_cache.stats()['db_hits']
+        evaluation_cache._memory.clear()
+        assert evaluate_code(code, 'python', 'Second largest') == first
+        assert len(calls) == 1 and evaluation_cache.stats()['db_hits'] == db_hits + 1
+
+        # Anything that could change the grade misses
+        evaluate_code(code, 'python', 'Second smallest')
+        assert len(calls) == 2
+        ai_evaluator.PROMPT_VERSION = prompt_version + 1
+        evaluate_code(code, 'python', 'Second largest')
+        assert len(calls) == 3
+        ai_evaluator.PROMPT_VERSION = prompt_version
+        ai_evaluator.MODEL = 'stub-model-2'
+        evaluate_code(code, 'python', 'Second largest')
+        assert calls[-1] == 'stub-model-2' and len(calls) == 4
+        ai_evaluator.MODEL = model
+
+        # Back on the original model and prompt version: a hit again
+        assert evaluate_code(code, 'python', 'Second largest') == first
+        assert len(calls) == 4 and len(table) == 4
+    finally:
+        ai_evaluator._chat_completion, evaluation_cache.get_pool = chat_completion, get_pool
+        ai_evaluator.MODEL, ai_evaluator.PROMPT_VERSION = model, prompt_version
+    print(f"evaluation_cache stats {evaluation_cache.stats()}")
+
+if __name__ == '__main__':
+    test_evaluation_cache()
+    print("evaluation_cache OK")
@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import Config
+from evaluation_queue import EvaluationQueue, evaluate_job
+from ai_evaluator import llm_metrics
+
+STUB_REPLY = {
+    "score": 82,
+    "status": "accepted",
+    "feedback": "Stub evaluation.",
+    "correctness": "Correct - 34/40",
+    "efficiency": "O(n) - 20/25",
+    "code_style": "Readable - 16/20",
+    "best_practices": "Fine - 12/15",
+    "suggestions": "None."
+}
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Answers Groq/OpenAI chat completion requests with a canned evaluation"""
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real endpoint
+    active = 0
+    peak = 0
+    fail_next = 0  # answer this many requests with 503, like an overloaded endpoint
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with StubLLMHandler.lock:
+            failing = StubLLMHandler.fail_next > 0
+            StubLLMHandler.fail_next -= failing
+        if failing:
+            body = b'{"error": {"message": "overloaded"}}'
+            self.send_response(503)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        with StubLLMHandler.lock:
+            StubLLMHandler.active += 1
+            StubLLMHandler.peak = max(StubLLMHandler.peak, StubLLMHandler.active)
+        time.sleep(0.1)
+        with StubLLMHandler.lock:
+            StubLLMHandler.active -= 1
+
+        body = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": json.dumps(STUB_REPLY)}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_evaluation_queue():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    Config.GROQ_BASE_URL = f'http://127.0.0.1:{server.server_port}'
+    Config.GROQ_API_KEY = 'stub-key'
+
+    code = "def solve(nums):\n    return sorted(set(nums))[-2] if len(set(nums)) > 1 else None\n"
+    # Distinct code per job so every one misses the evaluation cache and reaches the stub
+    jobs = {i: {'code': code + f"# submission {i}\n", 'language': 'python', 'description': 'Second largest',
+                'expected_output': None, 'test_cases': None} for i in range(8)}
+    results = {}
+
+    queue = EvaluationQueue(
+        max_workers=3,
+        loader=lambda kind, submission_id: jobs[submission_id],
+        store=lambda kind, submission_id, evaluation: results.setdefault(submission_id, evaluation) is not None,
+        evaluator=evaluate_job
+    )
+    for submission_id in jobs:
+        queue.enqueue('problem', submission_id)
+
+    assert queue.drain(timeout=30)
+
+    print(f"Graded {len(results)} submissions, peak concurrency {StubLLMHandler.peak}, stats {queue.stats()}")
+    assert len(results) == len(jobs)
+    assert all(r['score'] == 82 and r['status'] == 'accepted' for r in results.values())
+    assert StubLLMHandler.peak <= 3
+
+    # The LLM failing (past the client's own retries) is retried by the queue, not stored as a zero-score rejection
+    StubLLMHandler.fail_next = Config.GROQ_MAX_RETRIES + 1
+    outage = {'code': code + "# graded during an outage\n", 'language': 'python', 'description': 'Second largest',
+              'expected_output': None, 'test_cases': None}
+    stored = {}
+    retrying = EvaluationQueue(
+        max_workers=1,
+        loader=lambda kind, submission_id: outage,
+        store=lambda kind, submission_id, evaluation: stored.setdefault(submission_id, evaluation) is not None,
+        evaluator=evaluate_job, max_attempts=3, retry_delay=0.05
+    )
+    retrying.enqueue('problem', 'outage')
+    assert retrying.drain(timeout=30)
+    server.shutdown()
+    assert StubLLMHandler.fail_next == 0
+    assert stored['outage']['status'] == 'accepted' and stored['outage']['score'] == 82
+    assert retrying.stats()['retried'] == 1 and retrying.stats()['failed'] == 0
+
+    # A job that keeps raising is retried, then stored as an error result instead of staying pending
+    calls = []
+    def flaky(kind, job):
+        calls.append(job)
+        if job == 'broken' or len(calls) == 1:
+            raise RuntimeError('evaluator down')
+        return STUB_REPLY
+    stored = {}
+    retrying = EvaluationQueue(
+        max_workers=2,
+        loader=lambda kind, submission_id: submission_id,
+        store=lambda kind, submission_id, evaluation: stored.setdefault(submission_id, evaluation) is not None,
+        evaluator=flaky, max_attempts=3, retry_delay=0.05
+    )
+    retrying.enqueue('task', 'flaky')
+    assert retrying.drain(timeout=10)
+    retrying.enqueue('task', 'broken')
+    assert retrying.drain(timeout=10)
+    assert stored['flaky']['status'] == 'accepted'
+    assert stored['broken']['status'] == 'rejected' and stored['broken']['score'] == 0
+    stats = retrying.stats()
+    assert stats['retried'] == 3 and stats['failed'] == 1 and stats['completed'] == 1
+
+    llm = llm_metrics.stats()
+    print(f"LLM calls {llm['calls']}, new connections {llm['new_connections']}, reused {llm['reused_connections']}")
+    assert llm['reused_connections'] > 0
+
+if __name__ == '__main__':
+    test_evaluation_queue()
@@ -0,0 +1,76 @@
+import json
+import threading
+from event_stream import EventBroker
+
+def frames(stream, count):
+    """Next `count` event frames (comments and retry hints skipped) as (id, type, data)"""
+    events = []
+    for chunk in stream:
+        if chunk.startswith('id:'):
+            fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+            events.append((fields['id'], fields['event'], json.loads(fields['data'])))
+            if len(events) == count:
+                return events
+    return events
+
+def test_event_stream():
+    broker = EventBroker(history=5, max_queue=3, max_subscribers=2, heartbeat=0.05, lifetime=5)
+
+    # Only subscribers of a channel receive its events; a fresh stream starts from now
+    broker.publish(['mentor:1'], 'submission', {'id': 0})
+    mentor, backlog = broker.subscribe(['mentor:1'])
+    other, _ = broker.subscribe(['mentor:2'])
+    assert backlog == [] and broker.subscribe(['admin']) == (None, None)  # at capacity
+    stream = broker.stream(mentor, backlog)
+    assert broker.publish(['admin', 'mentor:1'], 'submission', {'id': 1}) == 1
+    broker.publish(['mentor:2'], 'submission', {'id': 2})
+    broker.publish(['mentor:1'], 'graded', {'id': 1, 'score': 90})
+    received = frames(stream, 2)
+    assert [(kind, data['id']) for _, kind, data in received] == [('submission', 1), ('graded', 1)]
+    stream.close()
+    broker.unsubscribe(mentor)  # what the response's close does too; only counted once
+    broker.unsubscribe(other)
+    assert broker.stats()['subscribers'] == 0
+
+    # Reconnecting with Last-Event-ID replays what was missed in the meantime
+    last_id = received[-1][0]
+    broker.publish(['mentor:1'], 'graded', {'id': 3})
+    subscription, backlog = broker.subscribe(['mentor:1'], last_id)
+    assert [e[3] for e in backlog] == ['{"id": 3}']
+    broker.unsubscribe(subscription)
+
+    # An id from before the history (or another server run) gets a reset instead
+    for i in range(10):
+        broker.publish(['mentor:1'], 'submission', {'id': 10 + i})
+    subscription, backlog = broker.subscribe(['mentor:1'], last_id)
+    assert backlog is None
+    assert frames(broker.stream(subscription, backlog), 1)[0][1] == 'reset'
+    assert broker.subscribe(['mentor:1'], 'stale-1')[1] is None and broker.stats()['subscribers'] == 1
+
+    # A client that stops reading is cut off instead of buffering without bound
+    slow, backlog = broker.subscribe(['admin'])
+    for i in range(5):
+        broker.publish(['admin'], 'submission', {'id': 100 + i})
+    assert slow.overflowed
+    assert frames(broker.stream(slow, backlog), 10) == []  # the browser reconnects and replays from history
+    assert broker.stats()['overflows'] == 1
+
+    # Leaderboard diffs: first call sends everything, then only rows that moved or changed
+    rows = [{'id': 7, 'total': 3}, {'id': 8, 'total': 2}, {'id': 9, 'total': 1}]
+    assert len(broker.rank_changes('mentor:1', rows)) == 3
+    assert broker.rank_changes('mentor:1', rows) == []
+    rows = [{'id': 9, 'total': 4}, {'id': 7, 'total': 3}, {'id': 8, 'total': 2}]
+    assert [(r['id'], r['rank']) for r in broker.rank_changes('mentor:1', rows)] == [(9, 1), (7, 2), (8, 3)]
+
+    # close() ends open streams promptly
+    broker = EventBroker(heartbeat=10, lifetime=60)
+    subscription, backlog = broker.subscribe(['admin'])
+    done = threading.Event()
+    threading.Thread(target=lambda: (list(broker.stream(subscription, backlog)), done.set()), daemon=True).start()
+    broker.close()
+    assert done.wait(2)
+    print(f"event_stream stats {broker.stats()}")
+
+if __name__ == '__main__':
+    test_event_stream()
+    print("event_stream OK")
@@ -0,0 +1,78 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from flask import Flask, jsonify
+from config import Config
+import json_stream
+from json_stream import encode_rows
+
+class FakeCursor(list):
+    """A named cursor over fixed rows"""
+    def execute(self, sql, params):
+        pass
+
+    def close(self):
+        pass
+
+class FakeConn:
+    opened = []
+
+    def __init__(self):
+        self.closed = 0
+        FakeConn.opened.append(self)
+
+    def cursor(self, name=None):
+        return FakeCursor([{'id': 1}, {'id': 2}])
+
+    def close(self):
+        self.closed += 1
+
+class FakePool:
+    def getconn(self):
+        return FakeConn()
+
+def test_json_stream():
+    app = Flask(__name__)
+    rows = [{'id': i, 'name': f'user {i}', 'created_at': datetime(2024, 1, 1, 12, i), 'score': Decimal('1.5')}
+            for i in range(25)]
+    with app.app_context():
+        dumps = app.json.dumps
+        expected = jsonify(rows).get_json()
+
+        # The array jsonify() would have produced, dates and decimals included
+        body = ''.join(encode_rows(iter(rows), 'json', dumps, 10))
+        assert json.loads(body) == expected
+        assert ''.join(encode_rows(iter([]), 'json', dumps, 10)) == '[]'
+
+        lines = ''.join(encode_rows(iter(rows), 'ndjson', dumps, 10)).splitlines()
+        assert [json.loads(line) for line in lines] == expected
+        assert list(encode_rows(iter([]), 'ndjson', dumps, 10)) == []
+
+        # Rows are pulled as chunks go out, not all up front
+        pulled = []
+        def source():
+            for row in rows:
+                pulled.append(row['id'])
+                yield row
+        chunks = encode_rows(source(), 'json', dumps, 10)
+        next(chunks)
+        assert len(pulled) == 10
+        assert len(list(chunks)) == 2 and len(pulled) == 25
+
+    # HEAD sends no body, so the generator never starts: the response's close still
+    # returns the connection and the slot, or a few HEADs would block every export
+    json_stream.get_pool = lambda: FakePool()
+    app.add_url_rule('/export', 'export', lambda: json_stream.stream_query('SELECT 1'))
+    client = app.test_client()
+    for _ in range(Config.EXPORT_MAX_STREAMS + 2):
+        response = client.head('/export')
+        assert response.status_code == 200
+        response.close()  # what the WSGI server does once the (empty) body is sent
+    assert json_stream.stats()['active'] == 0
+    assert all(conn.closed == 1 for conn in FakeConn.opened)
+    assert client.get('/export').get_json() == [{'id': 1}, {'id': 2}]
+    assert json_stream.stats()['active'] == 0 and FakeConn.opened[-1].closed == 1
+
+if __name__ == '__main__':
+    test_json_stream()
+    print("json_stream OK")
@@ -1,35 +1,22 @@
-import psycopg2
-from psycopg2.extras import DictCursor
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from database import get_db
+import leaderboard
 
 def test_query():
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'), cursor_factory=DictCursor)
+        conn = get_db()
         cursor = conn.cursor()
         
-        print("Testing CTE student leaderboard query...")
+        print("Rebuilding student leaderboard summary...")
+        leaderboard.rebuild(cursor)
+        conn.commit()
+
+        print("Testing student leaderboard query...")
         query = '''
-            WITH student_stats AS (
-                SELECT 
-                    u.id, u.name, u.email, m.name as mentor_name, u.mentor_id, u.role,
-                    COALESCE((SELECT COUNT(*) FROM task_submissions ts 
-                              WHERE ts.student_id = u.id AND ts.status = 'accepted'), 0) as tasks_completed,
-                    COALESCE((SELECT COUNT(*) FROM problem_submissions ps 
-                              WHERE ps.student_id = u.id AND ps.status = 'accepted'), 0) as problems_solved,
-                    COALESCE((SELECT COUNT(*) FROM aptitude_submissions aps WHERE aps.student_id = u.id), 0) as aptitude_completed,
-                    COALESCE((SELECT AVG(score) FROM task_submissions ts WHERE ts.student_id = u.id), 0) as avg_task_score,
-                    COALESCE((SELECT AVG(score) FROM problem_submissions ps WHERE ps.student_id = u.id), 0) as avg_problem_score,
-                    COALESCE((SELECT AVG(CASE WHEN total_questions > 0 THEN (CAST(score AS FLOAT)/total_questions)*100 ELSE 0 END) 
-                              FROM aptitude_submissions aps WHERE aps.student_id = u.id), 0) as avg_aptitude_score
-                FROM users u
-                LEFT JOIN users m ON u.mentor_id = m.id
-                WHERE u.role = 'student'
-            )
-            SELECT * FROM student_stats
-            ORDER BY (tasks_completed + problems_solved + aptitude_completed) DESC, avg_task_score DESC
+            SELECT student_id AS id, name, email, mentor_name, mentor_id,
+                   tasks_completed, problems_solved, aptitude_completed,
+                   avg_task_score, avg_problem_score, avg_aptitude_score
+            FROM student_leaderboard
+            ORDER BY total_completed DESC, avg_task_score DESC
         '''
         cursor.execute(query)
         rows = cursor.fetchall()
@@ -0,0 +1,58 @@
+import base64
+from datetime import datetime, timedelta
+from werkzeug.datastructures import MultiDict
+from config import Config
+from pagination import decode_cursor, encode_cursor, keyset_page, page_size
+
+class FakeCursor:
+    """Returns `rows` for any query and keeps the last SQL and parameters"""
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params):
+        self.sql, self.params = sql, params
+
+    def fetchall(self):
+        return self.rows[:self.params[-1]]
+
+def test_pagination():
+    when = datetime(2025, 3, 1, 9, 30, 15, 250000)
+    token = encode_cursor(when, 4821)
+    assert '=' not in token and decode_cursor(token) == (when, 4821)
+
+    # Anything the server did not issue is rejected, not turned into a bogus range
+    tampered = base64.urlsafe_b64encode(b'2025-03-01T09:30:15|drop table').decode()
+    for bad in ['', 'not a cursor', token[:-4] + '!!!!', tampered,
+                base64.urlsafe_b64encode(b'yesterday|12').decode()]:
+        try:
+            decode_cursor(bad)
+            assert False, bad
+        except ValueError:
+            pass
+
+    # limit is clamped to [1, SUBMISSIONS_MAX_PAGE_SIZE] and defaults to SUBMISSIONS_PAGE_SIZE
+    assert page_size(MultiDict()) == Config.SUBMISSIONS_PAGE_SIZE
+    assert page_size(MultiDict({'limit': '0'})) == 1
+    assert page_size(MultiDict({'limit': '-5'})) == 1
+    assert page_size(MultiDict({'limit': str(Config.SUBMISSIONS_MAX_PAGE_SIZE * 10)})) == Config.SUBMISSIONS_MAX_PAGE_SIZE
+    assert page_size(MultiDict({'limit': 'lots'})) == Config.SUBMISSIONS_PAGE_SIZE
+
+    # One extra row is fetched; its presence yields a cursor for the last row returned
+    rows = [{'id': 100 - i, 'submitted_at': when - timedelta(minutes=i)} for i in range(10)]
+    cursor = FakeCursor(rows)
+    page, next_cursor = keyset_page(cursor, 'SELECT s.* FROM task_submissions s', 's', ['s.student_id = %s'], [7],
+                                    MultiDict({'limit': '3', 'task_id': '9', 'cursor': token}), {'task_id': ('s.task_id', int)})
+    assert [r['id'] for r in page] == [100, 99, 98]
+    assert decode_cursor(next_cursor) == (rows[2]['submitted_at'], 98)
+    assert cursor.params == [7, 9, when, 4821, 4]
+    assert 'WHERE s.student_id = %s AND s.task_id = %s AND (s.submitted_at, s.id) < (%s, %s)' in cursor.sql
+    assert cursor.sql.endswith('ORDER BY s.submitted_at DESC, s.id DESC LIMIT %s')
+
+    # The last page has no cursor
+    page, next_cursor = keyset_page(FakeCursor(rows[:2]), 'SELECT s.* FROM task_submissions s', 's', [], [],
+                                    MultiDict({'limit': '3'}), {})
+    assert len(page) == 2 and next_cursor is None
+
+if __name__ == '__main__':
+    test_pagination()
+    print("pagination OK")
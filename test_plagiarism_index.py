@@ -0,0 +1,198 @@
+from plagiarism_checker import (CANDIDATES_SQL, EXACT_COPY_SQL, MIN_TOKENS, check_plagiarism, code_signature,
+                                find_candidates, find_exact_copy, fingerprint, normalize_code)
+
+PROGRAM = '''def summarize(rows):
+    totals = {}
+    counts = {}
+    for name, value in rows:
+        if name not in totals:
+            totals[name] = 0
+            counts[name] = 0
+        totals[name] += value
+        counts[name] += 1
+    report = []
+    for name in sorted(totals):
+        average = totals[name] / counts[name]
+        report.append((name, totals[name], round(average, 2)))
+    return report
+
+def main():
+    n = int(input())
+    rows = []
+    for _ in range(n):
+        name, value = input().split()
+        rows.append((name, int(value)))
+    for name, total, average in summarize(rows):
+        print(name, total, average)
+
+main()
+'''
+
+# Variables and functions renamed, comments added, spacing and blank lines changed
+COPY = '''# my own solution
+def group_stats(entries):
+    sums={}
+    seen={}
+
+    for key,amount in entries:
+        if key not in sums:
+            sums[key]=0
+            seen[key]=0
+        sums[key]+=amount   # running total
+        seen[key]+=1
+    result=[]
+    for key in sorted(sums):
+        mean=sums[key]/seen[key]
+        result.append((key,sums[key],round(mean,2)))
+    return result
+
+
+def main():
+    count=int(input())
+    entries=[]
+    for _ in range(count):
+        key,amount=input().split()
+        entries.append((key,int(amount)))
+    for key,total,mean in group_stats(entries):
+        print(key,total,mean)
+
+main()
+'''
+
+# The copy again, with an extra line and a changed loop in the middle
+EDITED = COPY.replace("        seen[key]+=1\n", "        seen[key]+=1\n        assert amount>=0\n").replace(
+    "    for _ in range(count):\n", "    while len(entries)<count:\n")
+
+UNRELATED = [
+    '''import heapq
+
+def shortest(graph, start):
+    dist = {start: 0}
+    heap = [(0, start)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > dist.get(node, float('inf')):
+            continue
+        for nxt, weight in graph.get(node, []):
+            nd = d + weight
+            if nd < dist.get(nxt, float('inf')):
+                dist[nxt] = nd
+                heapq.heappush(heap, (nd, nxt))
+    return dist
+
+n, m = map(int, input().split())
+graph = {}
+for _ in range(m):
+    a, b, w = map(int, input().split())
+    graph.setdefault(a, []).append((b, w))
+    graph.setdefault(b, []).append((a, w))
+print(shortest(graph, 1))
+''',
+    '''def is_palindrome(text):
+    cleaned = ''.join(ch.lower() for ch in text if ch.isalnum())
+    return cleaned == cleaned[::-1]
+
+def longest(words):
+    best = ''
+    for word in words:
+        if is_palindrome(word) and len(word) > len(best):
+            best = word
+    return best
+
+words = input().split()
+print(longest(words) or 'none')
+print(sum(1 for word in words if is_palindrome(word)))
+''',
+    '''class Matrix:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __mul__(self, other):
+        size = len(other.rows[0])
+        return Matrix([[sum(a * b for a, b in zip(row, col)) for col in zip(*other.rows)] for row in self.rows])
+
+    def power(self, exponent):
+        result = Matrix([[int(i == j) for j in range(len(self.rows))] for i in range(len(self.rows))])
+        base = self
+        while exponent:
+            if exponent & 1:
+                result = result * base
+            base = base * base
+            exponent >>= 1
+        return result
+
+n = int(input())
+print(Matrix([[1, 1], [1, 0]]).power(n).rows[0][1])
+''',
+]
+
+class FakeIndex:
+    """problem_submissions plus problem_submission_fingerprints, answering the checker's three queries"""
+    def __init__(self):
+        self.submissions = {}
+
+    def add(self, submission_id, problem_id, student_id, code):
+        self.submissions[submission_id] = dict(code_signature(code), problem_id=problem_id,
+                                               student_id=student_id, code=code)
+
+    def execute(self, sql, params):
+        if sql is EXACT_COPY_SQL:
+            problem_id, code_hash, student_id = params
+            self.rows = [(s['student_id'],) for _, s in sorted(self.submissions.items())
+                         if s['problem_id'] == problem_id and s['code_hash'] == code_hash
+                         and s['student_id'] != student_id][:1]
+        elif sql is CANDIDATES_SQL:
+            problem_id, student_id, hashes, limit = params
+            shared = [(submission_id, len(set(s['fingerprint']) & set(hashes)))
+                      for submission_id, s in self.submissions.items()
+                      if s['problem_id'] == problem_id and s['student_id'] != student_id]
+            self.rows = sorted([row for row in shared if row[1]], key=lambda row: -row[1])[:limit]
+        else:
+            assert 'id = ANY' in sql
+            self.rows = [(self.submissions[i]['student_id'], self.submissions[i]['normalized_code'],
+                          self.submissions[i]['code'], 'python') for i in params[0]]
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+def test_plagiarism_index():
+    # Renames, comments and layout are normalized away: the copy has the very same fingerprints
+    original = normalize_code(PROGRAM)
+    assert normalize_code(COPY) == original
+    assert fingerprint(normalize_code(COPY)) == fingerprint(original)
+    edited = fingerprint(normalize_code(EDITED))
+    assert len(edited & fingerprint(original)) >= 0.5 * len(fingerprint(original))
+    for code in UNRELATED:
+        assert len(fingerprint(normalize_code(code)) & fingerprint(original)) < 0.2 * len(fingerprint(original))
+
+    index = FakeIndex()
+    index.add(1, 7, 1, PROGRAM)
+    for offset, code in enumerate(UNRELATED[:2] * 3):   # more submissions than TOP_CANDIDATES
+        index.add(10 + offset, 7, 10 + offset, code)
+    index.add(20, 8, 20, PROGRAM)                       # the same code for another problem is not a candidate
+
+    # The edited copy's best candidate is the original, and the unrelated code is not
+    candidates = find_candidates(index, edited, 7, student_id=5, limit=1)
+    assert candidates == [(1, original)]
+    assert (1, original) in find_candidates(index, edited, 7, student_id=5)
+    assert all(source != 1 for source, _ in find_candidates(index, edited, 7, student_id=1))   # never one's own work
+
+    signature = code_signature(COPY)
+    assert find_exact_copy(index, signature['code_hash'], 7, 5) == 1
+    assert find_exact_copy(index, signature['code_hash'], 7, 1) is None
+    assert find_exact_copy(index, code_signature(UNRELATED[0])['code_hash'], 8, 5) is None
+
+    assert check_plagiarism(COPY, 7, 5, index) == (True, 1.0, 1)
+    flagged, similarity, source = check_plagiarism(EDITED, 7, 5, index)
+    print(f"edited copy: similarity {similarity:.3f}")
+    assert flagged and source == 1
+    # Long enough to be checked, but nothing in the index resembles it
+    assert len(normalize_code(UNRELATED[2])) >= MIN_TOKENS
+    assert check_plagiarism(UNRELATED[2], 7, 5, index)[0] is False
+
+if __name__ == '__main__':
+    test_plagiarism_index()
+    print("plagiarism_index OK")
@@ -0,0 +1,110 @@
+import numpy as np
+from plagiarism_checker import MIN_TOKENS, normalize_code
+from plagiarism_rescan import BUCKETS, UnionFind, candidate_pairs, rescan_problem
+
+PROGRAM = '''def summarize(rows):
+    totals = {}
+    counts = {}
+    for name, value in rows:
+        if name not in totals:
+            totals[name] = 0
+            counts[name] = 0
+        totals[name] += value
+        counts[name] += 1
+    report = []
+    for name in sorted(totals):
+        average = totals[name] / counts[name]
+        report.append((name, totals[name], round(average, 2)))
+    return report
+
+def main():
+    n = int(input())
+    rows = []
+    for _ in range(n):
+        name, value = input().split()
+        rows.append((name, int(value)))
+    for name, total, average in summarize(rows):
+        print(name, total, average)
+
+main()
+'''
+
+OTHER = '''import heapq
+
+def shortest(graph, start):
+    dist = {start: 0}
+    heap = [(0, start)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > dist.get(node, float('inf')):
+            continue
+        for nxt, weight in graph.get(node, []):
+            nd = d + weight
+            if nd < dist.get(nxt, float('inf')):
+                dist[nxt] = nd
+                heapq.heappush(heap, (nd, nxt))
+    return dist
+
+n, m = map(int, input().split())
+graph = {}
+for _ in range(m):
+    a, b, w = map(int, input().split())
+    graph.setdefault(a, []).append((b, w))
+    graph.setdefault(b, []).append((a, w))
+print(shortest(graph, 1))
+'''
+
+def submission(student_id, hashes):
+    return {'student_id': student_id, 'normalized_code': '', 'fingerprint': np.unique(np.asarray(hashes, dtype=np.int64))}
+
+class FakeCursor:
+    """problem_submissions rows for one problem, not backfilled (signatures are computed on load)"""
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+def test_plagiarism_rescan():
+    shared = list(range(100, 120))
+    submissions = [
+        submission(1, shared),
+        submission(2, shared[:8] + list(range(500, 512))),         # 8/20 shared: above MIN_CONTAINMENT
+        submission(3, shared[:2] + list(range(600, 618))),         # 2/20 shared: pruned by the bucket bound
+        submission(4, [h + BUCKETS for h in shared]),              # same buckets, no hashes in common
+        submission(1, shared),                                     # the same student twice is never a pair
+    ]
+    pairs = candidate_pairs(submissions)
+    assert (0, 1) in pairs and (1, 4) in pairs
+    assert not any(3 in pair for pair in pairs)                    # bound passed, exact containment did not
+    assert not any(2 in pair for pair in pairs)
+    assert (0, 4) not in pairs
+
+    rings = UnionFind(6)
+    rings.union(4, 5)
+    rings.union(1, 4)
+    rings.union(2, 3)
+    assert rings.find(5) == rings.find(1) == 1 and rings.find(3) == 2 and rings.find(0) == 0
+
+    # Student 1 hands code to 2, who passes it on to 3: one ring, the original author included
+    renamed = PROGRAM.replace('totals', 'sums').replace('average', 'mean')
+    reordered = PROGRAM.replace('        counts[name] += 1\n', '        counts[name] = counts[name] + 1\n')
+    assert len(normalize_code(PROGRAM)) >= MIN_TOKENS
+    rows = [
+        {'id': 1, 'student_id': 1, 'code': PROGRAM, 'language': 'python', 'normalized_code': None, 'fingerprint': None},
+        {'id': 2, 'student_id': 2, 'code': renamed, 'language': 'python', 'normalized_code': None, 'fingerprint': None},
+        {'id': 3, 'student_id': 3, 'code': reordered, 'language': 'python', 'normalized_code': None, 'fingerprint': None},
+        {'id': 4, 'student_id': 4, 'code': OTHER, 'language': 'python', 'normalized_code': None, 'fingerprint': None},
+        {'id': 5, 'student_id': 5, 'code': 'print(input())\n', 'language': 'python', 'normalized_code': None, 'fingerprint': None},
+    ]
+    result = rescan_problem(FakeCursor(rows), 7, dry_run=True)
+    print(f"rescan: {result}")
+    assert result['submissions'] == 4                              # the one-liner is below MIN_TOKENS
+    assert result['flagged'] == 3 and result['rings'] == [[1, 2, 3]]
+
+if __name__ == '__main__':
+    test_plagiarism_rescan()
+    print("plagiarism_rescan OK")
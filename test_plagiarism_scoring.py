@@ -0,0 +1,94 @@
+import difflib
+import random
+import plagiarism_checker
+from config import Config
+from plagiarism_checker import THRESHOLD, normalize_code, score_candidates, score_pair
+
+PROGRAM = '''def summarize(rows):
+    totals = {}
+    counts = {}
+    for name, value in rows:
+        if name not in totals:
+            totals[name] = 0
+            counts[name] = 0
+        totals[name] += value
+        counts[name] += 1
+    report = []
+    for name in sorted(totals):
+        average = totals[name] / counts[name]
+        report.append((name, totals[name], round(average, 2)))
+    return report
+'''
+
+def true_ratio(a, b):
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+def edited(rng, code, edits):
+    """`code` with `edits` random substitutions, insertions and deletions of its own tokens"""
+    chars = list(code)
+    for _ in range(edits):
+        at = rng.randrange(len(chars))
+        kind = rng.randrange(3)
+        if kind == 0:
+            chars[at] = rng.choice(code)
+        elif kind == 1:
+            chars.insert(at, rng.choice(code))
+        elif len(chars) > 1:
+            del chars[at]
+    return ''.join(chars)
+
+def swapped(rng, code, size):
+    """Two blocks of `size` tokens exchanged: the same multiset, so quick_ratio() stays at 1.0"""
+    a = rng.randrange(len(code) - 2 * size)
+    b = rng.randrange(a + size, len(code) - size)
+    return code[:a] + code[b:b + size] + code[a + size:b] + code[a:a + size] + code[b + size:]
+
+def near_threshold_pairs(rng, base):
+    pairs = []
+    for edits in range(1, 80):
+        pairs.append((base, edited(rng, base, edits)))
+    for size in range(2, len(base) // 3, 3):
+        pairs.append((base, swapped(rng, base, size)))
+    # A prefix: the true ratio equals the length bound, on both sides of the threshold
+    for cut in range(int(len(base) * 0.6), len(base)):
+        pairs.append((base, base[:cut]))
+    # Exactly at the threshold: 17 of 20 characters in common, 2 * 17 / 40 == 0.85
+    pairs.append(('abcdefghijklmnopqrst', 'abcdefghijklmnopqXYZ'))
+    return pairs
+
+def test_plagiarism_scoring():
+    rng = random.Random(13)
+    base = normalize_code(PROGRAM)
+    pairs = near_threshold_pairs(rng, base)
+    above = below = 0
+    for a, b in pairs:
+        ratio = true_ratio(a, b)
+        similarity, exact = score_pair(a, b)
+        if exact:
+            assert similarity == ratio
+        else:
+            assert similarity < THRESHOLD and similarity >= ratio   # a bound, never below the truth
+        if ratio >= THRESHOLD:
+            assert exact, (ratio, similarity)                        # never rejected by a bound
+            above += 1
+        elif THRESHOLD - 0.1 < ratio:
+            below += 1
+    assert above >= 10 and below >= 10, (above, below)
+    assert score_pair('abcdefghijklmnopqrst', 'abcdefghijklmnopqXYZ') == (THRESHOLD, True)
+
+    # The process pool gives the same answer as the in-thread loop
+    candidates = [(student_id, b) for student_id, (_, b) in enumerate(pairs[::3])]
+    serial = score_candidates(base, candidates, parallel=False)
+    Config.PLAGIARISM_WORKERS = 2
+    try:
+        assert score_candidates(base, candidates, parallel=True) == serial
+        rng.shuffle(candidates)
+        assert score_candidates(base, candidates, parallel=True) == score_candidates(base, candidates, parallel=False)
+    finally:
+        plagiarism_checker.get_executor().shutdown()
+        plagiarism_checker._executor = None
+    print(f"plagiarism_scoring: {above} pairs at or above {THRESHOLD}, {below} just below; best {serial}")
+
+if __name__ == '__main__':
+    test_plagiarism_scoring()
+    print("plagiarism_scoring OK")
@@ -0,0 +1,24 @@
+from ai_evaluator import RUBRIC, rubric_points, rubric_scores, with_rubric_scores
+
+def test_rubric_scores():
+    # The last fraction on a line is its score; other totals are rescaled
+    assert rubric_points('Correct implementation - 38/40', 40) == 38
+    assert rubric_points('Passed 3/5 test cases - 24/40', 40) == 24
+    assert rubric_points('Mostly fine - 9/10', 25) == 22.5
+    assert rubric_points('Exam Violation', 40) is None and rubric_points(None, 40) is None
+
+    # Numbers the grader gave win over the text; None marks a criterion it could not grade
+    evaluation = with_rubric_scores(
+        {'correctness': 'Good - 30/40', 'efficiency': 'O(n) - 20/25', 'code_style': 'N/A', 'best_practices': 'Fine'},
+        {'efficiency': 99, 'best_practices': None}
+    )
+    assert [evaluation[f'{c}_score'] for c in RUBRIC] == [30, 25, None, None]
+
+    # Stored explanations from before the numeric fields still yield numbers
+    assert rubric_scores({'correctness': 'x - 36/40', 'efficiency': 'y - 20/25'}) == {
+        'correctness': 36, 'efficiency': 20, 'code_style': None, 'best_practices': None
+    }
+
+if __name__ == '__main__':
+    test_rubric_scores()
+    print("rubric_scores OK")
@@ -1,8 +1,6 @@
-import psycopg2, os
-from dotenv import load_dotenv
+from database import get_db
 
-load_dotenv()
-conn = psycopg2.connect(os.getenv('DATABASE_URL'))
+conn = get_db()
 cur = conn.cursor()
 
 # Check if column exists
@@ -0,0 +1,243 @@
+import atexit
+import os
+import queue
+import select
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from config import Config
+from sandbox_worker import read_message, write_message
+import sandbox_jail
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_SCRIPT = os.path.join(APP_DIR, 'sandbox_worker.py')
+
+class WorkerError(Exception):
+    """The worker process died or stopped speaking the protocol"""
+
+class PoolUnavailable(WorkerError):
+    """No warm worker became free in time (or none could be started); run the case cold"""
+
+class SandboxWorker:
+    """One warm sandbox_worker.py process, jailed by sandbox_jail.py, and its private directory"""
+    def __init__(self):
+        self.workdir = tempfile.mkdtemp(prefix='judge-worker-')
+        os.chmod(self.workdir, 0o700)
+        self.jobs = 0
+        self.proc = None
+        try:
+            shutil.copy(WORKER_SCRIPT, self.workdir)
+            jailed = sandbox_jail.SANDBOX_DIR
+            self.proc = subprocess.Popen(
+                sandbox_jail.jail_argv(self.workdir, [sandbox_jail.PYTHON, '-I', f'{jailed}/sandbox_worker.py', jailed, APP_DIR]),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env={'PATH': '/usr/bin:/bin', 'HOME': jailed, 'LANG': 'C.UTF-8', 'PYTHONDONTWRITEBYTECODE': '1'},
+                cwd=self.workdir,
+                start_new_session=True
+            )
+            hello = self._read(timeout=10)
+        except (OSError, ValueError) as e:
+            self.close()
+            raise WorkerError(f'sandbox worker failed to start: {e}')
+        if not hello or not hello.get('ready'):
+            reason = (hello or {}).get('error') or self._stderr()
+            self.close()
+            raise WorkerError(f'sandbox worker failed to start: {reason}')
+
+    def _read(self, timeout):
+        ready, _, _ = select.select([self.proc.stdout], [], [], timeout)
+        if not ready:
+            return None
+        return read_message(self.proc.stdout)
+
+    def run(self, job, timeout):
+        self.jobs += 1
+        try:
+            write_message(self.proc.stdin, job)
+            reply = self._read(timeout)
+        except (OSError, ValueError) as e:
+            raise WorkerError(str(e))
+        if reply is None:
+            raise WorkerError('no reply from sandbox worker')
+        if 'error' in reply:
+            raise WorkerError(reply['error'])
+        return reply
+
+    def _stderr(self):
+        # Only read once the worker is gone (the jail's own errors end up here)
+        if self.proc.poll() is None:
+            return 'no reply'
+        return self.proc.stderr.read().decode('utf-8', errors='replace').strip()[-500:] or 'no reply'
+
+    def close(self):
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                self.proc.kill()
+            self.proc.wait()
+            for stream in (self.proc.stdin, self.proc.stdout, self.proc.stderr):
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+class WarmPythonPool:
+    """
+    Pool of pre-started, pre-imported Python sandbox workers. Each job is forked
+    from a warm worker instead of starting a new interpreter. A worker is
+    replaced after `max_jobs` jobs, and straight away after a violation
+    (time/output limit, crash), so a misbehaving submission cannot degrade
+    the worker that runs the next one.
+
+    A worker that cannot be replaced is retried in the background with
+    backoff; meanwhile run() waits at most `checkout_timeout` for a worker
+    and raises PoolUnavailable so the case can run cold instead.
+    """
+    def __init__(self, size=4, max_jobs=200, checkout_timeout=5.0, spawn=SandboxWorker):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.checkout_timeout = checkout_timeout
+        self._worker_factory = spawn
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        self._spawned = 0
+        self._recycled = 0
+        self._jobs = 0
+        self._errors = 0
+        self._spawn_failures = 0
+        self._missing = 0
+        self._unavailable = 0
+        self._busy_seconds = 0.0
+        self._latencies = deque(maxlen=1000)
+        self._first_job_at = None
+
+    def _replace(self, delay=0.5):
+        """Add one worker to the idle queue, retrying in the background (with backoff) until one starts"""
+        if self._closed:
+            return
+        try:
+            worker = self._worker_factory()
+        except WorkerError as e:
+            with self._lock:
+                self._spawn_failures += 1
+            print(f"Could not start sandbox worker, retrying in {delay:.1f}s: {e}")
+            timer = threading.Timer(delay, self._replace, args=(min(delay * 2, 60.0),))
+            timer.daemon = True
+            timer.start()
+            return
+        with self._lock:
+            self._spawned += 1
+            self._missing -= 1
+        if self._closed:
+            worker.close()
+        else:
+            self._idle.put(worker)
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._missing += self.size
+        for _ in range(self.size):
+            self._replace()
+
+    def _recycle(self, worker):
+        worker.close()
+        with self._lock:
+            self._recycled += 1
+            self._missing += 1
+        self._replace()
+
+    def run(self, code, stdin_text, cpu_seconds=None, memory_mb=None, output_kb=None, wall_seconds=None):
+        """Same result shape as code_runner.run_sandboxed(); raises PoolUnavailable when no worker is free in time"""
+        self.start()
+        cpu_seconds = cpu_seconds or Config.JUDGE_CPU_SECONDS
+        job = {
+            'code': code,
+            'input': stdin_text,
+            'cpu': cpu_seconds,
+            'memory_mb': memory_mb or Config.JUDGE_MEMORY_MB,
+            'output_kb': output_kb or Config.JUDGE_OUTPUT_KB,
+            'wall': wall_seconds or cpu_seconds * 2 + 1
+        }
+
+        try:
+            worker = self._idle.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            with self._lock:
+                self._unavailable += 1
+            raise PoolUnavailable(f'no sandbox worker free after {self.checkout_timeout}s')
+        start = time.perf_counter()
+        try:
+            result = worker.run(job, timeout=job['wall'] + 5)
+        except WorkerError as e:
+            with self._lock:
+                self._errors += 1
+            self._recycle(worker)
+            return {'exit_code': -1, 'timed_out': False, 'output_exceeded': False,
+                    'stdout': '', 'stderr': f'Sandbox error: {e}', 'time_ms': 0.0}
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._jobs += 1
+                self._busy_seconds += elapsed
+                self._latencies.append(elapsed)
+                if self._first_job_at is None:
+                    self._first_job_at = start
+
+        violation = result['timed_out'] or result['output_exceeded'] or result['exit_code'] < 0
+        if violation or worker.jobs >= self.max_jobs:
+            self._recycle(worker)
+        else:
+            self._idle.put(worker)
+        return result
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            elapsed = time.perf_counter() - self._first_job_at if self._first_job_at else 0.0
+            def percentile(p):
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else 0.0
+            return {
+                'workers': self.size,
+                'idle': self._idle.qsize(),
+                'spawned': self._spawned,
+                'recycled': self._recycled,
+                'jobs': self._jobs,
+                'errors': self._errors,
+                'missing': self._missing,
+                'spawn_failures': self._spawn_failures,
+                'ran_cold': self._unavailable,
+                'throughput_per_s': round(self._jobs / elapsed, 1) if elapsed else 0.0,
+                'p50_ms': percentile(0.5),
+                'p95_ms': percentile(0.95)
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_worker_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = WarmPythonPool(size=Config.JUDGE_WORKERS, max_jobs=Config.JUDGE_WORKER_MAX_JOBS,
+                                       checkout_timeout=Config.JUDGE_WORKER_CHECKOUT_TIMEOUT)
+                atexit.register(_pool.close)
+    return _pool